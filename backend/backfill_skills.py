@@ -0,0 +1,167 @@
+"""
+backfill_skills.py — Batch job: re-normalize stored skills.
+
+Skills are canonicalized at registration, but older profiles, later edits, parsed
+resumes and every Skill node the LLM wrote into the graph can still hold raw
+spellings. This streams profiles in _id order (both profile.skills and
+resume.parsed_data.skills) and graph Skill names in name order, normalizes each chunk
+in one batched call to the embedding sidecar, and writes back with one unordered
+bulk_write through the user repository (so every worker's cached view is evicted) /
+one UNWIND merge_many per chunk. Progress is checkpointed after every chunk, so an
+interrupted run resumes where it stopped.
+
+    python backfill_skills.py --dry-run
+    python backfill_skills.py --chunk 1000
+    python backfill_skills.py --restart --skip-graph
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List
+
+import redis.asyncio as aioredis
+from bson import ObjectId
+from dotenv import load_dotenv
+
+import neo_graph as graph
+import ops
+from onboarding import user as users
+from onboarding.normalizer.normalizer import apply_map
+from onboarding.normalizer.service import normalize_map_async
+from scoring import profile_hash
+
+load_dotenv()
+
+CHECKPOINT_PATH = os.getenv("BACKFILL_CHECKPOINT", "./data/backfill_skills.checkpoint.json")
+
+
+def _load_checkpoint(restart: bool) -> Dict:
+    if not restart and os.path.exists(CHECKPOINT_PATH):
+        with open(CHECKPOINT_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"profiles_after": None, "profiles_done": False, "graph_after": None, "graph_done": False}
+
+
+def _save_checkpoint(cp: Dict):
+    os.makedirs(os.path.dirname(CHECKPOINT_PATH) or ".", exist_ok=True)
+    tmp = CHECKPOINT_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cp, f)
+    os.replace(tmp, CHECKPOINT_PATH)
+
+
+def _profile_skills(doc: Dict) -> List[str]:
+    return (doc.get("profile") or {}).get("skills") or []
+
+
+def _resume_skills(doc: Dict) -> List[str]:
+    return ((doc.get("resume") or {}).get("parsed_data") or {}).get("skills") or []
+
+
+async def backfill_profiles(cp: Dict, chunk: int, dry_run: bool):
+    query = {"$or": [{"profile.skills.0": {"$exists": True}}, {"resume.parsed_data.skills.0": {"$exists": True}}]}
+    if cp["profiles_after"]:
+        query["_id"] = {"$gt": ObjectId(cp["profiles_after"])}
+    cursor = ops.users_col.find(query, {"id": 1, "profile": 1, "resume.parsed_data.skills": 1}).sort("_id", 1).batch_size(chunk)
+
+    scanned = updated = 0
+    start = time.perf_counter()
+    while True:
+        docs = await cursor.to_list(length=chunk)
+        if not docs:
+            break
+        mapping = await normalize_map_async(list({s for d in docs for s in _profile_skills(d) + _resume_skills(d)}))
+
+        writes: Dict[str, Dict] = {}
+        for d in docs:
+            update = {}
+            profile = d.get("profile") or {}
+            skills = apply_map(_profile_skills(d), mapping)
+            if skills != _profile_skills(d):
+                profile = {**profile, "skills": skills}
+                update.update({"profile.skills": skills, "profile_hash": profile_hash(profile)})
+            resume_skills = apply_map(_resume_skills(d), mapping)
+            if resume_skills != _resume_skills(d):
+                update["resume.parsed_data.skills"] = resume_skills
+            if update:
+                writes[d["id"]] = update
+        if writes and not dry_run:
+            await users.bulk_update(writes)
+
+        scanned += len(docs)
+        updated += len(writes)
+        if not dry_run:
+            cp["profiles_after"] = str(docs[-1]["_id"])
+            _save_checkpoint(cp)
+        elapsed = time.perf_counter() - start
+        print(f"  profiles: {scanned} scanned, {updated} updated, {scanned / elapsed:.0f} profiles/s")
+
+    if not dry_run:
+        cp["profiles_done"] = True
+        _save_checkpoint(cp)
+    elapsed = time.perf_counter() - start
+    print(f"Profiles: {scanned} scanned, {updated} rewritten in {elapsed:.1f}s "
+          f"({scanned / elapsed if elapsed else 0:.0f} profiles/s)")
+
+
+async def backfill_graph(cp: Dict, chunk: int, dry_run: bool):
+    names = sorted(n["name"] for n in await graph.node_weights("Skill"))
+    if cp["graph_after"]:
+        names = [n for n in names if n > cp["graph_after"]]
+
+    merged = 0
+    start = time.perf_counter()
+    for i in range(0, len(names), chunk):
+        batch = names[i:i + chunk]
+        mapping = await normalize_map_async(batch)
+        groups: Dict[str, List[str]] = {}
+        for name in batch:
+            # Graph names are stored lowercase; the KB's casing would strand edges on an unreachable node
+            canonical = mapping.get(name, name).lower()
+            if canonical != name:
+                groups.setdefault(canonical, []).append(name)
+        for canonical, aliases in groups.items():
+            print(f"  {canonical!r} <- {aliases}")
+        if groups and not dry_run:
+            await graph.merge_many("Skill", groups)
+        merged += sum(len(v) for v in groups.values())
+        if not dry_run:
+            cp["graph_after"] = batch[-1]
+            _save_checkpoint(cp)
+
+    if not dry_run:
+        cp["graph_done"] = True
+        _save_checkpoint(cp)
+    print(f"Graph: {len(names)} Skill nodes checked, {merged} folded into canonical names "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+async def main(args):
+    # Connected so merges bump the graph version and retire cached trajectories.
+    rc = aioredis.from_url(os.getenv("REDIS_URL"), decode_responses=True) if os.getenv("REDIS_URL") else None
+    await graph.setup(rc)
+    users.setup(rc)  # profile rewrites evict the API workers' cached user views
+    cp = _load_checkpoint(args.restart)
+
+    if not args.skip_profiles and not cp["profiles_done"]:
+        await backfill_profiles(cp, args.chunk, args.dry_run)
+    if not args.skip_graph and not cp["graph_done"]:
+        await backfill_graph(cp, args.chunk, args.dry_run)
+    if args.dry_run:
+        print("Dry run — no changes written.")
+
+    await graph.close()
+    if rc:
+        await rc.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-normalize skills in stored profiles and graph Skill nodes.")
+    parser.add_argument("--chunk", type=int, default=500)
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from the beginning.")
+    parser.add_argument("--skip-profiles", action="store_true")
+    parser.add_argument("--skip-graph", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    asyncio.run(main(parser.parse_args()))
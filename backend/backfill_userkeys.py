@@ -0,0 +1,70 @@
+"""
+backfill_userkeys.py — One-off migration: index existing user-scoped cache keys.
+
+New tree and card entries register themselves in `horizon:userkeys:{user_id}` when
+written. This scans the keys written before that (tree and card families only, not
+the whole keyspace) and adds each to its owner's set, so account deletion and
+invalidation find them without a SCAN. Safe to re-run: SADD is idempotent.
+
+    python backfill_userkeys.py --dry-run
+    python backfill_userkeys.py
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Dict, List
+
+import redis.asyncio as aioredis
+from dotenv import load_dotenv
+
+import cache
+
+load_dotenv()
+
+PATTERNS = ("horizon:tree:*", "horizon:card:*")
+
+
+async def _flush(rc, batch: Dict[str, List[str]], dry_run: bool):
+    if dry_run or not batch:
+        return
+    pipe = rc.pipeline(transaction=False)
+    for user_id, keys in batch.items():
+        pipe.sadd(cache.user_keys_key(user_id), *keys)
+        pipe.expire(cache.user_keys_key(user_id), cache.USER_KEYS_TTL)
+    await pipe.execute()
+
+
+async def main(args):
+    rc = aioredis.from_url(os.getenv("REDIS_URL"), encoding="utf-8", decode_responses=True)
+    start = time.perf_counter()
+    scanned, indexed, users = 0, 0, set()
+
+    for pattern in PATTERNS:
+        batch: Dict[str, List[str]] = {}
+        pending = 0
+        async for key in rc.scan_iter(match=pattern, count=args.count):
+            scanned += 1
+            user_id = cache.user_of(key)
+            if not user_id:
+                continue
+            batch.setdefault(user_id, []).append(key)
+            users.add(user_id)
+            indexed += 1
+            pending += 1
+            if pending >= args.count:
+                await _flush(rc, batch, args.dry_run)
+                batch, pending = {}, 0
+        await _flush(rc, batch, args.dry_run)
+
+    print(f"Scanned {scanned} keys, indexed {indexed} for {len(users)} users in {time.perf_counter() - start:.1f}s")
+    if args.dry_run:
+        print("Dry run — no changes written.")
+    await rc.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the per-user cache key index.")
+    parser.add_argument("--count", type=int, default=1000, help="SCAN hint and SADD batch size.")
+    parser.add_argument("--dry-run", action="store_true")
+    asyncio.run(main(parser.parse_args()))
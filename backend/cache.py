@@ -0,0 +1,289 @@
+"""
+cache.py — Two-tier cache: a per-process L1 in front of Redis (L2).
+
+Keys follow `horizon:{family}:...`, and each family has its own L1 policy (TTL and
+entry bound); families without one go straight to Redis. Writes and deletes made
+through this module publish the key on CACHE_CHANNEL, and every worker's listen()
+task evicts it from its L1, so other processes never serve a value that was
+overwritten or deleted for longer than a pub/sub hop. The L1 TTL bounds staleness if
+a message is missed, and a reconnect drops the whole L1.
+
+    cached = await cache.get(rc, key)
+    await cache.set(rc, key, payload, ttl)
+
+Large structured values (trees, cards) go through get_obj/set_obj instead: they are
+stored with codec.py (msgpack, zstd above a threshold) over a binary Redis client
+registered with bind_binary(), and legacy JSON entries still decode.
+
+Writes given a user_id also add the key to the set `horizon:userkeys:{user_id}`, so a
+user's entries are found with one SMEMBERS and dropped with one pipelined UNLINK
+(invalidate_user) instead of a keyspace SCAN.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+import codec
+import metrics
+
+log = logging.getLogger("cache")
+
+CACHE_CHANNEL = "horizon:cache:invalidate"
+# Refreshed on every registration; must outlive the longest user-scoped entry TTL
+USER_KEYS_TTL = int(os.getenv("CACHE_USER_KEYS_TTL", str(30 * 24 * 3600)))
+
+
+class Policy(NamedTuple):
+    l1_ttl: float     # seconds an L1 entry may be served without asking Redis
+    l1_max: int       # LRU bound on L1 entries for this family
+
+
+def _policy(family: str, ttl: float, size: int) -> Policy:
+    env = family.upper()
+    return Policy(float(os.getenv(f"CACHE_L1_TTL_{env}", str(ttl))), int(os.getenv(f"CACHE_L1_MAX_{env}", str(size))))
+
+
+# Small, hot, shared values get the longest L1 life; per-user payloads stay brief
+POLICIES: Dict[str, Policy] = {
+    "pricing": _policy("pricing", 300, 1),
+    "jd":      _policy("jd", 120, 2000),
+    "intel":   _policy("intel", 60, 2000),
+    "traj":    _policy("traj", 120, 1000),
+    "card":    _policy("card", 30, 1000),
+    "tree":    _policy("tree", 30, 500),
+}
+
+_binary = None  # decode_responses=False client for codec-encoded values
+_hooks: Dict[str, Callable[[Optional[str]], None]] = {}  # family -> evict(key), None = drop all
+_ORIGIN = uuid.uuid4().hex[:12]  # lets a worker skip its own invalidations
+_l1: Dict[str, "OrderedDict[str, tuple]"] = {f: OrderedDict() for f in POLICIES}  # key -> (expires_at, value)
+STATS: Dict[str, Dict[str, int]] = {}
+
+
+def family_of(key: str) -> str:
+    parts = key.split(":", 2)
+    return parts[1] if len(parts) > 2 and parts[0] == "horizon" else ""
+
+
+def user_keys_key(user_id: str) -> str:
+    return f"horizon:userkeys:{user_id}"
+
+
+def user_of(key: str) -> Optional[str]:
+    """Owner of a user-scoped key, for the layouts written before the index existed."""
+    parts = key.split(":")
+    if key.startswith("horizon:tree:") and len(parts) == 4:   # horizon:tree:v8:{user_id}
+        return parts[3]
+    if key.startswith("horizon:card:") and len(parts) >= 4:   # horizon:card:{user_id}:{phash}:{jd_sig}
+        return parts[2]
+    return None
+
+
+def _count(family: str, field: str):
+    counts = STATS.setdefault(family, {"l1_hit": 0, "l2_hit": 0, "miss": 0})
+    counts[field] += 1
+
+
+def _l1_put(family: str, key: str, value: str):
+    policy = POLICIES.get(family)
+    if not policy or policy.l1_ttl <= 0:
+        return
+    entries = _l1[family]
+    entries[key] = (time.monotonic() + policy.l1_ttl, value)
+    entries.move_to_end(key)
+    while len(entries) > policy.l1_max:
+        entries.popitem(last=False)
+
+
+def _evict(key: str):
+    entries = _l1.get(family_of(key))
+    if entries is not None:
+        entries.pop(key, None)
+
+
+def bind_binary(client):
+    global _binary
+    _binary = client
+
+
+async def get(rc, key: str) -> Optional[str]:
+    family = family_of(key)
+    entries = _l1.get(family)
+    if entries is not None:
+        hit = entries.get(key)
+        if hit and hit[0] > time.monotonic():
+            entries.move_to_end(key)
+            _count(family, "l1_hit")
+            metrics.cache(family, True, tier="l1")
+            return hit[1]
+
+    value = await rc.get(key) if rc else None
+    _count(family, "l2_hit" if value is not None else "miss")
+    metrics.cache(family, value is not None)
+    if value is not None:
+        _l1_put(family, key, value)
+    return value
+
+
+def on_invalidate(family: str, evict: Callable[[Optional[str]], None]):
+    """Let a module with its own in-process cache (e.g. the user repository) receive evictions."""
+    _hooks[family] = evict
+
+
+async def publish_invalidation(rc, *keys: str):
+    """Evict keys from other workers' caches without touching Redis data."""
+    if rc and keys:
+        await _publish(rc, list(keys))
+
+
+async def _publish(rc, keys):
+    try:
+        await rc.publish(CACHE_CHANNEL, _ORIGIN + " " + " ".join(keys))
+    except Exception as e:
+        log.warning(f"Cache invalidation publish failed: {e}")
+
+
+async def _write(client, key: str, value, ttl: int, user_id: Optional[str]):
+    if not user_id:
+        await client.setex(key, ttl, value)
+        return
+    index = user_keys_key(user_id)
+    pipe = client.pipeline(transaction=False)
+    pipe.setex(key, ttl, value)
+    pipe.sadd(index, key)
+    pipe.expire(index, USER_KEYS_TTL)
+    await pipe.execute()
+
+
+async def index_user_keys(rc, user_id: str, *keys: str):
+    """Register keys written outside this module (rate limits, metering) so invalidate_user drops them too."""
+    if not rc or not keys:
+        return
+    index = user_keys_key(user_id)
+    pipe = rc.pipeline(transaction=False)
+    pipe.sadd(index, *keys)
+    pipe.expire(index, USER_KEYS_TTL)
+    await pipe.execute()
+
+
+async def set(rc, key: str, value: str, ttl: int, user_id: Optional[str] = None):
+    """SETEX in Redis, refresh this worker's L1 and evict the key from every other worker's."""
+    if not rc:
+        return
+    await _write(rc, key, value, ttl, user_id)
+    _l1_put(family_of(key), key, value)
+    if family_of(key) in POLICIES:
+        await _publish(rc, [key])
+
+
+async def get_obj(rc, key: str) -> Optional[Any]:
+    """Decoded value of a codec (or legacy JSON) entry."""
+    raw = await get(_binary if rc and _binary else rc, key)
+    return codec.decode(raw) if raw is not None else None
+
+
+async def set_obj(rc, key: str, obj: Any, ttl: int, user_id: Optional[str] = None):
+    if not rc:
+        return
+    if _binary is None:
+        return await set(rc, key, json.dumps(obj), ttl, user_id)
+    value = codec.encode(obj)
+    await _write(_binary, key, value, ttl, user_id)
+    _l1_put(family_of(key), key, value)
+    if family_of(key) in POLICIES:
+        await _publish(rc, [key])
+
+
+async def delete(rc, *keys: str) -> int:
+    if not keys:
+        return 0
+    for key in keys:
+        _evict(key)
+    if not rc:
+        return 0
+    removed = await rc.unlink(*keys)
+    shared = [k for k in keys if family_of(k) in POLICIES]
+    if shared:
+        await _publish(rc, shared)
+    return removed
+
+
+async def invalidate_user(rc, user_id: str, family: Optional[str] = None) -> int:
+    """Drop a user's indexed entries (only one family's, if given); without a family the index goes too."""
+    if not rc:
+        return 0
+    index = user_keys_key(user_id)
+    keys = sorted(await rc.smembers(index))
+    if family:
+        keys = [k for k in keys if family_of(k) == family]
+        if not keys:
+            return 0
+    for key in keys:
+        _evict(key)
+
+    pipe = rc.pipeline(transaction=False)
+    if keys:
+        pipe.unlink(*keys)
+    if family:
+        pipe.srem(index, *keys)
+    else:
+        pipe.unlink(index)
+    results = await pipe.execute()
+
+    shared = [k for k in keys if family_of(k) in POLICIES]
+    if shared:
+        await _publish(rc, shared)
+    return results[0] if keys else 0
+
+
+def clear_l1():
+    for entries in _l1.values():
+        entries.clear()
+    for evict in _hooks.values():
+        evict(None)
+
+
+async def listen(rc):
+    """Long-running task: apply other workers' invalidations to this L1 until cancelled."""
+    while True:
+        pubsub = rc.pubsub()
+        try:
+            await pubsub.subscribe(CACHE_CHANNEL)
+            clear_l1()  # anything published while we weren't subscribed was missed
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                origin, _, keys = message["data"].partition(" ")
+                if origin != _ORIGIN:
+                    for key in keys.split():
+                        _evict(key)
+                        hook = _hooks.get(family_of(key))
+                        if hook:
+                            hook(key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning(f"Cache invalidation listener dropped, resubscribing: {e}")
+            await asyncio.sleep(1)
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+
+def stats() -> Dict[str, dict]:
+    """Per-family hit rates by tier for this process."""
+    out = {}
+    for family, c in sorted(STATS.items()):
+        total = c["l1_hit"] + c["l2_hit"] + c["miss"]
+        out[family] = dict(c, total=total,
+                           l1_hit_rate=round(c["l1_hit"] / total, 4) if total else 0.0,
+                           l2_hit_rate=round(c["l2_hit"] / total, 4) if total else 0.0,
+                           l1_entries=len(_l1.get(family, ())))
+    return out
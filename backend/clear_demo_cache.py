@@ -1,33 +1,39 @@
+import argparse
 import asyncio
 import os
 import redis.asyncio as aioredis
 from dotenv import load_dotenv
 
+import cache
+import metering
+
 load_dotenv()
 
-async def main():
+DEMO_SESSION_IDS = [s for s in os.getenv("DEMO_SESSION_IDS", "").split(",") if s]
+
+def session_keys(session_id: str) -> list:
+    return [metering.key(session_id), f"rate_limit:discover:{session_id}", f"rate_limit:tree:gen:{session_id}"]
+
+async def main(args):
     rc = aioredis.from_url(os.getenv("REDIS_URL"), encoding="utf-8", decode_responses=True)
-    
+
     from motor.motor_asyncio import AsyncIOMotorClient
     client = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
     db = client["users_db"]
     demo_user = await db["profiles"].find_one({"email": "demo@horizon.com"})
-    
+
     if demo_user:
         user_id = demo_user["id"]
-        cursor = 0
-        deleted = 0
-        while True:
-            cursor, keys = await rc.scan(cursor, match=f"*", count=5000)
-            target_keys = [k for k in keys if user_id in k]
-            if target_keys:
-                await rc.delete(*target_keys)
-                deleted += len(target_keys)
-                
-            if cursor == 0:
-                break
+        # Keys come from the per-user index (run backfill_userkeys.py once for older entries);
+        # rate-limit and metering keys of demo sessions are indexed when a window opens
+        deleted = await cache.invalidate_user(rc, user_id)
+        keys = [k for sid in [user_id, *args.session] for k in session_keys(sid)]
+        deleted += await rc.unlink(*keys)
         print(f"Cleared {deleted} cache keys for demo user {user_id}")
     await rc.aclose()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Reset the demo user's cache, credits and rate limits.")
+    parser.add_argument("--session", action="append", default=list(DEMO_SESSION_IDS),
+                        help="Demo session id (x-demo-session-id) to reset as well; repeatable. Defaults to DEMO_SESSION_IDS.")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,111 @@
+"""
+codec.py — Versioned binary encoding for large cache values (trees, advisory cards).
+
+Encoded values start with one format byte:
+    0x01  msgpack
+    0x02  msgpack, zstd-compressed (payloads of CODEC_ZSTD_THRESHOLD bytes or more)
+Anything else is a legacy plain-JSON entry; JSON text never starts with either byte, so
+old entries keep reading until they expire.
+
+    python codec.py                     # benchmark on tree/card entries currently in Redis
+    python codec.py tree1.json ...      # or on JSON fixture files
+"""
+import os
+import json
+from typing import Any, Union
+
+import msgpack
+import zstandard
+
+CODEC_ZSTD_THRESHOLD = int(os.getenv("CODEC_ZSTD_THRESHOLD", "1024"))
+CODEC_ZSTD_LEVEL = int(os.getenv("CODEC_ZSTD_LEVEL", "3"))
+
+FORMAT_MSGPACK = 0x01
+FORMAT_MSGPACK_ZSTD = 0x02
+
+_compressor = zstandard.ZstdCompressor(level=CODEC_ZSTD_LEVEL)
+_decompressor = zstandard.ZstdDecompressor()
+
+
+def encode(obj: Any) -> bytes:
+    packed = msgpack.packb(obj, use_bin_type=True)
+    if len(packed) >= CODEC_ZSTD_THRESHOLD:
+        return bytes([FORMAT_MSGPACK_ZSTD]) + _compressor.compress(packed)
+    return bytes([FORMAT_MSGPACK]) + packed
+
+
+def decode(raw: Union[bytes, str]) -> Any:
+    if isinstance(raw, str):
+        return json.loads(raw)
+    fmt = raw[0] if raw else None
+    if fmt == FORMAT_MSGPACK:
+        return msgpack.unpackb(raw[1:], raw=False)
+    if fmt == FORMAT_MSGPACK_ZSTD:
+        return msgpack.unpackb(_decompressor.decompress(raw[1:]), raw=False)
+    return json.loads(raw)
+
+
+# ── Benchmark ─────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    import sys
+    import time
+    import asyncio
+    import statistics
+
+    import redis.asyncio as aioredis
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    def timed(fn, arg, runs: int = 200) -> float:
+        start = time.perf_counter()
+        for _ in range(runs):
+            fn(arg)
+        return (time.perf_counter() - start) / runs * 1e6
+
+    async def fixtures(rc) -> list:
+        if len(sys.argv) > 1:
+            return [json.load(open(p)) for p in sys.argv[1:]]
+        found = []
+        for pattern in ("horizon:tree:*", "horizon:card:*"):
+            async for key in rc.scan_iter(match=pattern, count=500):
+                raw = await rc.get(key)
+                if raw:
+                    found.append(decode(raw))
+                if len(found) >= 50:
+                    break
+        return found
+
+    async def get_latency(rc, key: str, value: bytes, runs: int = 200) -> float:
+        await rc.set(key, value, ex=60)
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            await rc.get(key)
+            samples.append((time.perf_counter() - start) * 1000)
+        await rc.delete(key)
+        return statistics.median(samples)
+
+    async def main():
+        rc = aioredis.from_url(os.getenv("REDIS_URL"))  # binary client
+        docs = await fixtures(rc)
+        if not docs:
+            sys.exit("No fixtures: pass JSON files or populate horizon:tree:* / horizon:card:* first.")
+
+        variants = {
+            "json": (lambda d: json.dumps(d).encode(), lambda b: json.loads(b)),
+            "codec": (encode, decode),
+        }
+        print(f"{len(docs)} payloads, zstd level {CODEC_ZSTD_LEVEL}, threshold {CODEC_ZSTD_THRESHOLD}B")
+        for label, (enc, dec) in variants.items():
+            blobs = [enc(d) for d in docs]
+            size = sum(len(b) for b in blobs)
+            enc_us = statistics.mean(timed(enc, d) for d in docs)
+            dec_us = statistics.mean(timed(dec, b) for b in blobs)
+            get_ms = statistics.mean([await get_latency(rc, f"horizon:bench:codec:{i}", b) for i, b in enumerate(blobs[:10])])
+            print(f"  {label:<6} {size:>10,} bytes ({size / len(docs):>8,.0f}/entry) | encode {enc_us:7.1f}us "
+                  f"| decode {dec_us:7.1f}us | GET p50 {get_ms:.3f}ms")
+        await rc.aclose()
+
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+"""
+compact_graph.py — Offline graph compaction.
+
+Canonicalizes Role/Skill names that the LLM spelled differently ("Senior SWE",
+"Sr. Software Engineer II", ...) by clustering their normalizer embeddings, folds
+each cluster into its heaviest node, prunes low-count stale edges and reports
+before/after node, edge and traversal latency stats.
+
+    python compact_graph.py --dry-run
+    python compact_graph.py --role-threshold 0.92 --min-count 2 --stale-days 30
+"""
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import time
+from typing import Dict, List
+
+import faiss
+import redis.asyncio as aioredis
+from dotenv import load_dotenv
+
+import neo_graph as graph
+from onboarding.normalizer.normalizer import _embed
+
+load_dotenv()
+
+# Expanded before embedding only — stored names are never rewritten to these.
+ABBREVIATIONS = {
+    "sr": "senior", "snr": "senior", "jr": "junior", "swe": "software engineer",
+    "sde": "software development engineer", "eng": "engineer", "engr": "engineer",
+    "mgr": "manager", "em": "engineering manager", "ml": "machine learning",
+    "ai": "artificial intelligence", "dev": "developer", "pm": "product manager",
+}
+
+
+def _expand(name: str) -> str:
+    tokens = re.findall(r"[a-z0-9+#]+", name.lower())
+    return " ".join(ABBREVIATIONS.get(t, t) for t in tokens) or name
+
+
+def _cluster(nodes: List[Dict], threshold: float, k: int = 10) -> Dict[str, List[str]]:
+    """
+    Greedy leader clustering: walk nodes heaviest first, each unassigned node becomes
+    a canonical and absorbs its unassigned neighbours above `threshold` cosine.
+    """
+    if len(nodes) < 2:
+        return {}
+    names = [n["name"] for n in nodes]
+    vecs = _embed([_expand(n) for n in names])
+    faiss.normalize_L2(vecs)
+    index = faiss.IndexFlatIP(vecs.shape[1])
+    index.add(vecs)
+    sims, nbrs = index.search(vecs, min(k, len(names)))
+
+    assigned = set()
+    groups: Dict[str, List[str]] = {}
+    for i, name in enumerate(names):  # already sorted by weight desc
+        if i in assigned:
+            continue
+        assigned.add(i)
+        members = [
+            names[j] for j, sim in zip(nbrs[i], sims[i])
+            if j >= 0 and j not in assigned and sim >= threshold
+        ]
+        assigned.update(j for j, sim in zip(nbrs[i], sims[i]) if j >= 0 and sim >= threshold)
+        if members:
+            groups[name] = members
+    return groups
+
+
+async def _traversal_latency(samples: List[List[str]]) -> float:
+    """Median find_trajectories latency (ms) over the sampled skill sets."""
+    timings = []
+    for skills in samples:
+        start = time.perf_counter()
+        await graph.find_trajectories(skills, limit=5)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings) if timings else 0.0
+
+
+async def main(args):
+    # Connected so merges and prunes bump the graph version and retire cached trajectories.
+    rc = aioredis.from_url(os.getenv("REDIS_URL"), decode_responses=True) if os.getenv("REDIS_URL") else None
+    await graph.setup(rc)
+
+    skills_by_weight = await graph.node_weights("Skill")
+    top = [s["name"] for s in skills_by_weight[:50]]
+    samples = [top[i:i + 8] for i in range(0, len(top), 8)] or [[]]
+
+    before = await graph.stats()
+    before["traversal_ms"] = await _traversal_latency(samples)
+    print(f"Before: {before}")
+
+    for label, threshold in (("Role", args.role_threshold), ("Skill", args.skill_threshold)):
+        nodes = await graph.node_weights(label)
+        groups = _cluster(nodes, threshold)
+        print(f"{label}: {len(nodes)} nodes -> {len(groups)} merge groups "
+              f"({sum(len(v) for v in groups.values())} aliases)")
+        for canonical, aliases in groups.items():
+            print(f"  {canonical!r} <- {aliases}")
+            if not args.dry_run:
+                await graph.merge_nodes(label, canonical, aliases)
+
+    if args.dry_run:
+        print("Dry run — no changes written.")
+        await graph.close()
+        if rc:
+            await rc.aclose()
+        return
+
+    cutoff = int((time.time() - args.stale_days * 86400) * 1000)
+    pruned = await graph.prune_edges(args.min_count, cutoff)
+    print(f"Pruned: {pruned}")
+
+    after = await graph.stats()
+    after["traversal_ms"] = await _traversal_latency(samples)
+    print(f"After:  {after}")
+    for k in before:
+        print(f"  {k:<13} {before[k]:>10.1f} -> {after[k]:>10.1f}")
+
+    await graph.close()
+    if rc:
+        await rc.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge equivalent graph nodes and prune noise edges.")
+    parser.add_argument("--role-threshold", type=float, default=0.92)
+    parser.add_argument("--skill-threshold", type=float, default=0.95)
+    parser.add_argument("--min-count", type=int, default=2, help="Edges seen fewer times than this are pruned once stale.")
+    parser.add_argument("--stale-days", type=int, default=30)
+    parser.add_argument("--dry-run", action="store_true")
+    asyncio.run(main(parser.parse_args()))
@@ -5,6 +5,7 @@ import asyncio
 import datetime
 import hashlib
 import re
+import time
 from typing import List, Dict, Any, Literal, Tuple, Optional
 
 import redis as sync_redis
@@ -14,6 +15,10 @@ from pydantic import BaseModel, Field
 from tavily import TavilyClient
 
 import neo_graph as graph
+import cache
+import metrics
+import ops
+import tracing
 from ops import log_llm_cost
 from scoring import compute_coverage_score, profile_hash as _profile_hash
 
@@ -35,6 +40,15 @@ JD_TTL = int(os.getenv("CACHE_TTL_JD", str(30 * 60)))       # Default: 30 mins
 INTEL_TTL = int(os.getenv("CACHE_TTL_INTEL", str(7 * 60)))  # Default: 7 mins
 CARD_TTL = int(os.getenv("CACHE_TTL_CARD", "3600"))         # Default: 1 hour
 
+# Graph fast path: serve JD skills from accumulated REQUIRES edges instead of a web-search LLM call
+JD_GRAPH_ENABLED = os.getenv("JD_GRAPH_ENABLED", "True") == "True"
+JD_GRAPH_COMPANY_SCOPED = os.getenv("JD_GRAPH_COMPANY_SCOPED", "True") == "True"
+JD_GRAPH_MIN_COUNT = int(os.getenv("JD_GRAPH_MIN_COUNT", "3"))       # JD fetches the role's strongest edge must have seen
+JD_GRAPH_MIN_SKILLS = int(os.getenv("JD_GRAPH_MIN_SKILLS", "5"))
+JD_GRAPH_TOP_K = int(os.getenv("JD_GRAPH_TOP_K", "15"))
+JD_GRAPH_MAX_AGE = int(os.getenv("JD_GRAPH_MAX_AGE_DAYS", "14")) * 86400 * 1000
+JD_GRAPH_REFRESH_AGE = int(os.getenv("JD_GRAPH_REFRESH_DAYS", "3")) * 86400 * 1000
+
 SYSTEM = (
     "You are a ruthless career analyst. Binary, objective, zero encouragement. "
     "Measure capability gap and proven velocity. Dense output only."
@@ -79,19 +93,8 @@ def _card_cache_key(user_id: str, profile: Dict[str, Any], company: str, role: s
     return f"horizon:card:{user_id}:{phash}:{jd_sig}"
 
 
-async def _fetch_jd(rc, role: str, company: str, location: str) -> Tuple[str, List[str], bool]:
-    """Fetch JD via Gemini + Tavily Search. Returns (jd_text, skills, from_cache)."""
-    key = _jd_cache_key(role, company, location)
-
-    if rc:
-        cached = await rc.get(key)
-        if cached:
-            log.info(f"JD cache hit: {company}")
-            try:
-                return cached, json.loads(cached).get("skills", []), True
-            except Exception:
-                return cached, [], True
-
+async def _fetch_jd_llm(role: str, company: str) -> Tuple[str, List[str], Optional[str]]:
+    """Web-search LLM extraction. Returns (jd_text, skills, clean_json_or_None_on_failure)."""
     prompt = (
         f"Search the web for the canonical tech stack and job requirements for a '{role}' at '{company}'.\n"
         f"Synthesize the results to extract an exhaustive, deduplicated list of their core, non-negotiable technical requirements.\n"
@@ -103,13 +106,14 @@ async def _fetch_jd(rc, role: str, company: str, location: str) -> Tuple[str, Li
     skills: List[str] = []
 
     try:
-        resp = await _client.chat.completions.create(
-            model=MODEL_JD_EXTRACTOR,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.0,
-            extra_body={"plugins": [{"id": "web"}]}
-        )
-        log_llm_cost("fetch_jd", MODEL_JD_EXTRACTOR, resp)
+        with metrics.stage("jd_extraction"), metrics.outbound("openrouter"):
+            resp = await _client.chat.completions.create(
+                model=MODEL_JD_EXTRACTOR,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.0,
+                extra_body={"plugins": [{"id": "web"}]}
+            )
+            log_llm_cost("fetch_jd", MODEL_JD_EXTRACTOR, resp)
         if resp and getattr(resp, "choices", None) and len(resp.choices) > 0 and resp.choices[0].message.content:
             jd_text = resp.choices[0].message.content.strip()
             clean_text = jd_text
@@ -120,12 +124,102 @@ async def _fetch_jd(rc, role: str, company: str, location: str) -> Tuple[str, Li
                 if clean_text.startswith("python"): clean_text = clean_text[6:]
                 clean_text = clean_text.strip()
             skills = json.loads(clean_text).get("skills", [])
-            if rc:
-                await rc.setex(key, JD_TTL, clean_text)
+            return jd_text, skills, clean_text
     except Exception as e:
         log.warning(f"JD fetch failed [{company}]: {e}")
 
-    return jd_text, skills, False
+    return jd_text, skills, None
+
+
+async def _jd_from_graph(role: str, company: str) -> Tuple[Optional[List[str]], int]:
+    """
+    Top-weighted REQUIRES skills for the role when the graph has enough recent signal.
+    Returns (skills or None, newest edge updated_at in epoch ms).
+    """
+    if not JD_GRAPH_ENABLED:
+        return None, 0
+    try:
+        with metrics.stage("graph_lookup"), metrics.outbound("graph"):
+            rows = await graph.role_requirements(role, company if JD_GRAPH_COMPANY_SCOPED else None, JD_GRAPH_TOP_K)
+            tracing.annotate(results=len(rows))
+    except Exception as e:
+        log.warning(f"Graph JD lookup failed [{company}]: {e}")
+        return None, 0
+
+    if len(rows) < JD_GRAPH_MIN_SKILLS:
+        return None, 0
+    newest = max((r.get("updated_at") or 0) for r in rows)
+    strongest = max((r.get("count") or 0) for r in rows)
+    if strongest < JD_GRAPH_MIN_COUNT or newest < time.time() * 1000 - JD_GRAPH_MAX_AGE:
+        return None, newest
+    return [r["skill"] for r in rows], newest
+
+
+_background: set = set()  # strong refs to fire-and-forget refreshes until they finish
+
+
+def _spawn(coro, label: str):
+    task = asyncio.create_task(coro)
+    _background.add(task)
+
+    def _done(t: asyncio.Task):
+        _background.discard(t)
+        if not t.cancelled() and t.exception() is not None:
+            log.warning(f"{label} failed: {t.exception()!r}")
+
+    task.add_done_callback(_done)
+    return task
+
+
+async def _refresh_jd(rc, role: str, company: str, location: str):
+    """Background LLM refetch that keeps graph-served roles fresh. Never billed to the triggering request."""
+    ops.current_request_cost.set(None)
+    lock = f"horizon:jd:refresh:{_jd_cache_key(role, company, location)}"
+    if rc and not await rc.set(lock, "1", nx=True, ex=3600):
+        return
+    _, skills, clean_text = await _fetch_jd_llm(role, company)
+    if clean_text is None:
+        return
+    if rc:
+        await cache.set(rc, _jd_cache_key(role, company, location), clean_text, JD_TTL)
+    await graph.evolve(role, skills, company)
+    log.info(f"Background JD refresh done: {company} ({len(skills)} skills)")
+
+
+async def _fetch_jd(rc, role: str, company: str, location: str) -> Tuple[str, List[str], str]:
+    """
+    Fetch JD skills: Redis cache, then the graph (when its REQUIRES evidence is strong),
+    then Gemini web search. Returns (jd_text, skills, source) with source in cache|graph|llm.
+    """
+    key = _jd_cache_key(role, company, location)
+
+    if rc:
+        cached = await cache.get(rc, key)
+        if cached:
+            log.info(f"JD cache hit: {company}")
+            try:
+                return cached, json.loads(cached).get("skills", []), "cache"
+            except Exception:
+                return cached, [], "cache"
+
+    skills, newest = await _jd_from_graph(role, company)
+    if skills:
+        log.info(f"JD served from graph: {company} ({len(skills)} skills)")
+        jd_text = json.dumps({
+            "skills": skills,
+            "resp": f"Aggregated from prior {role} requirement signals in the graph.",
+            "source_url": "",
+        })
+        if rc:
+            await cache.set(rc, key, jd_text, JD_TTL)
+        if newest < time.time() * 1000 - JD_GRAPH_REFRESH_AGE:
+            _spawn(_refresh_jd(rc, role, company, location), f"Background JD refresh for {company}")
+        return jd_text, skills, "graph"
+
+    jd_text, skills, clean_text = await _fetch_jd_llm(role, company)
+    if rc and clean_text is not None:
+        await cache.set(rc, key, clean_text, JD_TTL)
+    return jd_text, skills, "llm"
 
 
 async def _build_card(
@@ -199,24 +293,25 @@ Generate the qualitative advisory only. Do NOT re-compute the score or gaps.
 - main_advisory_text: ≤25 words. Highest-signal thing for THIS company."""
 
     try:
-        resp = await _client.chat.completions.create(
-            model=MODEL_DISCOVER_ADVISOR,
-            messages=[
-                {"role": "system", "content": SYSTEM},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={
-                "type": "json_schema",
-                "json_schema": {
-                    "name": "AdvisoryCard",
-                    "strict": True,
-                    "schema": AdvisoryCard.model_json_schema()
-                }
-            },
-            temperature=0.0,
-            seed=42,
-        )
-        log_llm_cost("build_card", MODEL_DISCOVER_ADVISOR, resp)
+        with metrics.stage("card_synthesis"), metrics.outbound("openrouter"):
+            resp = await _client.chat.completions.create(
+                model=MODEL_DISCOVER_ADVISOR,
+                messages=[
+                    {"role": "system", "content": SYSTEM},
+                    {"role": "user", "content": prompt}
+                ],
+                response_format={
+                    "type": "json_schema",
+                    "json_schema": {
+                        "name": "AdvisoryCard",
+                        "strict": True,
+                        "schema": AdvisoryCard.model_json_schema()
+                    }
+                },
+                temperature=0.0,
+                seed=42,
+            )
+            log_llm_cost("build_card", MODEL_DISCOVER_ADVISOR, resp)
         card = json.loads(resp.choices[0].message.content)
         # Overwrite with deterministic values — LLM must not alter these
         card["fit_score"] = fit_score
@@ -252,55 +347,69 @@ async def generate_cards(
         profile = user_profile.get("profile", {})
         card_key = _card_cache_key(user_id, profile, clean_c, role, location)
         if rc and not force_refresh:
-            cached_card = await rc.get(card_key)
-            if cached_card:
+            card = await cache.get_obj(rc, card_key)
+            if card:
                 log.info(f"Card cache hit: {clean_c}")
-                card = json.loads(cached_card)
                 card.setdefault("retrieved_at", datetime.datetime.utcnow().isoformat())
                 card["from_cache"] = True
-                return card, role, []
+                return card, role, [], None, clean_c
 
         async def get_intel():
             key = _intel_cache_key(role, original_c, location)
             if rc:
-                cached = await rc.get(key)
+                cached = await cache.get(rc, key)
                 if cached: 
                     log.info(f"Intel cache hit: {original_c}")
                     return json.loads(cached)
             intel = await _fetch_company_intel(role, original_c, location)
             if rc:
-                await rc.setex(key, INTEL_TTL, intel.model_dump_json())
+                await cache.set(rc, key, intel.model_dump_json(), INTEL_TTL)
             return intel.model_dump()
             
-        intel, (jd_text, jd_skills, from_cache) = await asyncio.gather(
+        intel, (jd_text, jd_skills, jd_source) = await asyncio.gather(
             get_intel(),
             _fetch_jd(rc, role, clean_c, location)
         )
         
         signals = "\n".join(r.get("content", "") for r in intel.get("results", []))
-        card_tuple = await _build_card(user_profile, clean_c, role, location, signals, jd_text, jd_skills, from_cache)
+        # Only LLM-fetched skills evolve the graph; graph-served ones would just reinforce themselves
+        card_tuple = await _build_card(user_profile, clean_c, role, location, signals, jd_text, jd_skills, jd_source != "llm")
         card = card_tuple[0]
         # Stamp provenance on every freshly-built card
         card["retrieved_at"] = datetime.datetime.utcnow().isoformat()
         card["from_cache"] = False
+        card["jd_source"] = jd_source
         if rc and card:
-            await rc.setex(card_key, CARD_TTL, json.dumps(card))
-        return (card,) + card_tuple[1:]
+            await cache.set_obj(rc, card_key, card, CARD_TTL, user_id=user_id)
+        return (card,) + card_tuple[1:] + (jd_source, clean_c)
+
+    async def traced_company(original_c, clean_c):
+        with tracing.span("discover_company", company=clean_c):
+            return await process_company(original_c, clean_c)
 
     tasks = []
     for i, original_c in enumerate(companies):
         clean_c = clean_data[i].get("company", original_c) if clean_data else original_c
-        tasks.append(process_company(original_c, clean_c))
+        tasks.append(traced_company(original_c, clean_c))
 
-    results: List[Tuple[Dict, str, List[str]]] = await asyncio.gather(*tasks) if tasks else []
+    results: List[Tuple[Dict, str, List[str], Optional[str], str]] = await asyncio.gather(*tasks) if tasks else []
 
     cards = [r[0] for r in results]
-    evolutions = [(r[1], r[2]) for r in results if r[2]]
+    # Evolve under the same cleaned name _jd_from_graph and the card key look up, not the LLM's spelling
+    evolutions = [(r[1], r[2], r[4]) for r in results if r[2]]
 
     if evolutions:
-        await asyncio.gather(*[graph.evolve(r, s) for r, s in evolutions])
+        await asyncio.gather(*[graph.evolve(r, s, c) for r, s, c in evolutions])
         log.info(f"Graph evolved for {len(evolutions)} roles.")
 
+    sources = [r[3] for r in results]
+    if "graph" in sources:
+        ops.count_stat("discover", "jd_graph_served", sources.count("graph"))
+    counts = ops.count_stat("discover", "requests_without_jd_llm" if "llm" not in sources else "requests_with_jd_llm")
+    total = counts.get("requests_without_jd_llm", 0) + counts.get("requests_with_jd_llm", 0)
+    if total:
+        log.info(f"Discover requests served without JD LLM call: {counts.get('requests_without_jd_llm', 0)}/{total} in this worker")
+
     run_id = _profile_hash({"cards": [c.get("company_name") for c in cards], "role": role})
     log.info(f"Advisory batch done: {len(cards)} cards. run_id={run_id}")
     return cards
\ No newline at end of file
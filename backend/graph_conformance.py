@@ -0,0 +1,127 @@
+"""
+graph_conformance.py — Checks that every graph backend answers identically.
+
+Replays one fixed scenario (evolve, evolve_paths, traversal, merge, prune) against
+each backend and diffs the normalized results. The local backend always runs on a
+throwaway file. Neo4j runs only with --neo4j and WIPES all Role/Skill nodes at
+NEO4J_URI first, so point it at a scratch database.
+
+    python graph_conformance.py
+    NEO4J_URI=bolt://localhost:7687 python graph_conformance.py --neo4j
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+from neo_graph import Neo4jBackend
+from local_graph import LocalBackend
+
+JDS = [
+    ("Backend Engineer", ["Python", "Go", "PostgreSQL", "Kafka"], "Stripe"),
+    ("Backend Engineer", ["Python", "Go", "Redis"], "Razorpay"),
+    ("ML Engineer", ["Python", "PyTorch", "CUDA"], None),
+    ("Senior SWE", ["Go", "Kubernetes"], "Stripe"),
+    ("Senior Software Engineer", ["Go", "Kubernetes", "Kafka"], "Razorpay"),
+    ("Data Engineer", ["Spark", "Kafka", "SQL"], None),
+]
+REQUIREMENTS = [("backend engineer", None), ("Backend Engineer", "stripe"), ("senior software engineer", "Stripe")]
+PATHS = [
+    [["SWE I", 1.0], ["SWE II", 2.0], ["Senior SWE", 3.0], ["Staff Engineer", 4.0]],
+    [["Backend Engineer", 1.5], ["Senior Software Engineer", 2.5], ["Staff Engineer", 3.0], ["Principal Engineer", 5.0]],
+    [["ML Engineer", 2.0], ["Senior ML Engineer", 3.0]],
+    [["Data Engineer", 2.0], ["Backend Engineer", 1.0]],
+]
+SIMILAR = {
+    "backend engineer": [("senior software engineer", 0.61), ("data engineer", 0.42)],
+    "ml engineer": [("backend engineer", 0.3)],
+    "data engineer": [("backend engineer", 0.42), ("ml engineer", 0.2)],
+}
+QUERIES = [["python", "go"], ["Kafka"], ["PyTorch", "CUDA", "python"], ["Kubernetes", "go", "go"], ["cobol"]]
+
+
+def _normalize(trajectories):
+    return [
+        {**t, "score": round(t["score"], 6), "matched": sorted(t["matched"])}
+        for t in trajectories
+    ]
+
+
+async def run_scenario(backend) -> dict:
+    out = {}
+    await backend.setup()
+    for role, skills, company in JDS:
+        await backend.evolve(role, skills, company)
+    await backend.evolve_paths(PATHS)
+    out["stats"] = await backend.stats()
+    out["weights"] = await backend.node_weights("Role")
+    out["before_merge"] = [_normalize(await backend.find_trajectories(q, 5)) for q in QUERIES]
+
+    await backend.merge_nodes("Role", "senior software engineer", ["senior swe"])
+    await backend.merge_nodes("Skill", "sql", ["postgresql"])
+    out["after_merge"] = [_normalize(await backend.find_trajectories(q, 5)) for q in QUERIES]
+    out["requirements"] = [
+        [(r["skill"], round(r["weight"], 6), r["count"]) for r in await backend.role_requirements(role, company, 10)]
+        for role, company in REQUIREMENTS
+    ]
+    out["merged_stats"] = await backend.stats()
+
+    vectors = await backend.role_skill_vectors()
+    out["vectors"] = {r: {k: round(w, 6) for k, w in v.items()} for r, v in vectors.items()}
+    await backend.store_similar_roles(SIMILAR)
+    out["similar"] = [await backend.similar_roles(seeds, 5) for seeds in (["backend engineer"], ["ml engineer", "data engineer"])]
+    out["walks"] = [await backend.walk(r) for r in ("swe i", "data engineer", "unknown role")]
+
+    out["pruned"] = await backend.prune_edges(2, int(time.time() * 1000) + 60_000)
+    out["after_prune"] = [_normalize(await backend.find_trajectories(q, 5)) for q in QUERIES]
+    out["pruned_stats"] = await backend.stats()
+    return out
+
+
+async def _wipe_neo4j(backend: Neo4jBackend):
+    async with backend._get_driver().session() as s:
+        await s.run("MATCH (n) WHERE n:Role OR n:Skill DETACH DELETE n")
+
+
+async def main(args):
+    results = {}
+
+    path = os.path.join(tempfile.mkdtemp(), "graph.db")
+    local = LocalBackend(path)
+    try:
+        results["local"] = await run_scenario(local)
+    finally:
+        await local.close()
+
+    if args.neo4j:
+        neo = Neo4jBackend()
+        try:
+            await _wipe_neo4j(neo)
+            results["neo4j"] = await run_scenario(neo)
+            await _wipe_neo4j(neo)
+        finally:
+            await neo.close()
+
+    if len(results) < 2:
+        print(json.dumps(results["local"], indent=2))
+        print("Only the local backend ran; pass --neo4j to compare against Neo4j.")
+        return 0
+
+    failures = 0
+    for step in results["local"]:
+        if results["local"][step] != results["neo4j"][step]:
+            failures += 1
+            print(f"MISMATCH {step}:\n  local: {results['local'][step]}\n  neo4j: {results['neo4j'][step]}")
+        else:
+            print(f"ok       {step}")
+    print(f"{len(results['local']) - failures}/{len(results['local'])} steps identical.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Graph backend conformance check.")
+    parser.add_argument("--neo4j", action="store_true", help="Also run against NEO4J_URI (wipes Role/Skill nodes).")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,129 @@
+"""
+loadtest.py — Drive a running backend and report latency and Mongo round trips.
+
+Logs in once as LOADTEST_EMAIL / LOADTEST_PASSWORD, then fires authenticated GETs
+at the chosen endpoints with fixed concurrency. Mongo `serverStatus` opcounters are
+sampled before and after, so the report shows database operations per request
+(run the server once with USER_CACHE_TTL=0 for the uncached baseline).
+
+--login-storm N repeats the read run while N concurrent logins hammer bcrypt, and
+compares the reads' p99 with and without the storm.
+
+    python loadtest.py --requests 500 --concurrency 20
+    python loadtest.py --endpoint /users/me --endpoint /career/tree
+    python loadtest.py --endpoint /personality/questions --login-storm 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+load_dotenv()
+
+BASE_URL = os.getenv("LOADTEST_BASE_URL", "http://localhost:8000")
+
+
+async def _opcounters(mongo) -> Dict[str, int]:
+    status = await mongo.admin.command("serverStatus")
+    return {k: int(v) for k, v in status["opcounters"].items()}
+
+
+async def _login(client: httpx.AsyncClient) -> str:
+    res = await client.post("/auth/login", json={
+        "email": os.getenv("LOADTEST_EMAIL", "demo@horizon.com"),
+        "password": os.getenv("LOADTEST_PASSWORD", ""),
+    })
+    res.raise_for_status()
+    return res.json()["access_token"]
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run_reads(client: httpx.AsyncClient, token: str, endpoints: List[str], n: int, concurrency: int) -> Dict[str, List[float]]:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: Dict[str, List[float]] = {e: [] for e in endpoints}
+
+    async def one(i: int):
+        endpoint = endpoints[i % len(endpoints)]
+        async with sem:
+            start = time.perf_counter()
+            res = await client.get(endpoint, headers={"Authorization": f"Bearer {token}"})
+            latencies[endpoint].append((time.perf_counter() - start) * 1000)
+            if res.status_code >= 500:
+                print(f"  {endpoint} -> {res.status_code}")
+
+    await asyncio.gather(*[one(i) for i in range(n)])
+    return latencies
+
+
+async def login_storm(client: httpx.AsyncClient, n: int) -> Dict[int, int]:
+    """n concurrent logins; returns status code counts (503 = shed by bcrypt backpressure)."""
+    async def one():
+        try:
+            return (await client.post("/auth/login", json={
+                "email": os.getenv("LOADTEST_EMAIL", "demo@horizon.com"),
+                "password": os.getenv("LOADTEST_PASSWORD", ""),
+            })).status_code
+        except httpx.HTTPError:
+            return 0
+
+    codes: Dict[int, int] = {}
+    for code in await asyncio.gather(*[one() for _ in range(n)]):
+        codes[code] = codes.get(code, 0) + 1
+    return codes
+
+
+def report(latencies: Dict[str, List[float]]):
+    for endpoint, values in latencies.items():
+        if values:
+            print(f"  {endpoint:<24} n={len(values):<5} p50 {statistics.median(values):7.1f}ms "
+                  f"p99 {_pct(values, 0.99):7.1f}ms")
+
+
+async def main(args):
+    mongo = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=60) as client:
+        token = await _login(client)
+        before = await _opcounters(mongo)
+        start = time.perf_counter()
+        latencies = await run_reads(client, token, args.endpoint, args.requests, args.concurrency)
+        elapsed = time.perf_counter() - start
+        after = await _opcounters(mongo)
+
+    print(f"{args.requests} requests in {elapsed:.2f}s ({args.requests / elapsed:.0f} req/s), concurrency {args.concurrency}")
+    report(latencies)
+    ops = {k: after[k] - before[k] for k in after if after[k] != before[k]}
+    reads = ops.get("query", 0) + ops.get("getmore", 0)
+    print(f"  Mongo ops: {ops} -> {reads / args.requests:.2f} reads/request")
+
+    if args.login_storm:
+        async with httpx.AsyncClient(base_url=BASE_URL, timeout=60) as client:
+            storm = asyncio.create_task(login_storm(client, args.login_storm))
+            stormed = await run_reads(client, token, args.endpoint, args.requests, args.concurrency)
+            codes = await storm
+        print(f"During a {args.login_storm}-login storm (login status codes {codes}):")
+        report(stormed)
+        for endpoint in args.endpoint:
+            print(f"  {endpoint:<24} p99 {_pct(latencies[endpoint], 0.99):7.1f}ms -> {_pct(stormed[endpoint], 0.99):7.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test authenticated read endpoints.")
+    parser.add_argument("--endpoint", action="append", help="Repeatable; default /users/me.")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--login-storm", type=int, default=0, help="Concurrent logins to fire during a second read run.")
+    args = parser.parse_args()
+    args.endpoint = args.endpoint or ["/users/me"]
+    asyncio.run(main(args))
@@ -0,0 +1,389 @@
+"""
+local_graph.py — Embedded graph backend persisted to a single SQLite file.
+
+Implements the same contract as the Neo4j backend in neo_graph.py so the tree and
+discover pipelines run without a live Neo4j (GRAPH_BACKEND=local). Role and Skill
+nodes live in their own tables; REQUIRES and TRANSITIONS_TO are edge tables keyed
+by (source, target). All SQLite work runs in a worker thread.
+"""
+import os
+import sqlite3
+import asyncio
+import threading
+import time
+from typing import List, Dict, Any, Tuple, Optional
+
+from neo_graph import GraphBackend
+
+LOCAL_GRAPH_PATH = os.getenv("GRAPH_LOCAL_PATH", "./data/graph.db")
+MAX_HOPS = 15
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS roles  (name TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS skills (name TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS requires (
+    role TEXT NOT NULL, skill TEXT NOT NULL,
+    weight REAL NOT NULL, count INTEGER NOT NULL, updated_at INTEGER,
+    PRIMARY KEY (role, skill)
+);
+CREATE TABLE IF NOT EXISTS transitions (
+    src TEXT NOT NULL, dst TEXT NOT NULL,
+    count INTEGER NOT NULL, years REAL, updated_at INTEGER,
+    PRIMARY KEY (src, dst)
+);
+CREATE TABLE IF NOT EXISTS requires_company (
+    role TEXT NOT NULL, skill TEXT NOT NULL, company TEXT NOT NULL,
+    PRIMARY KEY (role, skill, company)
+);
+CREATE TABLE IF NOT EXISTS similar (
+    src TEXT NOT NULL, dst TEXT NOT NULL, score REAL NOT NULL,
+    PRIMARY KEY (src, dst)
+);
+CREATE INDEX IF NOT EXISTS requires_skill ON requires (skill);
+CREATE INDEX IF NOT EXISTS transitions_dst ON transitions (dst);
+"""
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class LocalBackend(GraphBackend):
+
+    def __init__(self, path: str = None):
+        self._path = path or LOCAL_GRAPH_PATH
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if os.path.dirname(self._path):
+                os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            self._conn = sqlite3.connect(self._path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    async def _run(self, fn, *args):
+        def _locked():
+            with self._lock:
+                db = self._db()
+                try:
+                    out = fn(db, *args)
+                    db.commit()
+                    return out
+                except Exception:
+                    db.rollback()
+                    raise
+        return await asyncio.to_thread(_locked)
+
+    async def setup(self):
+        await self._run(lambda db: None)
+
+    async def close(self):
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                finally:
+                    self._conn = None
+
+    # ── Writes ────────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _evolve(db, role: str, skills: List[str], company: Optional[str]):
+        role, now = role.lower(), _now_ms()
+        db.execute("INSERT OR IGNORE INTO roles VALUES (?)", (role,))
+        for raw in skills:
+            skill = raw.lower()
+            db.execute("INSERT OR IGNORE INTO skills VALUES (?)", (skill,))
+            db.execute(
+                """
+                INSERT INTO requires VALUES (?, ?, 1.0, 1, ?)
+                ON CONFLICT (role, skill) DO UPDATE SET
+                    count = count + 1, weight = weight + 0.1, updated_at = excluded.updated_at
+                """,
+                (role, skill, now),
+            )
+            if company is not None:
+                db.execute("INSERT OR IGNORE INTO requires_company VALUES (?, ?, ?)", (role, skill, company.lower()))
+
+    async def evolve(self, role: str, skills: List[str], company: Optional[str] = None):
+        await self._run(self._evolve, role, skills, company)
+
+    @staticmethod
+    def _evolve_paths(db, paths: List[List[Tuple[str, float]]]):
+        now = _now_ms()
+        for path in paths:
+            for i in range(len(path) - 1):
+                src, dst = path[i][0].lower(), path[i + 1][0].lower()
+                years = path[i][1]
+                db.executemany("INSERT OR IGNORE INTO roles VALUES (?)", [(src,), (dst,)])
+                db.execute(
+                    """
+                    INSERT INTO transitions VALUES (?, ?, 1, ?, ?)
+                    ON CONFLICT (src, dst) DO UPDATE SET
+                        count = count + 1,
+                        years = (COALESCE(years, 1.0) * 0.8) + (excluded.years * 0.2),
+                        updated_at = excluded.updated_at
+                    """,
+                    (src, dst, years, now),
+                )
+
+    async def evolve_paths(self, paths: List[List[Tuple[str, float]]]):
+        await self._run(self._evolve_paths, paths)
+
+    # ── Reads ─────────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _longest_walk(db, start: str) -> List[str]:
+        """Longest TRANSITIONS_TO walk (no edge reused, <= MAX_HOPS) from `start`."""
+        adjacency: Dict[str, List[str]] = {}
+
+        def successors(node):
+            if node not in adjacency:
+                rows = db.execute("SELECT dst FROM transitions WHERE src = ? ORDER BY dst", (node,))
+                adjacency[node] = [r["dst"] for r in rows]
+            return adjacency[node]
+
+        best = [start]
+        stack = [(start, [start], frozenset())]
+        while stack:
+            node, walk, used = stack.pop()
+            if len(walk) > len(best):
+                best = walk
+            if len(walk) - 1 >= MAX_HOPS:
+                continue
+            for nxt in reversed(successors(node)):
+                edge = (node, nxt)
+                if edge not in used:
+                    stack.append((nxt, walk + [nxt], used | {edge}))
+        return best
+
+    @classmethod
+    def _find_trajectories(cls, db, skills: List[str], limit: int) -> List[Dict[str, Any]]:
+        lowered = [s.lower() for s in skills]
+        if not lowered:
+            return []
+        marks = ",".join("?" * len(set(lowered)))
+        edges: Dict[str, List[sqlite3.Row]] = {}
+        for row in db.execute(f"SELECT role, skill, weight FROM requires WHERE skill IN ({marks})", list(set(lowered))):
+            edges.setdefault(row["skill"], []).append(row)
+
+        scores: Dict[str, float] = {}
+        matched: Dict[str, List[str]] = {}
+        for skill in lowered:  # duplicates count twice, as UNWIND does
+            for row in edges.get(skill, []):
+                scores[row["role"]] = scores.get(row["role"], 0.0) + row["weight"]
+                matched.setdefault(row["role"], []).append(skill)
+
+        top = sorted(scores, key=lambda r: (-scores[r], r))[:limit]
+        results = []
+        for role in top:
+            trajectory = cls._longest_walk(db, role)
+            results.append({
+                "role": role,
+                "score": scores[role],
+                "matched": matched[role],
+                "trajectory": trajectory,
+                "terminal": trajectory[-1],
+            })
+        return results
+
+    async def find_trajectories(self, skills: List[str], limit: int) -> List[Dict[str, Any]]:
+        return await self._run(self._find_trajectories, skills, limit)
+
+    @staticmethod
+    def _role_requirements(db, role: str, company: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        sql = "SELECT skill, weight, count, updated_at FROM requires e WHERE role = ?"
+        params: list = [role.lower()]
+        if company is not None:
+            sql += " AND EXISTS (SELECT 1 FROM requires_company c WHERE c.role = e.role AND c.skill = e.skill AND c.company = ?)"
+            params.append(company.lower())
+        sql += " ORDER BY weight DESC, skill LIMIT ?"
+        return [dict(r) for r in db.execute(sql, params + [limit])]
+
+    async def role_requirements(self, role: str, company: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        return await self._run(self._role_requirements, role, company, limit)
+
+    async def walk(self, role: str) -> List[str]:
+        return await self._run(self._longest_walk, role)
+
+    @staticmethod
+    def _similar_roles(db, roles: List[str], limit: int) -> List[Dict[str, Any]]:
+        marks = ",".join("?" * len(roles))
+        best: Dict[str, Dict[str, Any]] = {}
+        rows = db.execute(
+            f"SELECT src, dst, score FROM similar WHERE src IN ({marks}) AND dst NOT IN ({marks}) ORDER BY score DESC, src",
+            list(roles) + list(roles),
+        )
+        for row in rows:
+            best.setdefault(row["dst"], {"role": row["dst"], "score": row["score"], "via": row["src"]})
+        return sorted(best.values(), key=lambda r: (-r["score"], r["role"]))[:limit]
+
+    async def similar_roles(self, roles: List[str], limit: int) -> List[Dict[str, Any]]:
+        return await self._run(self._similar_roles, roles, limit)
+
+    @staticmethod
+    def _role_skill_vectors(db) -> Dict[str, Dict[str, float]]:
+        vectors: Dict[str, Dict[str, float]] = {}
+        for row in db.execute("SELECT role, skill, weight FROM requires"):
+            vectors.setdefault(row["role"], {})[row["skill"]] = row["weight"]
+        return vectors
+
+    async def role_skill_vectors(self) -> Dict[str, Dict[str, float]]:
+        return await self._run(self._role_skill_vectors)
+
+    @staticmethod
+    def _store_similar_roles(db, neighbors: Dict[str, List[Tuple[str, float]]]):
+        db.execute("DELETE FROM similar")
+        db.executemany(
+            "INSERT OR REPLACE INTO similar SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM roles WHERE name = ?) AND EXISTS (SELECT 1 FROM roles WHERE name = ?)",
+            [(a, b, score, a, b) for a, nbrs in neighbors.items() for b, score in nbrs],
+        )
+
+    async def store_similar_roles(self, neighbors: Dict[str, List[Tuple[str, float]]]):
+        await self._run(self._store_similar_roles, neighbors)
+
+    # ── Maintenance ───────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _stats(db) -> Dict[str, int]:
+        count = lambda table: db.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+        return {
+            "roles": count("roles"),
+            "skills": count("skills"),
+            "requires": count("requires"),
+            "transitions": count("transitions"),
+        }
+
+    async def stats(self) -> Dict[str, int]:
+        return await self._run(self._stats)
+
+    @staticmethod
+    def _node_weights(db, label: str) -> List[Dict[str, Any]]:
+        if label == "Role":
+            sql = """
+                SELECT r.name AS name,
+                       COALESCE((SELECT sum(count) FROM requires WHERE role = r.name), 0)
+                     + COALESCE((SELECT sum(count) FROM transitions WHERE src = r.name), 0)
+                     + COALESCE((SELECT sum(count) FROM transitions WHERE dst = r.name), 0) AS weight
+                FROM roles r
+            """
+        else:
+            sql = """
+                SELECT s.name AS name,
+                       COALESCE((SELECT sum(count) FROM requires WHERE skill = s.name), 0) AS weight
+                FROM skills s
+            """
+        return [dict(r) for r in db.execute(sql + " ORDER BY weight DESC, name")]
+
+    async def node_weights(self, label: str) -> List[Dict[str, Any]]:
+        return await self._run(self._node_weights, label)
+
+    @staticmethod
+    def _merge_nodes(db, label: str, canonical: str, aliases: List[str]):
+        if label == "Role":
+            db.execute("INSERT OR IGNORE INTO roles VALUES (?)", (canonical,))
+            for alias in aliases:
+                db.execute(
+                    """
+                    INSERT INTO requires (role, skill, weight, count, updated_at)
+                    SELECT ?, skill, weight, count, updated_at FROM requires WHERE role = ? AND true
+                    ON CONFLICT (role, skill) DO UPDATE SET
+                        weight = weight + excluded.weight,
+                        count = count + excluded.count,
+                        updated_at = max(COALESCE(updated_at, 0), COALESCE(excluded.updated_at, 0))
+                    """,
+                    (canonical, alias),
+                )
+                db.execute(
+                    "INSERT OR IGNORE INTO requires_company SELECT ?, skill, company FROM requires_company WHERE role = ?",
+                    (canonical, alias),
+                )
+                for sql in (
+                    "SELECT ? AS src, dst, count, years, updated_at FROM transitions WHERE src = ? AND dst <> ?",
+                    "SELECT src, ? AS dst, count, years, updated_at FROM transitions WHERE dst = ? AND src <> ?",
+                ):
+                    db.execute(
+                        f"""
+                        INSERT INTO transitions (src, dst, count, years, updated_at)
+                        {sql} AND true
+                        ON CONFLICT (src, dst) DO UPDATE SET
+                            years = (COALESCE(years, 1.0) * count + COALESCE(excluded.years, 1.0) * excluded.count)
+                                    / (count + excluded.count),
+                            count = count + excluded.count,
+                            updated_at = max(COALESCE(updated_at, 0), COALESCE(excluded.updated_at, 0))
+                        """,
+                        (canonical, alias, canonical),
+                    )
+                db.execute("DELETE FROM requires WHERE role = ?", (alias,))
+                db.execute("DELETE FROM requires_company WHERE role = ?", (alias,))
+                db.execute("DELETE FROM transitions WHERE src = ? OR dst = ?", (alias, alias))
+                db.execute("DELETE FROM similar WHERE src = ? OR dst = ?", (alias, alias))
+                db.execute("DELETE FROM roles WHERE name = ?", (alias,))
+        else:
+            db.execute("INSERT OR IGNORE INTO skills VALUES (?)", (canonical,))
+            for alias in aliases:
+                db.execute(
+                    """
+                    INSERT INTO requires (role, skill, weight, count, updated_at)
+                    SELECT role, ?, weight, count, updated_at FROM requires WHERE skill = ? AND true
+                    ON CONFLICT (role, skill) DO UPDATE SET
+                        weight = weight + excluded.weight,
+                        count = count + excluded.count,
+                        updated_at = max(COALESCE(updated_at, 0), COALESCE(excluded.updated_at, 0))
+                    """,
+                    (canonical, alias),
+                )
+                db.execute(
+                    "INSERT OR IGNORE INTO requires_company SELECT role, ?, company FROM requires_company WHERE skill = ?",
+                    (canonical, alias),
+                )
+                db.execute("DELETE FROM requires WHERE skill = ?", (alias,))
+                db.execute("DELETE FROM requires_company WHERE skill = ?", (alias,))
+                db.execute("DELETE FROM skills WHERE name = ?", (alias,))
+
+    async def merge_nodes(self, label: str, canonical: str, aliases: List[str]):
+        await self._run(self._merge_nodes, label, canonical, aliases)
+
+    @classmethod
+    def _merge_many(cls, db, label: str, groups: Dict[str, List[str]]):
+        for canonical, aliases in groups.items():
+            cls._merge_nodes(db, label, canonical, aliases)
+
+    async def merge_many(self, label: str, groups: Dict[str, List[str]]):
+        await self._run(self._merge_many, label, groups)
+
+    @staticmethod
+    def _prune_edges(db, min_count: int, stale_before_ms: int) -> Dict[str, int]:
+        pruned = {}
+        for table, key in (("requires", "requires"), ("transitions", "transitions_to")):
+            cur = db.execute(
+                f"DELETE FROM {table} WHERE COALESCE(count, 0) < ? AND COALESCE(updated_at, 0) < ?",
+                (min_count, stale_before_ms),
+            )
+            pruned[key] = cur.rowcount
+        db.execute(
+            """
+            DELETE FROM requires_company WHERE NOT EXISTS (
+                SELECT 1 FROM requires e WHERE e.role = requires_company.role AND e.skill = requires_company.skill
+            )
+            """
+        )
+        orphans = db.execute(
+            """
+            DELETE FROM roles WHERE name NOT IN (SELECT role FROM requires)
+                                AND name NOT IN (SELECT src FROM transitions)
+                                AND name NOT IN (SELECT dst FROM transitions)
+                                AND name NOT IN (SELECT src FROM similar)
+                                AND name NOT IN (SELECT dst FROM similar)
+            """
+        ).rowcount
+        orphans += db.execute("DELETE FROM skills WHERE name NOT IN (SELECT skill FROM requires)").rowcount
+        pruned["orphans"] = orphans
+        return pruned
+
+    async def prune_edges(self, min_count: int, stale_before_ms: int) -> Dict[str, int]:
+        return await self._run(self._prune_edges, min_count, stale_before_ms)
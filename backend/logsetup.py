@@ -0,0 +1,148 @@
+"""
+logsetup.py — Non-blocking, structured logging for the API process.
+
+Loggers only enqueue records (QueueHandler); a listener thread formats and writes them,
+so a slow stdout never stalls the event loop. Records are one JSON object per line
+(LOG_FORMAT=json, the default) carrying the current request_id and run_id, the trace
+id when tracing is on, and any `extra=` fields:
+
+    log.info(f"[cost] {op} ...", extra={"op": op, "cost_inr": cost})
+
+Tracebacks travel to the listener as text in a separate field ("exc" in JSON) rather
+than being folded into the message. uvicorn's own loggers go through the same queue.
+
+DEBUG records carry full payloads, so they are sampled per request: LOG_DEBUG_SAMPLE
+is the fraction of requests whose debug records are kept (all or none of them).
+"""
+import os
+import sys
+import copy
+import json
+import zlib
+import queue
+import atexit
+import logging
+import datetime
+import contextvars
+import logging.handlers
+from typing import Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_DEBUG_SAMPLE = float(os.getenv("LOG_DEBUG_SAMPLE", "0.01"))
+
+request_id = contextvars.ContextVar("request_id", default=None)
+run_id = contextvars.ContextVar("run_id", default=None)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+# Everything a bare LogRecord has; whatever else is on a record came in through extra=
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id", "run_id", "trace_id", "exc"}
+
+
+class ContextFilter(logging.Filter):
+    """Stamps ids on the record in the calling task, before it crosses to the listener thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        record.run_id = run_id.get()
+        record.trace_id = _trace_id()
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """Keeps DEBUG records for a stable LOG_DEBUG_SAMPLE fraction of request ids."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        rid = getattr(record, "request_id", None)
+        if rid is None:
+            return LOG_DEBUG_SAMPLE >= 1.0
+        return zlib.crc32(rid.encode()) % 10_000 < LOG_DEBUG_SAMPLE * 10_000
+
+
+class ExcQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps the formatted traceback in `record.exc` instead of merging it into msg."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.exc = None
+        if record.exc_info:
+            record.exc = logging.Formatter().formatException(record.exc_info)
+        if record.stack_info:
+            record.exc = "\n".join(filter(None, (record.exc, record.stack_info)))
+        record.message = record.msg = record.getMessage()
+        record.args = record.exc_info = record.exc_text = record.stack_info = None
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = super().format(record)
+        exc = getattr(record, "exc", None)
+        return f"{out}\n{exc}" if exc else out
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for k in ("request_id", "run_id", "trace_id"):
+            if getattr(record, k, None):
+                out[k] = getattr(record, k)
+        out.update({k: v for k, v in vars(record).items() if k not in _RESERVED})
+        exc = getattr(record, "exc", None) or (self.formatException(record.exc_info) if record.exc_info else None)
+        if exc:
+            out["exc"] = exc
+        return json.dumps(out, default=str)
+
+
+def _trace_id() -> Optional[str]:
+    try:
+        from opentelemetry import trace
+        ctx = trace.get_current_span().get_span_context()
+        return format(ctx.trace_id, "032x") if ctx.is_valid else None
+    except ImportError:
+        return None
+
+
+def setup(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """Route the root logger through a queue; idempotent."""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter(
+        "%(levelname)s:%(name)s:%(request_id)s: %(message)s"))
+
+    q: queue.SimpleQueue = queue.SimpleQueue()
+    handler = ExcQueueHandler(q)
+    handler.addFilter(ContextFilter())
+    handler.addFilter(DebugSampler())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    # uvicorn installs its own synchronous stream handlers; send those loggers through the queue too
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uv = logging.getLogger(name)
+        uv.handlers[:] = []
+        uv.propagate = True
+
+    _listener = logging.handlers.QueueListener(q, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown)
+
+
+def shutdown():
+    """Drain the queue and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
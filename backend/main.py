@@ -1,12 +1,12 @@
 import json
 import hashlib
+import hmac
 import asyncio
 import os
 import time
 import datetime
 import logging
 import uuid
-import bcrypt
 from contextlib import asynccontextmanager
 from typing import List, Optional, Dict, Any
 
@@ -14,7 +14,7 @@ from fastapi import FastAPI, Depends, HTTPException, Header, UploadFile, File, R
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import random
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel, Field
 import redis.asyncio as aioredis
 from tavily import TavilyClient
@@ -22,19 +22,26 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from onboarding.mbti_questionnare import prepare_questions, evaluate_answers
-from onboarding.user import insert_user_to_db, get_user_by_email
+from onboarding.mbti_questionnare import prepare_questions, evaluate_answers, load_bank as load_mbti_bank
+from onboarding import user as users
 from onboarding.models import RegisterReq, Answers, User, LoginReq, SendOtpReq
 from onboarding.resume import resume_router
+from onboarding import extract
+from onboarding.normalizer import service as embed_service
 
 import ops
+import cache
+import logsetup
+import metering
+import metrics
+import tracing
 import neo_graph as graph
 import mailer
 from scoring import profile_hash as _profile_hash
 from discover import generate_cards
 from tree import generate_tree
 
-logging.basicConfig(level=logging.INFO)
+logsetup.setup()
 logging.getLogger("httpx").setLevel(logging.WARNING)
 logging.getLogger("neo4j.notifications").setLevel(logging.ERROR)
 log = logging.getLogger("main")
@@ -49,22 +56,50 @@ _redis: aioredis.Redis = None
 async def lifespan(app: FastAPI):
     global _redis
     log.info("Starting up...")
+    tracing.setup()
     _redis = aioredis.from_url(os.getenv("REDIS_URL"), encoding="utf-8", decode_responses=True)
+    _redis_bin = aioredis.from_url(os.getenv("REDIS_URL"))  # codec-encoded cache values
+    cache.bind_binary(_redis_bin)
+    users.setup(_redis)
     try:
         await ops.get_latest_pricing(_redis)
     except Exception as e:
         log.warning(f"Failed to fetch initial OpenRouter pricing: {e}")
     try:
-        await graph.setup()
+        await users.ensure_indexes()
+    except Exception as e:
+        log.warning(f"User index setup warning: {e}")
+    try:
+        await graph.setup(_redis)
     except Exception as e:
         log.warning(f"Graph setup warning: {e}")
+    try:
+        await asyncio.to_thread(load_mbti_bank)
+    except Exception as e:
+        log.warning(f"MBTI bank load warning: {e}")
+    try:
+        await embed_service.preload()
+    except Exception as e:
+        log.warning(f"Embedding preload warning: {e}")
+    lag_task = asyncio.create_task(ops.watch_loop_lag()) if os.getenv("LOOP_LAG_MONITOR") == "True" else None
+    ledger_task = asyncio.create_task(ops.flush_cost_ledger(_redis))
+    invalidation_task = asyncio.create_task(cache.listen(_redis))
     yield
+    invalidation_task.cancel()
+    if lag_task:
+        lag_task.cancel()
+    ledger_task.cancel()
+    await ops.drain_cost_ledger(_redis)
+    await ops.drain_stats(_redis)
+    extract.shutdown()
+    tracing.shutdown()
     try:
         await graph.close()
     except Exception as e:
         log.warning(f"Graph close warning: {e}")
     if _redis:
         await _redis.aclose()
+    await _redis_bin.aclose()
     log.info("Shutdown complete.")
 
 
@@ -85,7 +120,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["x-credits-remaining", "x-cost-this-run"],
+    expose_headers=["x-credits-remaining", "x-cost-this-run", "x-request-id"],
 )
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -95,6 +130,12 @@ def get_redis() -> aioredis.Redis:
     return _redis
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
+
+
 @app.middleware("http")
 async def metering_middleware(request: Request, call_next):
     ops.current_request_cost.set([0.0])
@@ -106,34 +147,49 @@ async def metering_middleware(request: Request, call_next):
     if not rc:
         return await call_next(request)
         
-    key = f"horizon:metering:{session_id}"
-    balance_str = await rc.get(key)
-    if balance_str is None:
-        await rc.set(key, 100.0)
-        balance = 100.0
-    else:
-        balance = float(balance_str)
-        
-    if balance <= 0.0:
+    admitted, balance, reserved = await metering.reserve(rc, session_id, metering.estimate(request.url.path))
+    if not admitted:
         return JSONResponse({"detail": "Payment Required"}, status_code=402)
-        
-    response = await call_next(request)
-    
-    cost_in_inr = ops.current_request_cost.get()[0]
-    # 1 credit = roughly 0.01 INR? Wait, what ratio? 
-    # If cost is 0.03 INR, and ratio is 100, then credits_used = 3.0 credits.
-    # The previous code used CREDIT_USD_RATIO which is misleading if cost is in INR.
-    # Let's fix the env variable name to CREDIT_MULTIPLIER as the user previously used.
-    # Let's check what it was in demo_metering_middleware: os.getenv("CREDIT_MULTIPLIER", "1.0")
-    # We will stick to CREDIT_MULTIPLIER.
-    multiplier = float(os.getenv("CREDIT_MULTIPLIER", "1.0"))
-    credits_used = cost_in_inr * multiplier
-    
-    new_balance = await rc.incrbyfloat(key, -credits_used)
-    
+
+    try:
+        response = await call_next(request)
+    finally:
+        credits_used = metering.credits_for(ops.current_request_cost.get()[0])
+        new_balance = await metering.settle(rc, session_id, reserved, credits_used, balance)
+
     response.headers["x-credits-remaining"] = str(round(new_balance, 2))
     response.headers["x-cost-this-run"] = str(round(credits_used, 2))
-    
+
+    return response
+
+
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    # Registered after metering so it wraps it: 402s and the reserve/settle round trips are measured
+    metrics.IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status = 500
+    with tracing.span(request.method, kind=tracing.SpanKind.SERVER, **{"http.method": request.method}) as span:
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            metrics.IN_FLIGHT.dec()
+            route = request.scope.get("route")
+            path = route.path if route else "unmatched"
+            span.update_name(f"{request.method} {path}")
+            span.set_attributes({"http.route": path, "http.status_code": status})
+            metrics.REQUEST_SECONDS.labels(request.method, path, str(status)).observe(time.perf_counter() - start)
+
+
+@app.middleware("http")
+async def request_context_middleware(request: Request, call_next):
+    # Outermost middleware: every log record and span below carries this id
+    rid = request.headers.get("x-request-id") or uuid.uuid4().hex
+    logsetup.request_id.set(rid)
+    response = await call_next(request)
+    response.headers["x-request-id"] = rid
     return response
 
 
@@ -160,7 +216,7 @@ app.include_router(resume_router, prefix="/auth")
 @app.post("/auth/send-otp")
 async def send_otp_endpoint(req: SendOtpReq, rc: aioredis.Redis = Depends(get_redis)):
     try:
-        if get_user_by_email(req.email):
+        if await users.email_exists(req.email):
             return JSONResponse({"msg": "User already exists."}, status_code=400)
         
         # Generate 6 digit OTP
@@ -182,7 +238,7 @@ async def send_otp_endpoint(req: SendOtpReq, rc: aioredis.Redis = Depends(get_re
 @app.post("/auth/register")
 async def register(user: RegisterReq, rc: aioredis.Redis = Depends(get_redis)):
     try:
-        if get_user_by_email(user.email):
+        if await users.email_exists(user.email):
             return JSONResponse({"msg": "User already exists."}, status_code=400)
             
         # Verify OTP
@@ -193,11 +249,13 @@ async def register(user: RegisterReq, rc: aioredis.Redis = Depends(get_redis)):
         if not stored_otp or stored_otp != user.otp:
             return JSONResponse({"msg": "Invalid or expired OTP."}, status_code=400)
             
+        # Hash before consuming the OTP so a 503 under load doesn't burn it
+        hashed = await ops.hash_password(user.password)
+
         # OTP is valid, remove it
         await rc.delete(f"otp:{user.email}")
         
         user_id = str(uuid.uuid4())
-        hashed = bcrypt.hashpw(user.password.encode(), bcrypt.gensalt()).decode()
         avatar_idx = random.randint(1, 30)
         final_user = User(
             id=user_id, 
@@ -207,11 +265,16 @@ async def register(user: RegisterReq, rc: aioredis.Redis = Depends(get_redis)):
             profile=user.profile, 
             personality=user.personality
         )
-        insert_user_to_db(final_user)
+        try:
+            await users.insert_user_to_db(final_user)
+        except users.UserExists:
+            return JSONResponse({"msg": "User already exists."}, status_code=400)
         token_data = await ops.issue_token(user_id)
         name = (user.profile.name if user.profile and hasattr(user.profile, 'name') and user.profile.name else user.email)
         asyncio.create_task(mailer.send_welcome(user.email, name))
         return JSONResponse({"user_id": user_id, "access_token": token_data["access_token"]})
+    except ops.Overloaded:
+        return JSONResponse({"msg": "Too many sign-ups right now, please retry."}, status_code=503, headers={"Retry-After": "1"})
     except Exception as e:
         log.error(f"Register failed: {e}")
         return JSONResponse({"err": "Registration failed."}, status_code=500)
@@ -220,8 +283,8 @@ async def register(user: RegisterReq, rc: aioredis.Redis = Depends(get_redis)):
 @app.post("/auth/login")
 async def login(user: LoginReq):
     try:
-        user_data = await ops.users_col.find_one({"email": user.email})
-        if not user_data or not bcrypt.checkpw(user.password.encode(), user_data["password"].encode()):
+        user_data = await users.get_login(user.email)
+        if not user_data or not await ops.check_password(user.password, user_data["password"]):
             raise HTTPException(401, "Invalid credentials.")
         token_data = await ops.issue_token(user_data["id"])
         if user_data["email"] != "demo@horizon.com":
@@ -229,6 +292,8 @@ async def login(user: LoginReq):
         return JSONResponse({"user_id": user_data["id"], "access_token": token_data["access_token"], "email": user_data["email"]})
     except HTTPException:
         raise
+    except ops.Overloaded:
+        raise HTTPException(503, "Too many sign-ins right now, please retry.", headers={"Retry-After": "1"})
     except Exception as e:
         log.error(f"Login failed: {e}")
         raise HTTPException(500, "Login failed.")
@@ -239,11 +304,9 @@ async def login(user: LoginReq):
 @app.get("/users/me")
 async def get_me(user_id: str = Depends(get_current_user)):
     try:
-        user_doc = await ops.users_col.find_one({"id": user_id})
+        user_doc = await users.get_user(user_id, "me")
         if not user_doc:
             raise HTTPException(404, "User not found.")
-        user_doc.pop("_id", None)
-        user_doc.pop("password", None)
         return JSONResponse({"user": user_doc})
     except HTTPException:
         raise
@@ -258,18 +321,10 @@ async def delete_account(
     user_id: str = Depends(get_current_user),
 ):
     """Permanently delete user account and flush all their cache keys."""
-    result = await ops.users_col.delete_one({"id": user_id})
-    if result.deleted_count == 0:
+    if not await users.delete_user(user_id):
         raise HTTPException(404, "User not found.")
-    # Flush all Redis keys scoped to this user
-    if rc:
-        cursor = 0
-        while True:
-            cursor, keys = await rc.scan(cursor, match=f"horizon:*:{user_id}:*", count=100)
-            if keys:
-                await rc.delete(*keys)
-            if cursor == 0:
-                break
+    # Flush all Redis keys scoped to this user (indexed at write time, no keyspace scan)
+    await cache.invalidate_user(rc, user_id)
     log.info(f"Account deleted: {user_id}")
     return JSONResponse({"msg": "Account deleted."})
 
@@ -291,12 +346,10 @@ from onboarding.models import Profile
 @app.put("/users/me/profile")
 async def update_profile(profile: Profile, user_id: str = Depends(get_current_user)):
     try:
+        if profile.skills:
+            profile.skills = await embed_service.normalize_skills_async(profile.skills)
         profile_data = profile.model_dump()
-        res = await ops.users_col.update_one(
-            {"id": user_id},
-            {"$set": {"profile": profile_data, "profile_hash": _profile_hash(profile_data)}}
-        )
-        if res.matched_count == 0:
+        if not await users.update_fields(user_id, {"profile": profile_data, "profile_hash": _profile_hash(profile_data)}):
             raise HTTPException(404, "User not found.")
         return JSONResponse({"msg": "Profile updated successfully."})
     except HTTPException:
@@ -329,16 +382,37 @@ async def process_personality(user_answers: Answers, user_id: str = Depends(get_
     try:
         scores, persona = evaluate_answers(user_answers=user_answers.answers)
         # Persist as optional self-reported preference — never used for scoring
-        await ops.users_col.update_one(
-            {"id": user_id},
-            {"$set": {"personality_preferences": {"scores": scores, "persona": persona}}}
-        )
+        await users.update_fields(user_id, {"personality_preferences": {"scores": scores, "persona": persona}})
         return JSONResponse({"msg": "Done.", "scores": scores, "persona": persona})
     except Exception as e:
         log.error(f"Personality failed: {e}")
         return JSONResponse({"err": str(e)}, status_code=500)
 
 
+# ── Admin ─────────────────────────────────────────────────────────────────────
+
+def require_admin(x_admin_token: str = Header(None)):
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(404, "Not found.")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(403, "Forbidden.")
+
+
+@app.get("/admin/costs", dependencies=[Depends(require_admin)])
+async def admin_costs(hours: int = 24, op: Optional[str] = None, rc: aioredis.Redis = Depends(get_redis)):
+    """LLM cost and token series per operation and model, from the Redis cost ledger."""
+    if not rc:
+        raise HTTPException(503, "Redis unavailable.")
+    return await ops.cost_series(rc, hours=min(max(hours, 1), 24 * ops.COST_RETENTION_DAYS), op=op)
+
+
+@app.get("/admin/cache", dependencies=[Depends(require_admin)])
+async def admin_cache():
+    """Hit rates per key family and tier for the worker serving this request (all workers: /metrics)."""
+    return {"worker": os.getpid(), "families": cache.stats()}
+
+
 # ── Market Intel ──────────────────────────────────────────────────────────────
 
 class SearchCriteria(BaseModel):
@@ -383,10 +457,12 @@ async def _fetch_company_intel(role: str, company: str, location: str) -> Compan
     for i, key in enumerate(TAVILY_KEYS):
         try:
             client = TavilyClient(api_key=key)
-            res = await asyncio.to_thread(
-                client.search, query=query, search_depth="advanced",
-                max_results=10, exclude_domains=excluded, topic="general",
-            )
+            with metrics.stage("tavily_search", company=company), metrics.outbound("tavily", **{"tavily.key_index": i}):
+                res = await asyncio.to_thread(
+                    client.search, query=query, search_depth="advanced",
+                    max_results=10, exclude_domains=excluded, topic="general",
+                )
+                tracing.annotate(results=len(res.get("results", [])))
             results = res.get("results", [])
             source = f"Tavily (key #{i+1})"
             break
@@ -409,7 +485,7 @@ async def _get_market_intel(criteria: SearchCriteria, rc: aioredis.Redis) -> Mar
 
     for company in criteria.target_companies:
         key = _intel_cache_key(criteria.role, company, criteria.location)
-        cached = await rc.get(key)
+        cached = await cache.get(rc, key)
         if cached:
             log.info(f"Intel cache hit: {company}")
             tasks.append(asyncio.sleep(0, result=CompanyIntel(**json.loads(cached))))
@@ -417,7 +493,7 @@ async def _get_market_intel(criteria: SearchCriteria, rc: aioredis.Redis) -> Mar
             credits += 2
             async def _fetch_and_cache(c=company, k=key):
                 intel = await _fetch_company_intel(criteria.role, c, criteria.location)
-                await rc.setex(k, INTEL_CACHE_TTL, intel.model_dump_json())
+                await cache.set(rc, k, intel.model_dump_json(), INTEL_CACHE_TTL)
                 return intel
             tasks.append(_fetch_and_cache())
 
@@ -449,21 +525,22 @@ async def discover_search(
     current_calls = await rc.incr(rate_key)
     if current_calls == 1:
         await rc.expire(rate_key, 60)
+        await cache.index_user_keys(rc, user_id, rate_key, metering.key(session_id))
     elif current_calls > 5:
         raise HTTPException(429, "Rate limit exceeded. Please wait a minute before searching again.")
 
     import time
     start_time = time.time()
+    from scoring import profile_hash as _ph
+    run_id = _ph({"user": user_id, "criteria": request.search_criteria.model_dump()})
+    logsetup.run_id.set(run_id)
     
-    user_doc = await ops.users_col.find_one({"id": user_id})
+    user_doc = await users.get_user(user_id, "discover")
     if not user_doc:
         raise HTTPException(404, "User not found.")
-    user_doc.pop("_id", None)
     
     cards = await generate_cards(rc, user_doc, request.search_criteria.model_dump(), force_refresh=force_refresh)
     
-    from scoring import profile_hash as _ph
-    run_id = _ph({"user": user_id, "criteria": request.search_criteria.model_dump()})
     latency_ms = (time.time() - start_time) * 1000
     log.info(f"[/discover/search] Completed in {latency_ms:.2f}ms run_id={run_id}")
     
@@ -485,10 +562,9 @@ async def get_career_tree(
     # 1. Fast path: check Redis cache first (no rate limit on cache hits)
     cache_key = f"horizon:tree:v8:{user_id}"
     if rc and not force:
-        cached = await rc.get(cache_key)
-        if cached:
+        result = await cache.get_obj(rc, cache_key)
+        if result:
             log.info(f"[/career/tree] Cache hit for {user_id}")
-            result = json.loads(cached)
             result["latency_ms"] = (time.time() - start_time) * 1000
             return result
 
@@ -500,13 +576,13 @@ async def get_career_tree(
         current_calls = await rc.incr(rate_key)
         if current_calls == 1:
             await rc.expire(rate_key, 180)
+            await cache.index_user_keys(rc, user_id, rate_key, metering.key(session_id))
         elif current_calls > 2:  # allow 2 attempts per 3 minutes to handle retries/double mounts
             raise HTTPException(429, "Rate limit exceeded. Career tree generation requires heavy compute. Please wait 3 minutes before recalibrating.")
 
-    user_doc = await ops.users_col.find_one({"id": user_id})
+    user_doc = await users.get_user(user_id, "tree")
     if not user_doc:
         raise HTTPException(404, "User not found.")
-    user_doc.pop("_id", None)
 
     result = await generate_tree(user_id, user_doc, rc, force_refresh=force)
     if result.get("status") == "error":
@@ -521,4 +597,4 @@ async def get_career_tree(
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None)  # keep logsetup's queue handlers
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""
+metering.py — Demo-session credit metering as two atomic Redis operations.
+
+Before the handler, one Lua call creates the session balance if needed, admits any
+positive balance (as before) and reserves the endpoint's estimated cost, capped at the
+balance. After the handler, a single INCRBYFLOAT refunds the unused part of the
+reservation or charges the overrun. Because check and reserve are one atomic step,
+concurrent expensive requests cannot all pass the balance check on the same credits
+(tests/test_metering.py). Requests with no estimate and no LLM cost stay at one round trip.
+
+    python metering.py --runs 500     # middleware latency vs the old GET/SET/INCRBYFLOAT path
+"""
+import os
+import json
+import logging
+from typing import Tuple
+
+log = logging.getLogger("metering")
+
+METERING_START_BALANCE = float(os.getenv("METERING_START_BALANCE", "100.0"))
+CREDIT_MULTIPLIER = float(os.getenv("CREDIT_MULTIPLIER", "1.0"))
+
+# Credits reserved up front per path, sized to a typical run; override with METERING_ESTIMATES='{"/career/tree": 5}'
+ESTIMATES = {
+    "/career/tree": 3.0,
+    "/discover/search": 4.0,
+    "/auth/parse_resume": 0.5,
+}
+ESTIMATES.update({k: float(v) for k, v in json.loads(os.getenv("METERING_ESTIMATES", "{}")).items()})
+
+# KEYS[1] balance key; ARGV[1] starting balance, ARGV[2] estimate.
+# Any positive balance is admitted and reserves min(estimate, balance), so the reservations
+# of concurrent requests never add up to more than the balance.
+# Returns {admitted, balance after reservation, reserved}; floats travel as strings.
+_RESERVE = """
+local bal = redis.call('GET', KEYS[1])
+if not bal then
+    bal = ARGV[1]
+    redis.call('SET', KEYS[1], bal)
+end
+bal = tonumber(bal)
+if bal <= 0 then
+    return {0, tostring(bal), '0'}
+end
+local est = math.min(tonumber(ARGV[2]), bal)
+if est == 0 then
+    return {1, tostring(bal), '0'}
+end
+return {1, redis.call('INCRBYFLOAT', KEYS[1], -est), tostring(est)}
+"""
+
+_reserve_script = None  # Script for _RESERVE, created once; it runs by EVALSHA and reloads itself on NOSCRIPT
+
+
+def key(session_id: str) -> str:
+    return f"horizon:metering:{session_id}"
+
+
+def estimate(path: str) -> float:
+    return ESTIMATES.get(path.rstrip("/") or "/", 0.0)
+
+
+async def reserve(rc, session_id: str, amount: float) -> Tuple[bool, float, float]:
+    """(admitted, balance after the reservation, amount actually reserved)."""
+    global _reserve_script
+    if _reserve_script is None:
+        _reserve_script = rc.register_script(_RESERVE)
+    admitted, balance, reserved = await _reserve_script(
+        keys=[key(session_id)], args=[METERING_START_BALANCE, amount], client=rc,
+    )
+    return bool(admitted), float(balance), float(reserved)
+
+
+async def settle(rc, session_id: str, reserved: float, used: float, balance: float) -> float:
+    """Refund (reserved > used) or charge (used > reserved) the difference; returns the new balance."""
+    delta = reserved - used
+    if delta == 0:
+        return balance
+    return float(await rc.incrbyfloat(key(session_id), delta))
+
+
+def credits_for(cost_inr: float) -> float:
+    return cost_inr * CREDIT_MULTIPLIER
+
+
+# ── Latency benchmark ─────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    import time
+    import uuid
+    import asyncio
+    import argparse
+    import statistics
+
+    import redis.asyncio as aioredis
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    async def legacy(rc, session_id: str, cost: float):
+        """The previous middleware: GET, maybe SET, then INCRBYFLOAT after the handler."""
+        k = key(session_id)
+        balance_str = await rc.get(k)
+        if balance_str is None:
+            await rc.set(k, METERING_START_BALANCE)
+        await rc.incrbyfloat(k, -cost)
+
+    async def atomic(rc, session_id: str, cost: float):
+        admitted, balance, reserved = await reserve(rc, session_id, cost)
+        await settle(rc, session_id, reserved, cost, balance)
+
+    async def latency(rc, fn, n: int, cost: float):
+        session_id = f"bench-{uuid.uuid4().hex}"
+        await rc.set(key(session_id), 1e12)
+        samples = []
+        for _ in range(n):
+            start = time.perf_counter()
+            await fn(rc, session_id, cost)
+            samples.append((time.perf_counter() - start) * 1000)
+        await rc.delete(key(session_id))
+        return statistics.median(samples)
+
+    async def main(args):
+        rc = aioredis.from_url(os.getenv("REDIS_URL"), encoding="utf-8", decode_responses=True)
+        print("Middleware overhead per request (handler excluded):")
+        for label, fn in (("legacy", legacy), ("atomic", atomic)):
+            print(f"  {label:<7} p50 {await latency(rc, fn, args.runs, args.cost):6.2f}ms")
+        await rc.aclose()
+
+    parser = argparse.ArgumentParser(description="Time the metering middleware's Redis round trips.")
+    parser.add_argument("--cost", type=float, default=3.0)
+    parser.add_argument("--runs", type=int, default=500)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,79 @@
+"""
+metrics.py — Prometheus metrics for pipeline stages, caches and concurrency.
+
+With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty directory
+before the workers start; each process then writes its samples there and /metrics
+aggregates all of them. Without it, /metrics reports the current process only.
+Stages and outbound calls are also spans (see tracing.py).
+
+    with metrics.stage("tree_synthesis"):
+        resp = await _client.chat.completions.create(...)
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess,
+)
+
+import tracing
+
+_MULTIPROC = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# LLM calls dominate; buckets reach well past a minute
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+STAGE_SECONDS = Histogram("horizon_stage_seconds", "Latency of one pipeline stage.", ["stage"], buckets=_BUCKETS)
+STAGE_ERRORS = Counter("horizon_stage_errors_total", "Pipeline stages that raised.", ["stage"])
+CACHE_REQUESTS = Counter("horizon_cache_requests_total", "Cache lookups by key family and serving tier.", ["family", "tier", "result"])
+REQUEST_SECONDS = Histogram("horizon_request_seconds", "HTTP request latency.", ["method", "route", "status"], buckets=_BUCKETS)
+IN_FLIGHT = Gauge("horizon_requests_in_flight", "HTTP requests being served.", multiprocess_mode="livesum")
+EMBED_FALLBACKS = Counter(
+    "horizon_embed_fallback_total", "Skill normalizations that bypassed the embedding sidecar.", ["reason"],
+)
+OUTBOUND_IN_FLIGHT = Gauge(
+    "horizon_outbound_in_flight", "Outbound calls awaiting a response.", ["target"], multiprocess_mode="livesum",
+)
+
+
+@contextmanager
+def stage(name: str, **attrs):
+    """Time a pipeline stage inside a span of the same name; exceptions are counted and re-raised."""
+    start = time.perf_counter()
+    with tracing.span(name, **attrs):
+        try:
+            yield
+        except Exception:
+            STAGE_ERRORS.labels(name).inc()
+            raise
+        finally:
+            STAGE_SECONDS.labels(name).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def outbound(target: str, **attrs):
+    """Count a call to an external dependency (openrouter, tavily, graph) while it is in flight, as a client span."""
+    gauge = OUTBOUND_IN_FLIGHT.labels(target)
+    gauge.inc()
+    try:
+        with tracing.span(target, kind=tracing.SpanKind.CLIENT, **{"peer.service": target}, **attrs):
+            yield
+    finally:
+        gauge.dec()
+
+
+def cache(family: str, hit: bool, tier: str = "l2"):
+    """tier is where the lookup was answered: l1 (in-process) or l2 (Redis, hits and misses)."""
+    CACHE_REQUESTS.labels(family, tier, "hit" if hit else "miss").inc()
+    tracing.annotate(**{f"cache.{family}.hit": hit, f"cache.{family}.tier": tier})
+
+
+def render() -> tuple:
+    """(body, content type) for the /metrics endpoint."""
+    if _MULTIPROC:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,6 +1,6 @@
 import os
 import logging
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional
 
 from dotenv import load_dotenv
 from neo4j import AsyncGraphDatabase
@@ -8,65 +8,413 @@ from neo4j import AsyncGraphDatabase
 load_dotenv()
 log = logging.getLogger("graph")
 
-_driver = None
+GRAPH_BACKEND = os.getenv("GRAPH_BACKEND", "neo4j")  # "neo4j" | "local"
+GRAPH_VERSION_KEY = "horizon:graph:version"
 
+_LABELS = ("Role", "Skill")
 
-def _get_driver():
-    global _driver
-    if _driver is None:
-        _driver = AsyncGraphDatabase.driver(
-            os.getenv("NEO4J_URI", "bolt://localhost:7687"),
-            auth=(os.getenv("NEO4J_USERNAME", "neo4j"), os.getenv("NEO4J_PASSWORD", "password")),
-        )
-    return _driver
 
+class GraphBackend:
+    """
+    Storage contract behind the module-level graph API. Implementations raise on
+    failure; the module functions below own logging and fallback behaviour.
+    """
 
-async def setup():
-    """Run on startup — creates uniqueness constraints."""
-    try:
-        async with _get_driver().session() as s:
+    async def setup(self): ...
+
+    async def close(self): ...
+
+    async def evolve(self, role: str, skills: List[str], company: Optional[str] = None): ...
+
+    async def evolve_paths(self, paths: List[List[Tuple[str, float]]]): ...
+
+    async def find_trajectories(self, skills: List[str], limit: int) -> List[Dict[str, Any]]: ...
+
+    async def role_requirements(self, role: str, company: Optional[str], limit: int) -> List[Dict[str, Any]]: ...
+
+    async def walk(self, role: str) -> List[str]: ...
+
+    async def similar_roles(self, roles: List[str], limit: int) -> List[Dict[str, Any]]: ...
+
+    async def role_skill_vectors(self) -> Dict[str, Dict[str, float]]: ...
+
+    async def store_similar_roles(self, neighbors: Dict[str, List[Tuple[str, float]]]): ...
+
+    # Maintenance (offline jobs only)
+
+    async def stats(self) -> Dict[str, int]: ...
+
+    async def node_weights(self, label: str) -> List[Dict[str, Any]]: ...
+
+    async def merge_nodes(self, label: str, canonical: str, aliases: List[str]): ...
+
+    async def merge_many(self, label: str, groups: Dict[str, List[str]]): ...
+
+    async def prune_edges(self, min_count: int, stale_before_ms: int) -> Dict[str, int]: ...
+
+
+class Neo4jBackend(GraphBackend):
+
+    def __init__(self, uri: str = None, username: str = None, password: str = None):
+        self._uri = uri or os.getenv("NEO4J_URI", "bolt://localhost:7687")
+        self._auth = (username or os.getenv("NEO4J_USERNAME", "neo4j"), password or os.getenv("NEO4J_PASSWORD", "password"))
+        self._driver = None
+
+    def _get_driver(self):
+        if self._driver is None:
+            self._driver = AsyncGraphDatabase.driver(self._uri, auth=self._auth)
+        return self._driver
+
+    async def setup(self):
+        async with self._get_driver().session() as s:
             await s.run("CREATE CONSTRAINT IF NOT EXISTS FOR (r:Role) REQUIRE r.name IS UNIQUE")
             await s.run("CREATE CONSTRAINT IF NOT EXISTS FOR (s:Skill) REQUIRE s.name IS UNIQUE")
             await s.run("CREATE INDEX transitions_count IF NOT EXISTS FOR ()-[t:TRANSITIONS_TO]-() ON (t.count)")
-        log.info("Graph constraints ready.")
+
+    async def close(self):
+        if self._driver is not None:
+            try:
+                await self._driver.close()
+            finally:
+                self._driver = None
+
+    async def evolve(self, role: str, skills: List[str], company: Optional[str] = None):
+        async def _tx(tx):
+            await tx.run(
+                """
+                MERGE (r:Role {name: toLower($role)})
+                WITH r
+                UNWIND $skills AS raw
+                MERGE (s:Skill {name: toLower(raw)})
+                MERGE (r)-[e:REQUIRES]->(s)
+                  ON CREATE SET e.weight = 1.0, e.count = 1, e.updated_at = timestamp()
+                  ON MATCH  SET e.count = e.count + 1,
+                                e.weight = e.weight + 0.1,
+                                e.updated_at = timestamp()
+                WITH e
+                WHERE $company IS NOT NULL AND NOT toLower($company) IN COALESCE(e.companies, [])
+                SET e.companies = COALESCE(e.companies, []) + toLower($company)
+                """,
+                role=role, skills=skills, company=company,
+            )
+
+        async with self._get_driver().session() as s:
+            await s.execute_write(_tx)
+
+    async def evolve_paths(self, paths: List[List[Tuple[str, float]]]):
+        async def _tx(tx):
+            await tx.run(
+                """
+                UNWIND $paths AS path
+                UNWIND range(0, size(path) - 2) AS i
+                MERGE (r1:Role {name: toLower(path[i][0])})
+                MERGE (r2:Role {name: toLower(path[i + 1][0])})
+                MERGE (r1)-[t:TRANSITIONS_TO]->(r2)
+                  ON CREATE SET t.count = 1, t.years = path[i][1], t.updated_at = timestamp()
+                  ON MATCH  SET t.count = t.count + 1, t.years = (COALESCE(t.years, 1.0) * 0.8) + (path[i][1] * 0.2),
+                                t.updated_at = timestamp()
+                """,
+                paths=paths,
+            )
+
+        async with self._get_driver().session() as s:
+            await s.execute_write(_tx)
+
+    async def find_trajectories(self, skills: List[str], limit: int) -> List[Dict[str, Any]]:
+        async with self._get_driver().session() as s:
+            top_res = await s.run(
+                """
+                UNWIND $skills AS raw
+                MATCH (s:Skill {name: toLower(raw)})<-[e:REQUIRES]-(r:Role)
+                WITH r, sum(e.weight) AS score, collect(s.name) AS matched
+                ORDER BY score DESC, r.name
+                LIMIT $limit
+                RETURN r.name AS role, score, matched
+                """,
+                skills=skills, limit=limit,
+            )
+            top_roles = await top_res.data()
+
+            results = []
+            for record in top_roles:
+                start = record["role"]
+                trajectory = await self._walk(s, start)
+                results.append({
+                    "role": start,
+                    "score": record["score"],
+                    "matched": record["matched"],
+                    "trajectory": trajectory,
+                    "terminal": trajectory[-1],
+                })
+
+            return results
+
+    @staticmethod
+    async def _walk(s, role: str) -> List[str]:
+        traj_res = await s.run(
+            """
+            MATCH path = (r:Role {name: $role})-[:TRANSITIONS_TO*0..15]->(terminal:Role)
+            RETURN [n IN nodes(path) | n.name] AS trajectory
+            ORDER BY length(path) DESC
+            LIMIT 1
+            """,
+            role=role,
+        )
+        traj_data = await traj_res.data()
+        return traj_data[0]["trajectory"] if traj_data else [role]
+
+    async def walk(self, role: str) -> List[str]:
+        async with self._get_driver().session() as s:
+            return await self._walk(s, role)
+
+    async def similar_roles(self, roles: List[str], limit: int) -> List[Dict[str, Any]]:
+        async with self._get_driver().session() as s:
+            res = await s.run(
+                """
+                UNWIND $roles AS seed
+                MATCH (a:Role {name: seed})-[x:SIMILAR_TO]->(b:Role)
+                WHERE NOT b.name IN $roles
+                WITH b, a, x ORDER BY x.score DESC, a.name
+                WITH b, collect({score: x.score, via: a.name})[0] AS best
+                RETURN b.name AS role, best.score AS score, best.via AS via
+                ORDER BY score DESC, role
+                LIMIT $limit
+                """,
+                roles=roles, limit=limit,
+            )
+            return await res.data()
+
+    async def role_skill_vectors(self) -> Dict[str, Dict[str, float]]:
+        async with self._get_driver().session() as s:
+            res = await s.run("MATCH (r:Role)-[e:REQUIRES]->(k:Skill) RETURN r.name AS role, k.name AS skill, e.weight AS weight")
+            vectors: Dict[str, Dict[str, float]] = {}
+            for row in await res.data():
+                vectors.setdefault(row["role"], {})[row["skill"]] = row["weight"]
+            return vectors
+
+    async def store_similar_roles(self, neighbors: Dict[str, List[Tuple[str, float]]]):
+        pairs = [{"a": a, "b": b, "score": score} for a, nbrs in neighbors.items() for b, score in nbrs]
+
+        async def _tx(tx):
+            await tx.run("MATCH ()-[x:SIMILAR_TO]->() DELETE x")
+            await tx.run(
+                """
+                UNWIND $pairs AS p
+                MATCH (a:Role {name: p.a}), (b:Role {name: p.b})
+                CREATE (a)-[:SIMILAR_TO {score: p.score}]->(b)
+                """,
+                pairs=pairs,
+            )
+
+        async with self._get_driver().session() as s:
+            await s.execute_write(_tx)
+
+    async def role_requirements(self, role: str, company: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        async with self._get_driver().session() as s:
+            res = await s.run(
+                """
+                MATCH (r:Role {name: toLower($role)})-[e:REQUIRES]->(s:Skill)
+                WHERE $company IS NULL OR toLower($company) IN COALESCE(e.companies, [])
+                RETURN s.name AS skill, e.weight AS weight, e.count AS count, e.updated_at AS updated_at
+                ORDER BY weight DESC, skill
+                LIMIT $limit
+                """,
+                role=role, company=company, limit=limit,
+            )
+            return await res.data()
+
+    async def stats(self) -> Dict[str, int]:
+        async with self._get_driver().session() as s:
+            res = await s.run(
+                """
+                CALL { MATCH (r:Role) RETURN count(r) AS roles }
+                CALL { MATCH (k:Skill) RETURN count(k) AS skills }
+                CALL { MATCH ()-[e:REQUIRES]->() RETURN count(e) AS requires }
+                CALL { MATCH ()-[t:TRANSITIONS_TO]->() RETURN count(t) AS transitions }
+                RETURN roles, skills, requires, transitions
+                """
+            )
+            return (await res.data())[0]
+
+    async def node_weights(self, label: str) -> List[Dict[str, Any]]:
+        async with self._get_driver().session() as s:
+            res = await s.run(
+                f"""
+                MATCH (n:{label})
+                OPTIONAL MATCH (n)-[e]-()
+                RETURN n.name AS name, sum(COALESCE(e.count, 0)) AS weight
+                ORDER BY weight DESC, name
+                """
+            )
+            return await res.data()
+
+    async def merge_nodes(self, label: str, canonical: str, aliases: List[str]):
+        await self.merge_many(label, {canonical: aliases})
+
+    async def merge_many(self, label: str, groups: Dict[str, List[str]]):
+        # One UNWIND per statement over every (canonical, alias) pair: a fixed number of round trips per batch
+        pairs = [{"canonical": c, "alias": a} for c, aliases in groups.items() for a in aliases]
+
+        async def _tx(tx):
+            await tx.run(f"UNWIND $canonicals AS name MERGE (:{label} {{name: name}})", canonicals=list(groups))
+            if label == "Role":
+                await tx.run(
+                    """
+                    UNWIND $pairs AS p
+                    MATCH (c:Role {name: p.canonical}), (a:Role {name: p.alias})-[e:REQUIRES]->(s:Skill)
+                    MERGE (c)-[n:REQUIRES]->(s)
+                      ON CREATE SET n.weight = e.weight, n.count = e.count, n.updated_at = e.updated_at,
+                                    n.companies = e.companies
+                      ON MATCH  SET n.weight = n.weight + e.weight,
+                                    n.count = n.count + e.count,
+                                    n.updated_at = CASE WHEN COALESCE(e.updated_at, 0) > COALESCE(n.updated_at, 0)
+                                                        THEN e.updated_at ELSE n.updated_at END,
+                                    n.companies = COALESCE(n.companies, []) + [x IN COALESCE(e.companies, []) WHERE NOT x IN COALESCE(n.companies, [])]
+                    """,
+                    pairs=pairs,
+                )
+                await tx.run(
+                    """
+                    UNWIND $pairs AS p
+                    MATCH (c:Role {name: p.canonical}), (a:Role {name: p.alias})-[t:TRANSITIONS_TO]->(x:Role)
+                    WHERE x <> c
+                    MERGE (c)-[n:TRANSITIONS_TO]->(x)
+                      ON CREATE SET n.count = t.count, n.years = t.years, n.updated_at = t.updated_at
+                      ON MATCH  SET n.years = (COALESCE(n.years, 1.0) * n.count + COALESCE(t.years, 1.0) * t.count) / (n.count + t.count),
+                                    n.count = n.count + t.count,
+                                    n.updated_at = CASE WHEN COALESCE(t.updated_at, 0) > COALESCE(n.updated_at, 0)
+                                                        THEN t.updated_at ELSE n.updated_at END
+                    """,
+                    pairs=pairs,
+                )
+                await tx.run(
+                    """
+                    UNWIND $pairs AS p
+                    MATCH (c:Role {name: p.canonical}), (x:Role)-[t:TRANSITIONS_TO]->(a:Role {name: p.alias})
+                    WHERE x <> c
+                    MERGE (x)-[n:TRANSITIONS_TO]->(c)
+                      ON CREATE SET n.count = t.count, n.years = t.years, n.updated_at = t.updated_at
+                      ON MATCH  SET n.years = (COALESCE(n.years, 1.0) * n.count + COALESCE(t.years, 1.0) * t.count) / (n.count + t.count),
+                                    n.count = n.count + t.count,
+                                    n.updated_at = CASE WHEN COALESCE(t.updated_at, 0) > COALESCE(n.updated_at, 0)
+                                                        THEN t.updated_at ELSE n.updated_at END
+                    """,
+                    pairs=pairs,
+                )
+            else:
+                await tx.run(
+                    """
+                    UNWIND $pairs AS p
+                    MATCH (c:Skill {name: p.canonical}), (r:Role)-[e:REQUIRES]->(a:Skill {name: p.alias})
+                    MERGE (r)-[n:REQUIRES]->(c)
+                      ON CREATE SET n.weight = e.weight, n.count = e.count, n.updated_at = e.updated_at,
+                                    n.companies = e.companies
+                      ON MATCH  SET n.weight = n.weight + e.weight,
+                                    n.count = n.count + e.count,
+                                    n.updated_at = CASE WHEN COALESCE(e.updated_at, 0) > COALESCE(n.updated_at, 0)
+                                                        THEN e.updated_at ELSE n.updated_at END,
+                                    n.companies = COALESCE(n.companies, []) + [x IN COALESCE(e.companies, []) WHERE NOT x IN COALESCE(n.companies, [])]
+                    """,
+                    pairs=pairs,
+                )
+            await tx.run(f"UNWIND $aliases AS alias MATCH (a:{label} {{name: alias}}) DETACH DELETE a",
+                         aliases=[p["alias"] for p in pairs])
+
+        async with self._get_driver().session() as s:
+            await s.execute_write(_tx)
+
+    async def prune_edges(self, min_count: int, stale_before_ms: int) -> Dict[str, int]:
+        async def _tx(tx):
+            pruned = {}
+            for rel in ("REQUIRES", "TRANSITIONS_TO"):
+                res = await tx.run(
+                    f"""
+                    MATCH ()-[e:{rel}]->()
+                    WHERE COALESCE(e.count, 0) < $min_count AND COALESCE(e.updated_at, 0) < $cutoff
+                    DELETE e
+                    RETURN count(*) AS n
+                    """,
+                    min_count=min_count, cutoff=stale_before_ms,
+                )
+                pruned[rel.lower()] = (await res.single())["n"]
+            res = await tx.run(
+                """
+                MATCH (n) WHERE (n:Role OR n:Skill) AND NOT (n)--()
+                DELETE n
+                RETURN count(*) AS n
+                """
+            )
+            pruned["orphans"] = (await res.single())["n"]
+            return pruned
+
+        async with self._get_driver().session() as s:
+            return await s.execute_write(_tx)
+
+
+_backend: GraphBackend = None
+_redis = None
+
+
+def _get_backend() -> GraphBackend:
+    global _backend
+    if _backend is None:
+        if GRAPH_BACKEND == "local":
+            from local_graph import LocalBackend
+            _backend = LocalBackend()
+        else:
+            _backend = Neo4jBackend()
+    return _backend
+
+
+async def version() -> int:
+    """Monotonic graph version; bumped by every write so read caches can key on it."""
+    if _redis is None:
+        return 0
+    try:
+        return int(await _redis.get(GRAPH_VERSION_KEY) or 0)
+    except Exception as e:
+        log.warning(f"Graph version read failed: {e}")
+        return 0
+
+
+async def _bump_version():
+    if _redis is None:
+        return
+    try:
+        await _redis.incr(GRAPH_VERSION_KEY)
     except Exception as e:
-        log.warning(f"Neo4j graph setup failed (operating in fallback mode): {e}")
+        log.warning(f"Graph version bump failed: {e}")
+
+
+async def setup(redis_client=None):
+    """Run on startup — creates uniqueness constraints. `redis_client` carries the graph version."""
+    global _redis
+    _redis = redis_client
+    try:
+        await _get_backend().setup()
+        log.info(f"Graph constraints ready ({GRAPH_BACKEND}).")
+    except Exception as e:
+        log.warning(f"Graph setup failed (operating in fallback mode): {e}")
 
 
 async def close():
-    global _driver
-    if _driver is not None:
+    global _backend
+    if _backend is not None:
         try:
-            await _driver.close()
+            await _backend.close()
         except Exception as e:
-            log.warning(f"Neo4j driver close error: {e}")
+            log.warning(f"Graph close error: {e}")
         finally:
-            _driver = None
+            _backend = None
 
 
-async def evolve(role: str, skills: List[str]):
+async def evolve(role: str, skills: List[str], company: Optional[str] = None):
     """Strengthen graph from a fresh JD signal. Only called on cache misses."""
     if not skills:
         return
-
-    async def _tx(tx):
-        await tx.run(
-            """
-            MERGE (r:Role {name: toLower($role)})
-            WITH r
-            UNWIND $skills AS raw
-            MERGE (s:Skill {name: toLower(raw)})
-            MERGE (r)-[e:REQUIRES]->(s)
-              ON CREATE SET e.weight = 1.0, e.count = 1
-              ON MATCH  SET e.count = e.count + 1,
-                            e.weight = e.weight + 0.1
-            """,
-            role=role, skills=skills,
-        )
-
     try:
-        async with _get_driver().session() as s:
-            await s.execute_write(_tx)
+        await _get_backend().evolve(role, skills, company)
+        await _bump_version()
         log.info(f"Graph evolved: '{role}' +{len(skills)} skills")
     except Exception as e:
         log.error(f"Graph evolve failed for '{role}': {e}")
@@ -79,24 +427,9 @@ async def evolve_paths(paths: List[List[Tuple[str, float]]]):
     """
     if not paths:
         return
-
-    async def _tx(tx):
-        await tx.run(
-            """
-            UNWIND $paths AS path
-            UNWIND range(0, size(path) - 2) AS i
-            MERGE (r1:Role {name: toLower(path[i][0])})
-            MERGE (r2:Role {name: toLower(path[i + 1][0])})
-            MERGE (r1)-[t:TRANSITIONS_TO]->(r2)
-              ON CREATE SET t.count = 1, t.years = path[i][1]
-              ON MATCH  SET t.count = t.count + 1, t.years = (COALESCE(t.years, 1.0) * 0.8) + (path[i][1] * 0.2)
-            """,
-            paths=paths,
-        )
-
     try:
-        async with _get_driver().session() as s:
-            await s.execute_write(_tx)
+        await _get_backend().evolve_paths(paths)
+        await _bump_version()
         log.info(f"Paths evolved: {len(paths)} career tracks ingested.")
     except Exception as e:
         log.error(f"evolve_paths failed: {e}")
@@ -108,47 +441,95 @@ async def find_trajectories(skills: List[str], limit: int = 3) -> List[Dict[str,
     to the farthest reachable node. Returns full trajectory per matched role.
     Used as prior context in synthesis — shows the graph's known best paths.
     """
-    async with _get_driver().session() as s:
-        top_res = await s.run(
-            """
-            UNWIND $skills AS raw
-            MATCH (s:Skill {name: toLower(raw)})<-[e:REQUIRES]-(r:Role)
-            WITH r, sum(e.weight) AS score, collect(s.name) AS matched
-            ORDER BY score DESC
-            LIMIT $limit
-            RETURN r.name AS role, score, matched
-            """,
-            skills=skills, limit=limit,
-        )
-        top_roles = await top_res.data()
+    return await _get_backend().find_trajectories(skills, limit)
 
-        if not top_roles:
-            return []
 
-        results = []
-        for record in top_roles:
-            start = record["role"]
-            traj_res = await s.run(
-                """
-                MATCH path = (r:Role {name: $role})-[:TRANSITIONS_TO*0..15]->(terminal:Role)
-                RETURN [n IN nodes(path) | n.name] AS trajectory
-                ORDER BY length(path) DESC
-                LIMIT 1
-                """,
-                role=start,
-            )
-            traj_data = await traj_res.data()
-            trajectory = traj_data[0]["trajectory"] if traj_data else [start]
+async def role_requirements(role: str, company: Optional[str] = None, limit: int = 15) -> List[Dict[str, Any]]:
+    """
+    Top-weighted REQUIRES edges for a role, optionally only those observed at `company`.
+    Each row carries the edge's count and updated_at so callers can judge signal strength.
+    """
+    return await _get_backend().role_requirements(role, company, limit)
+
+
+async def walk(role: str) -> List[str]:
+    """Longest TRANSITIONS_TO walk (up to 15 hops) starting at `role`."""
+    return await _get_backend().walk(role)
+
+
+async def similar_roles(roles: List[str], limit: int = 5) -> List[Dict[str, Any]]:
+    """
+    Nearest neighbours of `roles` from the precomputed SIMILAR_TO index (role_similarity.py),
+    excluding the seeds. Each row: role, score (best similarity), via (the seed it came from).
+    """
+    if not roles:
+        return []
+    return await _get_backend().similar_roles(roles, limit)
+
+
+async def role_skill_vectors() -> Dict[str, Dict[str, float]]:
+    """Sparse REQUIRES weight vector per role — input to the similarity batch job."""
+    return await _get_backend().role_skill_vectors()
 
-            results.append({
-                "role": start,
-                "score": record["score"],
-                "matched": record["matched"],
-                "trajectory": trajectory,
-                "terminal": trajectory[-1],
-            })
 
-        return results
+async def store_similar_roles(neighbors: Dict[str, List[Tuple[str, float]]]):
+    """Replace the whole SIMILAR_TO index with `neighbors` (role -> [(role, score)])."""
+    await _get_backend().store_similar_roles(neighbors)
+    await _bump_version()
+
+
+# ── Maintenance (offline jobs only) ───────────────────────────────────────────
+
+async def stats() -> Dict[str, int]:
+    """Node and edge counts, used for before/after reporting."""
+    return await _get_backend().stats()
+
+
+async def node_weights(label: str) -> List[Dict[str, Any]]:
+    """Every node of `label` with the summed count of its edges, heaviest first."""
+    if label not in _LABELS:
+        raise ValueError(f"Unknown label: {label}")
+    return await _get_backend().node_weights(label)
+
+
+async def merge_nodes(label: str, canonical: str, aliases: List[str]):
+    """
+    Fold `aliases` into the `canonical` node. Edges are rewired onto the canonical
+    node with counts and weights summed; self-loops created by the merge are dropped.
+    """
+    if label not in _LABELS:
+        raise ValueError(f"Unknown label: {label}")
+    aliases = [a for a in aliases if a != canonical]
+    if aliases:
+        await _get_backend().merge_nodes(label, canonical, aliases)
+        await _bump_version()
+
+
+async def merge_many(label: str, groups: Dict[str, List[str]]):
+    """
+    merge_nodes for many {canonical: aliases} groups in one transaction and one version bump.
+    Canonical names are lowercased, as every node name is stored and matched lowercase.
+    """
+    if label not in _LABELS:
+        raise ValueError(f"Unknown label: {label}")
+    folded: Dict[str, List[str]] = {}
+    for canonical, aliases in groups.items():
+        canonical = canonical.lower()
+        folded.setdefault(canonical, []).extend(a for a in aliases if a != canonical)
+    groups = {c: aliases for c, aliases in folded.items() if aliases}
+    if groups:
+        await _get_backend().merge_many(label, groups)
+        await _bump_version()
+
+
+async def prune_edges(min_count: int, stale_before_ms: int) -> Dict[str, int]:
+    """
+    Delete edges seen fewer than `min_count` times and not touched since `stale_before_ms`
+    (epoch millis; edges written before timestamps existed count as stale), then drop orphans.
+    """
+    pruned = await _get_backend().prune_edges(min_count, stale_before_ms)
+    await _bump_version()
+    return pruned
 
 
 # async def find_roles(skills: List[str], limit: int = 3) -> List[Dict[str, Any]]:
@@ -165,4 +546,4 @@ async def find_trajectories(skills: List[str], limit: int = 3) -> List[Dict[str,
 #             """,
 #             skills=skills, limit=limit,
 #         )
-#         return await res.data()
\ No newline at end of file
+#         return await res.data()
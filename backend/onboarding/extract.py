@@ -0,0 +1,316 @@
+"""
+PDF text extraction for resume parsing, off the event loop.
+
+Pages are extracted in a process pool behind a small extractor interface: PyMuPDF
+via pymupdf4llm (Markdown, fastest) with pdfplumber as the fallback when PyMuPDF
+isn't installed or chokes on a page. Each worker gets one contiguous page range and
+a single copy of the bytes. Only the first RESUME_MAX_PAGES pages are read and the
+whole document gets RESUME_EXTRACT_TIMEOUT seconds: workers stop at the deadline
+themselves, and a pool still busy past it is recycled so the next upload doesn't
+queue behind it. Jobs of other uploads that were on the recycled pool are resubmitted
+once to the fresh one. Pages are yielded in order as each range finishes; if the deadline
+cut extraction short, stream_pages raises ExtractionTruncated after the last page so
+callers can tell partial text from a complete document.
+
+    python -m onboarding.extract ./samples            # throughput + loop-lag benchmark
+"""
+import os
+import io
+import time
+import asyncio
+import logging
+import multiprocessing
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+log = logging.getLogger("extract")
+
+RESUME_EXTRACTOR = os.getenv("RESUME_EXTRACTOR", "pymupdf")
+RESUME_MAX_PAGES = int(os.getenv("RESUME_MAX_PAGES", "10"))
+RESUME_EXTRACT_TIMEOUT = float(os.getenv("RESUME_EXTRACT_TIMEOUT", "20"))
+RESUME_EXTRACT_WORKERS = int(os.getenv("RESUME_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+class ExtractionError(Exception):
+    pass
+
+
+class ExtractionTruncated(ExtractionError):
+    """Raised by stream_pages after the last page it managed before the deadline."""
+
+    def __init__(self, done: int, pages: int):
+        super().__init__(f"extracted {done} of {pages} pages before the deadline")
+        self.done, self.pages = done, pages
+
+
+# ── Extractors (run inside worker processes) ─────────────────────────────────
+
+class Extractor:
+    name = ""
+
+    def open(self, data: bytes): ...  # context manager over the parsed document
+
+    def page_count(self, doc) -> int: ...
+
+    def page_text(self, doc, page: int) -> str: ...
+
+
+class PyMuPDFExtractor(Extractor):
+    name = "pymupdf"
+
+    def open(self, data: bytes):
+        import pymupdf
+        return pymupdf.open(stream=data, filetype="pdf")
+
+    def page_count(self, doc) -> int:
+        return doc.page_count
+
+    def page_text(self, doc, page: int) -> str:
+        try:
+            import pymupdf4llm
+            return pymupdf4llm.to_markdown(doc, pages=[page], show_progress=False)
+        except ImportError:
+            return doc[page].get_text()
+
+
+class PdfPlumberExtractor(Extractor):
+    name = "pdfplumber"
+
+    def open(self, data: bytes):
+        import pdfplumber
+        return pdfplumber.open(io.BytesIO(data))
+
+    def page_count(self, doc) -> int:
+        return len(doc.pages)
+
+    def page_text(self, doc, page: int) -> str:
+        return doc.pages[page].extract_text() or ""
+
+
+EXTRACTORS: Dict[str, Extractor] = {e.name: e for e in (PyMuPDFExtractor(), PdfPlumberExtractor())}
+
+
+def _chain(preferred: str) -> List[Extractor]:
+    return [EXTRACTORS[preferred]] + [e for n, e in EXTRACTORS.items() if n != preferred]
+
+
+def _count_pages(data: bytes, preferred: str) -> Tuple[int, str]:
+    errors = []
+    for extractor in _chain(preferred):
+        try:
+            with extractor.open(data) as doc:
+                return extractor.page_count(doc), extractor.name
+        except Exception as e:  # ImportError or a PDF this backend can't open
+            errors.append(f"{extractor.name}: {e}")
+    raise ExtractionError("; ".join(errors))
+
+
+def _extract_range(data: bytes, start: int, stop: int, preferred: str, deadline: float) -> List[str]:
+    """
+    Pages [start, stop) in order; stops early (shorter list) once wall-clock `deadline` passes.
+    Each backend parses the document at most once per range, the fallback only when a page needs it.
+    """
+    texts = []
+    with ExitStack() as stack:
+        docs: Dict[str, object] = {}
+
+        def opened(extractor: Extractor):
+            if extractor.name not in docs:
+                docs[extractor.name] = None
+                docs[extractor.name] = stack.enter_context(extractor.open(data))
+            if docs[extractor.name] is None:
+                raise ExtractionError("could not open document")
+            return docs[extractor.name]
+
+        for page in range(start, stop):
+            if time.time() >= deadline:
+                break
+            errors = []
+            for extractor in _chain(preferred):
+                try:
+                    texts.append(extractor.page_text(opened(extractor), page))
+                    break
+                except Exception as e:
+                    errors.append(f"{extractor.name}: {e}")
+            else:
+                raise ExtractionError(f"page {page}: " + "; ".join(errors))
+    return texts
+
+
+def _ranges(pages: int, parts: int) -> List[Tuple[int, int]]:
+    parts = max(1, min(parts, pages))
+    size, extra = divmod(pages, parts)
+    out, start = [], 0
+    for i in range(parts):
+        stop = start + size + (1 if i < extra else 0)
+        out.append((start, stop))
+        start = stop
+    return out
+
+
+# ── Pool + async API ─────────────────────────────────────────────────────────
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: never fork a process that already holds DB/Redis client threads
+        _pool = ProcessPoolExecutor(max_workers=RESUME_EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _recycle_pool(pool: Optional[ProcessPoolExecutor]):
+    """
+    Drop a pool whose workers overran the deadline; the next call starts a fresh one.
+    Other requests' jobs on it fail with BrokenProcessPool and are resubmitted by _submit.
+    """
+    global _pool
+    if pool is None:
+        return
+    if _pool is pool:
+        _pool = None
+    procs = list((getattr(pool, "_processes", None) or {}).values())  # shutdown() clears the mapping
+    pool.shutdown(wait=False)
+    for proc in procs:
+        proc.terminate()
+
+
+async def _submit(fn, *args):
+    """Run fn in the shared pool, retrying once on a fresh pool if this one broke underneath it."""
+    global _pool
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        pool = _get_pool()
+        try:
+            return await loop.run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            if _pool is pool:  # a worker died on its own; recycled pools are already detached
+                _pool = None
+            if attempt:
+                raise
+            log.info("Extraction pool was recycled mid-job; retrying on a fresh pool")
+
+
+async def stream_pages(
+    data: bytes,
+    extractor: str = RESUME_EXTRACTOR,
+    max_pages: int = RESUME_MAX_PAGES,
+    timeout: float = RESUME_EXTRACT_TIMEOUT,
+) -> AsyncIterator[Tuple[int, str]]:
+    """Yield (page_number, text) in page order; raises ExtractionTruncated if the deadline dropped pages."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    wall_deadline = time.time() + timeout
+
+    try:
+        count, used = await asyncio.wait_for(_submit(_count_pages, data, extractor), timeout)
+    except asyncio.TimeoutError:
+        _recycle_pool(_pool)
+        raise
+    pages = min(count, max_pages)
+    if count > max_pages:
+        log.info(f"Resume has {count} pages; extracting the first {max_pages}")
+
+    ranges = _ranges(pages, RESUME_EXTRACT_WORKERS)
+    tasks = [asyncio.ensure_future(_submit(_extract_range, data, a, b, used, wall_deadline)) for a, b in ranges]
+    done = 0
+    try:
+        for (start, stop), task in zip(ranges, tasks):
+            # small grace past the deadline: workers check it between pages and return what they have
+            texts = await asyncio.wait_for(task, max(deadline - loop.time(), 0) + 1.0)
+            for offset, text in enumerate(texts):
+                yield start + offset, text
+            done += len(texts)
+            if len(texts) < stop - start:
+                break
+    except asyncio.TimeoutError:
+        _recycle_pool(_pool)  # where a retried job would be running too
+    finally:
+        for task in tasks:
+            task.cancel()
+    if done < pages:
+        log.warning(f"Resume extraction hit the {timeout:.0f}s limit after {done} of {pages} pages")
+        raise ExtractionTruncated(done, pages)
+
+
+async def extract_text(data: bytes, **kwargs) -> Tuple[str, bool]:
+    """(text, complete): complete is False when the deadline cut the document short."""
+    parts, complete = [], True
+    try:
+        async for _, text in stream_pages(data, **kwargs):
+            if text:
+                parts.append(text)
+    except ExtractionTruncated:
+        complete = False
+    return "\n".join(parts), complete
+
+
+# ── Benchmark ─────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    import sys
+    import glob
+    import statistics
+
+    folder = sys.argv[1] if len(sys.argv) > 1 else "./samples"
+    corpus = [open(p, "rb").read() for p in sorted(glob.glob(os.path.join(folder, "*.pdf")))]
+    if not corpus:
+        sys.exit(f"No PDFs found in {folder}")
+    concurrency = int(os.getenv("BENCH_CONCURRENCY", "8"))
+
+    def inline_pdfplumber(data: bytes) -> str:
+        plumber = PdfPlumberExtractor()
+        with plumber.open(data) as pdf:
+            return "\n".join(plumber.page_text(pdf, i) for i in range(plumber.page_count(pdf)))
+
+    async def probe_lag(stop: asyncio.Event, samples: list, interval: float = 0.005):
+        loop = asyncio.get_running_loop()
+        while not stop.is_set():
+            start = loop.time()
+            await asyncio.sleep(interval)
+            samples.append((loop.time() - start - interval) * 1000)
+
+    async def run(label: str, extract):
+        sem = asyncio.Semaphore(concurrency)
+        stop, lag = asyncio.Event(), []
+
+        async def one(data):
+            async with sem:
+                return await extract(data)
+
+        probe = asyncio.create_task(probe_lag(stop, lag))
+        start = time.perf_counter()
+        texts = await asyncio.gather(*[one(d) for d in corpus])
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await probe
+        chars = sum(len(t) for t in texts)
+        print(f"{label:<22} {len(corpus) / elapsed:6.1f} docs/s | loop lag p50 {statistics.median(lag):6.1f}ms "
+              f"max {max(lag):7.1f}ms | {chars} chars")
+
+    async def bench():
+        async def on_loop(data):
+            return inline_pdfplumber(data)  # the old handler: blocks the loop
+        await run("pdfplumber on loop", on_loop)
+        await extract_text(corpus[0])  # spin up workers before timing
+
+        async def pooled(data, name):
+            return (await extract_text(data, extractor=name))[0]
+
+        for name in EXTRACTORS:
+            await run(f"{name} process pool", lambda d, n=name: pooled(d, n))
+        shutdown()
+
+    print(f"{len(corpus)} PDFs, concurrency {concurrency}, {RESUME_EXTRACT_WORKERS} workers")
+    asyncio.run(bench())
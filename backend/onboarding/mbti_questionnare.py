@@ -1,25 +1,29 @@
 # from google.cloud import firestore
 from pymongo import MongoClient
+from pymongo.errors import PyMongoError
 
 from typing import Dict,List
 
 
 import numpy as np
-import random
 
 
 import json
+import logging
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
+
+log = logging.getLogger("mbti")
 # db = firestore.Client(database="hackathonfirestore")
 # batch = db.batch()
 # collection_ref = db.collection("questions")
 
-LOCAL_MBTI_JSON = "./data/MBTI_subtopic_wise.json"
+LOCAL_MBTI_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "MBTI_subtopic_wise.json")
 
-client = MongoClient(os.getenv("MONGODB_URI"))
+# Fail fast so an unreachable DB falls back to the bundled bank instead of stalling startup
+client = MongoClient(os.getenv("MONGODB_URI"), serverSelectionTimeoutMS=int(os.getenv("MBTI_DB_TIMEOUT_MS", "5000")))
 db = client["mbti_questions"]
 
 def insert_questions():
@@ -59,37 +63,82 @@ def insert_questions():
         res = collection.insert_one(final_dict)
         print(f"INFO: inserted one document with id {res.inserted_id}")
         print("INFO: inserting of MBTI questions done!")
+        load_bank()
 
     except Exception as e:
         print(f"ERROR: during inserting MBTI questions in DB {str(e)}")
         raise
 
-def prepare_questions():
+QUESTIONS_PER_TYPE = 2
+
+
+class QuestionBank:
+    """Static question bank flattened into arrays: one contiguous run of questions per type."""
+
+    def __init__(self, doc: Dict[str, List[Dict[str, str]]]):
+        self.types = [t for t in doc if t != "_id"]
+        short = [t for t in self.types if len(doc[t]) < QUESTIONS_PER_TYPE]
+        if not self.types or short:
+            raise ValueError(f"MBTI bank needs {QUESTIONS_PER_TYPE}+ questions per type; short: {short or 'no types'}")
+        self.ids = [q["id"] for t in self.types for q in doc[t]]
+        self.questions = [q["question"] for t in self.types for q in doc[t]]
+        self.counts = np.array([len(doc[t]) for t in self.types], dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(self.counts)[:-1])).astype(np.int64)
+
+    def sample(self, rng: np.random.Generator, per_type: int = QUESTIONS_PER_TYPE) -> np.ndarray:
+        """Flat question indices, `per_type` distinct ones per type, types in bank order."""
+        keys = rng.random((len(self.types), int(self.counts.max())))
+        keys[np.arange(keys.shape[1]) >= self.counts[:, None]] = np.inf  # pad past each type's end
+        picks = np.argpartition(keys, per_type - 1, axis=1)[:, :per_type]
+        return (self.offsets[:, None] + picks).ravel()
+
+
+_bank: QuestionBank = None
+_rng = np.random.default_rng(int(os.environ["MBTI_SEED"]) if os.getenv("MBTI_SEED") else None)
+
+
+def _bundled_bank() -> QuestionBank:
+    with open(LOCAL_MBTI_JSON, "r") as f:
+        raw = json.load(f)["MBTI_Questions"]
+    return QuestionBank({t: [{"id": f"{t}_{i}", "question": q} for i, q in enumerate(qs, 1)] for t, qs in raw.items()})
+
+
+def load_bank(use_db: bool = True) -> QuestionBank:
+    """
+    (Re)load the question bank from MongoDB, falling back to the bundled JSON when the DB
+    is unreachable, empty or holds an invalid bank. Call after editing questions.
+    """
+    global _bank
+    bank = None
+    if use_db:
+        try:
+            doc = db["questions"].find_one()
+            if doc:
+                bank = QuestionBank(doc)
+            else:
+                log.warning("No MBTI questions found in DB, using bundled JSON")
+        except PyMongoError as e:
+            log.warning(f"MBTI question DB unreachable, using bundled JSON: {e}")
+        except ValueError as e:
+            log.warning(f"MBTI questions in DB rejected, using bundled JSON: {e}")
+    _bank = bank or _bundled_bank()
+    log.info(f"MBTI bank loaded: {len(_bank.ids)} questions across {len(_bank.types)} types")
+    return _bank
+
+
+def prepare_questions(rng: np.random.Generator = None):
     """
     Prepare a list of questions for MBTI Questionnare request
     return type: [{"type":,"id":,"question":}]
     """
-    
-    try:
-        collection = db["questions"]
-        doc = collection.find_one()
-        if not doc:
-            raise RuntimeError("No MBTI questions found in DB")
-        ques_list = []
-        for subtopic,questions in doc.items():
-            if subtopic=="_id":
-                continue
-            chosen = random.sample(questions,2)
-            for q_entry in chosen:
-                q_id = q_entry["id"]
-                ques = q_entry["question"]
-                prepared_ques = {"type":subtopic,"id":q_id,"question":ques}
-                ques_list.append(prepared_ques)
-        # print(ques_list)
-        return ques_list
-    except Exception as e:
-        print(f"error in preparing MBTI questions {str(e)}")
-   
+    bank = _bank or load_bank(use_db=False)  # request path: never block on the DB
+    idx = bank.sample(rng or _rng)
+    return [
+        {"type": bank.types[i // QUESTIONS_PER_TYPE], "id": bank.ids[q], "question": bank.questions[q]}
+        for i, q in enumerate(idx.tolist())
+    ]
+
+
 def get_persona(scores):
     """
     Calculate users personality from the answers given
@@ -118,61 +167,86 @@ def get_persona(scores):
         persona+='P'
     return persona
 
+PAIRS = [("I","E"), ("S","N"), ("T","F"), ("J","P")]
+# letter -> (dimension, True if it is the second letter of its pair)
+_LETTERS = {l: (d, j == 1) for d, pair in enumerate(PAIRS) for j, l in enumerate(pair)}
+
+
+def evaluate_answers_batch(answer_sets: List[List[Dict[str,int]]]):
+    """
+    Score many answer sets at once (bulk imports). Same semantics as evaluate_answers:
+    Likert 1-5 mapped to [0, 1], second-letter answers reversed, mean per dimension,
+    0.5 when a dimension has no answers. Returns ([scores], [persona]).
+    """
+    rows, dims, values = [], [], []
+    for i, answers in enumerate(answer_sets):
+        for r in answers:
+            if r["type"] in _LETTERS:
+                d, second = _LETTERS[r["type"]]
+                rows.append(i)
+                dims.append(d)
+                values.append(1 - (r["score"] - 1) / 4 if second else (r["score"] - 1) / 4)
+
+    n = len(answer_sets)
+    cells = np.asarray(rows, dtype=np.int64) * len(PAIRS) + np.asarray(dims, dtype=np.int64)
+    sums = np.bincount(cells, weights=np.asarray(values, dtype=np.float64), minlength=n * len(PAIRS))
+    counts = np.bincount(cells, minlength=n * len(PAIRS))
+    means = np.where(counts > 0, sums / np.maximum(counts, 1), 0.5).reshape(n, len(PAIRS))
+
+    keys = [b for _, b in PAIRS]
+    letters = np.where(means < 0.5, np.array([a for a, _ in PAIRS]), np.array(keys))
+    scores = [dict(zip(keys, row)) for row in means.tolist()]
+    personas = ["".join(row) for row in letters.tolist()]
+    return scores, personas
+
+
 def evaluate_answers(user_answers: List[Dict[str,int]]):
     #input data : [{"type":score(int)}]
-    
     # strongly agree: 5 , strongly disagree: 1
+    scores, personas = evaluate_answers_batch([user_answers])
+    return scores[0], personas[0]
 
-    pairs = [("I","E"), ("S","N"), ("T","F"), ("J","P")]
-    scores = {}
-
-    
-    grouped = {}
-    for r in user_answers:
-        grouped.setdefault(r["type"], []).append(r["score"])
-
-    for a, b in pairs:
-        values = []
-
-        # normalize first category (I/S/T/J)
-        for s in grouped.get(a, []):
-            values.append((s - 1) / 4)
-
-        # normalize second category (E/N/F/P)
-        for s in grouped.get(b, []):
-            values.append(1 - ((s - 1) / 4))
-
-        final_score = float(np.mean(values) if values else 0.5)
-        scores[f"{b}"] = final_score
-    persona = get_persona(scores)
-    # print(scores)
-    # print(persona)
-    return scores,persona
-    
 
 if __name__ == "__main__":
-
-    insert_questions()
-    prepare_questions()
-    responses = [
-  {"type": "I", "score": 4},
-  {"type": "I", "score": 2},
-  {"type": "E", "score": 5},
-  {"type": "E", "score": 3},
-  {"type": "S", "score": 1},
-  {"type": "S", "score": 4},
-  {"type": "N", "score": 2},
-  {"type": "N", "score": 5},
-  {"type": "T", "score": 3},
-  {"type": "T", "score": 4},
-  {"type": "F", "score": 2},
-  {"type": "F", "score": 5},
-  {"type": "J", "score": 1},
-  {"type": "J", "score": 4},
-  {"type": "P", "score": 3},
-  {"type": "P", "score": 5}
-]
-
-    scores,persona = evaluate_answers(responses)
-    print(scores)
-    print(persona)
+    import sys
+    import time
+
+    logging.basicConfig(level=logging.INFO)
+
+    if "--insert" in sys.argv:
+        insert_questions()
+
+    load_bank()
+    rng = np.random.default_rng(0)
+    n = 20_000
+    start = time.perf_counter()
+    for _ in range(n):
+        prepare_questions(rng)
+    elapsed = time.perf_counter() - start
+    print(f"prepare_questions: {n / elapsed:,.0f} calls/s ({elapsed / n * 1e6:.1f}us/call)")
+
+    def evaluate_answers_loop(user_answers):
+        """The original per-answer scorer, kept here as the baseline."""
+        grouped = {}
+        for r in user_answers:
+            grouped.setdefault(r["type"], []).append(r["score"])
+        scores = {}
+        for a, b in PAIRS:
+            values = [(s - 1) / 4 for s in grouped.get(a, [])] + [1 - (s - 1) / 4 for s in grouped.get(b, [])]
+            scores[b] = float(np.mean(values) if values else 0.5)
+        return scores, get_persona(scores)
+
+    letters = [l for pair in PAIRS for l in pair]
+    answer_sets = [
+        [{"type": t, "score": int(s)} for t, s in zip(rng.choice(letters, 16), rng.integers(1, 6, 16))]
+        for _ in range(n)
+    ]
+    start = time.perf_counter()
+    single = [evaluate_answers_loop(a) for a in answer_sets]
+    t_single = time.perf_counter() - start
+    start = time.perf_counter()
+    scores, personas = evaluate_answers_batch(answer_sets)
+    t_batch = time.perf_counter() - start
+    assert [p for _, p in single] == personas
+    assert all(np.allclose([a[k] for k in a], [b[k] for k in a]) for (a, _), b in zip(single, scores))
+    print(f"evaluate_answers: {n / t_single:,.0f} sets/s original per-answer loop, {n / t_batch:,.0f} sets/s batched")
@@ -0,0 +1,166 @@
+"""
+Content-addressed embedding cache for the skill normalizer.
+
+Key = sha256(model name + normalized text), so the model only ever encodes strings
+it has never seen. Two tiers:
+  L1   — bounded in-process LRU of vectors.
+  disk — append-only float32 matrix (memory-mapped for reads) plus a key index,
+         one hex key per line, line number = matrix row. Appends take an flock so
+         the sidecar and an offline rebuild can share one cache directory.
+Within a process, index reads and updates are serialized by a thread lock, since the
+in-process fallback embeds from several asyncio.to_thread workers at once.
+
+    python -m onboarding.normalizer.embed_cache      # benchmark on a Zipfian skill mix
+"""
+import os
+import re
+import fcntl
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", "./data/embed_cache")
+EMBED_CACHE_L1 = int(os.getenv("EMBED_CACHE_L1", "20000"))
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class EmbeddingCache:
+
+    def __init__(self, model_name: str, dim: int, directory: str = EMBED_CACHE_DIR, l1_size: int = EMBED_CACHE_L1):
+        self.model_name = model_name
+        self.dim = dim
+        self.l1_size = l1_size
+        self.stats = {"l1_hits": 0, "disk_hits": 0, "misses": 0}
+
+        self._dir = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+        os.makedirs(self._dir, exist_ok=True)
+        self._vec_path = os.path.join(self._dir, "vectors.f32")
+        self._key_path = os.path.join(self._dir, "keys.txt")
+        self._lock_path = os.path.join(self._dir, ".lock")
+
+        self._l1: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._rows: Dict[str, int] = {}
+        self._keys_offset = 0
+        self._mm: Optional[np.memmap] = None
+        self._mutex = threading.Lock()  # guards _l1, _rows, _keys_offset and _mm across threads
+        with self._locked():
+            self._sync()
+            # Drop vector bytes left behind by a writer that died before recording keys
+            expected = len(self._rows) * self.dim * 4
+            if os.path.exists(self._vec_path) and os.path.getsize(self._vec_path) > expected:
+                os.truncate(self._vec_path, expected)
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def _locked(self):
+        class _Lock:
+            def __enter__(s):
+                s.f = open(self._lock_path, "a")
+                fcntl.flock(s.f, fcntl.LOCK_EX)
+
+            def __exit__(s, *exc):
+                fcntl.flock(s.f, fcntl.LOCK_UN)
+                s.f.close()
+        return _Lock()
+
+    def _sync(self):
+        """Pick up keys appended since the last read (possibly by another process)."""
+        if not os.path.exists(self._key_path):
+            return
+        with open(self._key_path, "r", encoding="ascii") as f:
+            f.seek(self._keys_offset)
+            for line in f:
+                if line.endswith("\n"):
+                    self._rows.setdefault(line.strip(), len(self._rows))
+                    self._keys_offset += len(line)
+
+    def _matrix(self) -> Optional[np.memmap]:
+        rows = len(self._rows)
+        if rows == 0:
+            return None
+        if self._mm is None or self._mm.shape[0] < rows:
+            self._mm = np.memmap(self._vec_path, dtype="float32", mode="r", shape=(rows, self.dim))
+        return self._mm
+
+    def _remember(self, key: str, vec: np.ndarray):
+        self._l1[key] = vec
+        self._l1.move_to_end(key)
+        if len(self._l1) > self.l1_size:
+            self._l1.popitem(last=False)
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        keys = [self.key(t) for t in texts]
+        with self._mutex:
+            if any(k not in self._l1 and k not in self._rows for k in keys):
+                self._sync()  # vectors land before their keys, so any complete key line is readable
+            out: List[Optional[np.ndarray]] = []
+            for k in keys:
+                vec = self._l1.get(k)
+                if vec is not None:
+                    self._l1.move_to_end(k)
+                    self.stats["l1_hits"] += 1
+                elif k in self._rows:
+                    vec = np.array(self._matrix()[self._rows[k]])
+                    self._remember(k, vec)
+                    self.stats["disk_hits"] += 1
+                else:
+                    self.stats["misses"] += 1
+                out.append(vec)
+        return out
+
+    def put_many(self, texts: List[str], vecs: np.ndarray):
+        vecs = np.ascontiguousarray(vecs, dtype="float32")
+        with self._mutex, self._locked():
+            self._sync()
+            fresh = {}
+            for text, vec in zip(texts, vecs):
+                k = self.key(text)
+                self._remember(k, vec.copy())
+                if k not in self._rows and k not in fresh:
+                    fresh[k] = vec
+            if not fresh:
+                return
+            with open(self._vec_path, "ab") as f:
+                f.write(np.stack(list(fresh.values())).tobytes())
+            with open(self._key_path, "a", encoding="ascii") as f:
+                f.write("".join(k + "\n" for k in fresh))
+            self._sync()
+
+    def hit_rate(self) -> float:
+        total = sum(self.stats.values())
+        return (self.stats["l1_hits"] + self.stats["disk_hits"]) / total if total else 0.0
+
+    def __len__(self):
+        return len(self._rows)
+
+
+if __name__ == "__main__":
+    import time
+    import tempfile
+    from . import normalizer
+
+    # Realistic mix: a few skills ("Python", "Docker") dominate, with a long tail
+    names = list(dict.fromkeys(normalizer._get_lexicon().entries.values())) or [f"skill {i}" for i in range(2000)]
+    rng = np.random.default_rng(42)
+    ranks = np.minimum(rng.zipf(1.3, size=20_000), len(names)) - 1
+    profiles = [[names[r] for r in ranks[i:i + 25]] for i in range(0, len(ranks), 25)]
+
+    normalizer._embed_cache = EmbeddingCache(normalizer.MODEL_NAME, normalizer.EMBED_DIM, tempfile.mkdtemp())
+    for label in ("cold", "warm"):
+        start = time.perf_counter()
+        for p in profiles:
+            normalizer._embed(p)
+        elapsed = time.perf_counter() - start
+        c = normalizer._embed_cache
+        print(f"{label}: {len(profiles)} profiles in {elapsed:.2f}s ({elapsed / len(profiles) * 1000:.1f}ms/profile), "
+              f"hit rate {c.hit_rate():.1%} {c.stats}, {len(c)} vectors on disk")
+        c.stats = {"l1_hits": 0, "disk_hits": 0, "misses": 0}
+        c._l1.clear()  # warm pass measures the disk tier, not just L1
@@ -0,0 +1,232 @@
+"""
+On-disk format for the skill ANN index.
+
+SKILL_INDEX_TYPE picks the FAISS structure:
+  flat    — exact IndexFlatIP (small KBs, reference for recall)
+  hnsw    — IndexHNSWFlat, graph search, no training
+  ivfpq   — IVF + product quantization, smallest footprint
+  ivfsq8  — IVF + 8-bit scalar quantization
+Indexes are read with IO_FLAG_MMAP where FAISS supports it, so the OS page cache is
+shared across workers instead of each process holding its own copy. Skill names live
+in a flat UTF-8 blob plus an offsets array — nothing is unpickled at load time.
+
+Vector ids are stable per KB document (id = row in the name table; removed documents
+leave an empty name), so incremental updates can remove/re-add single vectors. Each
+build is published as a new `v{N}/` directory and the `CURRENT` pointer is swapped
+with os.replace, which readers poll to hot-swap without a restart.
+"""
+import os
+import re
+import json
+import time
+import shutil
+import logging
+from typing import List, Optional
+
+import numpy as np
+import faiss
+
+log = logging.getLogger("normalizer")
+
+SKILL_INDEX_TYPE = os.getenv("SKILL_INDEX_TYPE", "flat")
+HNSW_M = int(os.getenv("SKILL_INDEX_HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("SKILL_INDEX_HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("SKILL_INDEX_HNSW_EF_SEARCH", "64"))
+IVF_NLIST = int(os.getenv("SKILL_INDEX_IVF_NLIST", "0"))  # 0 = ~4*sqrt(n)
+IVF_NPROBE = int(os.getenv("SKILL_INDEX_IVF_NPROBE", "16"))
+PQ_M = int(os.getenv("SKILL_INDEX_PQ_M", "48"))
+
+INDEX_KEEP_VERSIONS = int(os.getenv("SKILL_INDEX_KEEP_VERSIONS", "3"))
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq", "ivfsq8")
+MIN_TRAIN_PER_LIST = 39  # FAISS warns below this many training points per centroid
+
+
+class NameTable:
+    """Read-only id -> name table over a memory-mapped UTF-8 blob."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+
+    @staticmethod
+    def write(prefix: str, names: List[str]):
+        encoded = [n.encode("utf-8") for n in names]
+        offsets = np.zeros(len(encoded) + 1, dtype="uint64")
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        with open(prefix + ".bin", "wb") as f:
+            f.write(b"".join(encoded))
+        np.save(prefix + ".offsets.npy", offsets)
+
+    @classmethod
+    def load(cls, prefix: str) -> "NameTable":
+        offsets = np.load(prefix + ".offsets.npy", mmap_mode="r", allow_pickle=False)
+        size = int(offsets[-1]) if len(offsets) else 0
+        blob = np.memmap(prefix + ".bin", dtype="uint8", mode="r") if size else np.zeros(0, dtype="uint8")
+        return cls(blob, offsets)
+
+    @classmethod
+    def from_legacy(cls, map_path: str) -> "NameTable":
+        """Old map.npy (array of str). Loaded without pickle; object arrays are refused."""
+        names = [str(n) for n in np.load(map_path, allow_pickle=False)]
+        encoded = [n.encode("utf-8") for n in names]
+        offsets = np.zeros(len(encoded) + 1, dtype="uint64")
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype="uint8"), offsets)
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self._blob[int(self._offsets[i]):int(self._offsets[i + 1])]).decode("utf-8")
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+
+def _nlist(n: int) -> int:
+    nlist = IVF_NLIST or int(4 * np.sqrt(n))
+    return max(1, min(nlist, n // MIN_TRAIN_PER_LIST))
+
+
+def build(vecs: np.ndarray, ids: np.ndarray, kind: str = SKILL_INDEX_TYPE) -> tuple:
+    """Build an index over L2-normalized vecs with explicit int64 ids. Returns (index, params actually used)."""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown SKILL_INDEX_TYPE {kind!r}; expected one of {INDEX_TYPES}")
+    n, dim = vecs.shape
+    # Quantizers need enough points to train; tiny KBs are served exactly
+    min_train = max(MIN_TRAIN_PER_LIST * 4, 256 if kind == "ivfpq" else 0)  # PQ codebooks have 2^8 centroids
+    if kind.startswith("ivf") and n < min_train:
+        log.warning(f"{n} skills is too few to train {kind}; building flat instead")
+        kind = "flat"
+
+    if kind == "flat":
+        index, params = faiss.IndexIDMap2(faiss.IndexFlatIP(dim)), {}
+    elif kind == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        hnsw.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index = faiss.IndexIDMap2(hnsw)
+        params = {"M": HNSW_M, "efConstruction": HNSW_EF_CONSTRUCTION, "efSearch": HNSW_EF_SEARCH}
+    else:
+        nlist = _nlist(n)
+        quantizer = faiss.IndexFlatIP(dim)
+        if kind == "ivfpq":
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, PQ_M, 8, faiss.METRIC_INNER_PRODUCT)
+            params = {"nlist": nlist, "nprobe": IVF_NPROBE, "pq_m": PQ_M, "pq_bits": 8}
+        else:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+            params = {"nlist": nlist, "nprobe": IVF_NPROBE}
+        index.train(vecs)
+    index.add_with_ids(vecs, ids)
+    tune(index)
+    return index, {"type": kind, **params}
+
+
+def _inner(index):
+    return faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+
+
+def tune(index):
+    """Apply query-time knobs; these aren't persisted by write_index."""
+    inner = _inner(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = HNSW_EF_SEARCH
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = IVF_NPROBE
+
+
+def supports_remove(index) -> bool:
+    """HNSW graphs can't drop vectors; those indexes are rebuilt on change/removal."""
+    return not isinstance(_inner(index), faiss.IndexHNSW)
+
+
+def recall_at_k(index, vecs: np.ndarray, ids: np.ndarray, k: int = 5, sample: int = 1000, seed: int = 0) -> dict:
+    """Recall@1 and @k of index vs an exact flat scan, using KB vectors as queries."""
+    rng = np.random.default_rng(seed)
+    queries = vecs[rng.choice(len(vecs), size=min(sample, len(vecs)), replace=False)]
+    exact = faiss.IndexFlatIP(vecs.shape[1])
+    exact.add(vecs)
+    _, truth = exact.search(queries, k)
+    truth = ids[truth]
+    _, got = index.search(queries, k)
+    at_k = np.mean([len(set(t) & set(g)) / k for t, g in zip(truth, got)])
+    at_1 = np.mean(truth[:, 0] == got[:, 0])
+    return {"recall@1": round(float(at_1), 4), f"recall@{k}": round(float(at_k), 4), "queries": len(queries)}
+
+
+def save(index, index_path: str, names: List[str], meta: dict):
+    faiss.write_index(index, index_path)
+    NameTable.write(_names_prefix(index_path), names)
+    with open(_meta_path(index_path), "w", encoding="utf-8") as f:
+        json.dump({**meta, "size": len(names), "bytes": os.path.getsize(index_path), "built_at": int(time.time())}, f, indent=2)
+
+
+def load(index_path: str, legacy_map_path: Optional[str] = None, mmap: bool = True) -> tuple:
+    """(index, names). Memory-maps the index where the format allows it; pass mmap=False to modify it."""
+    try:
+        index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP if mmap else 0)
+    except RuntimeError as e:
+        if not mmap:
+            raise
+        log.info(f"mmap load unsupported for {index_path} ({e}); reading into memory")
+        index = faiss.read_index(index_path)
+    tune(index)
+
+    prefix = _names_prefix(index_path)
+    if os.path.exists(prefix + ".offsets.npy"):
+        names = NameTable.load(prefix)
+    elif legacy_map_path and os.path.exists(legacy_map_path):
+        names = NameTable.from_legacy(legacy_map_path)
+    else:
+        raise FileNotFoundError(f"No name table next to {index_path}")
+    return index, names
+
+
+def read_meta(index_path: str) -> dict:
+    try:
+        with open(_meta_path(index_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _names_prefix(index_path: str) -> str:
+    return os.path.join(os.path.dirname(index_path), "names")
+
+
+def _meta_path(index_path: str) -> str:
+    return os.path.join(os.path.dirname(index_path), "meta.json")
+
+
+# ── Versioned publishing ──────────────────────────────────────────────────────
+
+def current_version(root: str) -> Optional[str]:
+    try:
+        with open(os.path.join(root, "CURRENT"), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def publish(root: str, write) -> str:
+    """
+    Create v{N+1}/, let write(dir) fill it, then atomically point CURRENT at it.
+    Older versions beyond INDEX_KEEP_VERSIONS are removed; processes that still
+    have them mapped keep working until they reload.
+    """
+    os.makedirs(root, exist_ok=True)
+    versions = sorted(int(m.group(1)) for d in os.listdir(root) if (m := re.fullmatch(r"v(\d+)", d)))
+    versions.append((versions[-1] if versions else 0) + 1)
+    name = f"v{versions[-1]}"
+    path = os.path.join(root, name)
+    os.makedirs(path)
+    write(path)
+
+    tmp = os.path.join(root, "CURRENT.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(root, "CURRENT"))
+
+    for old in versions[:-max(INDEX_KEEP_VERSIONS, 1)]:
+        shutil.rmtree(os.path.join(root, f"v{old}"), ignore_errors=True)
+    return name
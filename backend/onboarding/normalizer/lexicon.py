@@ -0,0 +1,95 @@
+"""
+Exact / alias lookup tier that runs ahead of the embedding search.
+
+Built from the skills KB (`name` + `aliases`). Keys are case- and punctuation-
+insensitive, so "ReactJS", "React.js" and "react js" all hit the same entry. A
+token trie catches multi-token aliases embedded in longer strings
+("Amazon Web Services (AWS)"). Anything it can't resolve falls through to FAISS.
+"""
+import re
+import json
+import unicodedata
+from typing import Dict, List, Optional
+
+_TOKEN = re.compile(r"[a-z0-9+#]+")
+
+
+def tokens(text: str) -> List[str]:
+    return _TOKEN.findall(unicodedata.normalize("NFKC", text).lower())
+
+
+def keys(text: str) -> List[str]:
+    """Spaced and squashed forms: "React.js" -> ["react js", "reactjs"]."""
+    toks = tokens(text)
+    if not toks:
+        return []
+    spaced, squashed = " ".join(toks), "".join(toks)
+    return [spaced] if spaced == squashed else [spaced, squashed]
+
+
+class Lexicon:
+
+    def __init__(self, entries: Dict[str, str]):
+        self.entries = entries
+        self._trie: dict = {}
+        for key, canonical in entries.items():
+            toks = key.split(" ")
+            if len(toks) < 2:
+                continue
+            node = self._trie
+            for t in toks:
+                node = node.setdefault(t, {})
+            node["$"] = canonical
+
+    @classmethod
+    def from_docs(cls, docs: List[dict]) -> "Lexicon":
+        entries: Dict[str, str] = {}
+        # Names claim their keys before any alias can
+        for d in docs:
+            for k in keys(d.get("name", "")):
+                entries.setdefault(k, d["name"])
+        for d in docs:
+            for alias in d.get("aliases", []) or []:
+                for k in keys(alias):
+                    entries.setdefault(k, d["name"])
+        return cls(entries)
+
+    @classmethod
+    def load(cls, path: str) -> "Lexicon":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+
+    def _scan(self, toks: List[str]) -> List[tuple]:
+        """Longest trie match at each position: [(start, end, canonical)]."""
+        found, i = [], 0
+        while i < len(toks):
+            node, end, hit = self._trie, i, None
+            while end < len(toks) and toks[end] in node:
+                node = node[toks[end]]
+                end += 1
+                if "$" in node:
+                    hit = (i, end, node["$"])
+            if hit:
+                found.append(hit)
+                i = hit[1]
+            else:
+                i += 1
+        return found
+
+    def lookup(self, skill: str) -> Optional[str]:
+        for k in keys(skill):
+            if k in self.entries:
+                return self.entries[k]
+        toks = tokens(skill)
+        matches = self._scan(toks)
+        # Only trust the automaton when it points at one skill covering most of the string
+        if len({m[2] for m in matches}) == 1 and sum(e - s for s, e, _ in matches) * 2 >= len(toks):
+            return matches[0][2]
+        return None
+
+    def __len__(self):
+        return len(self.entries)
@@ -1,20 +1,40 @@
 import os
+import json
+import time
+import hashlib
+import logging
+import argparse
 import numpy as np
 import faiss
-from rapidfuzz import fuzz
 from sentence_transformers import SentenceTransformer
 from pymongo import MongoClient
 from dotenv import load_dotenv
 
+from .lexicon import Lexicon
+from .embed_cache import EmbeddingCache
+from . import index_store
+from .rerank import rerank
+
 load_dotenv()
 
+log = logging.getLogger("normalizer")
+
 EMBED_DIM = 768
-INDEX_PATH = "./data/skills_vectors/index.bin"
+MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+VECTORS_DIR = "./data/skills_vectors"  # versioned builds: v{N}/ + CURRENT pointer
+INDEX_PATH = "./data/skills_vectors/index.bin"  # legacy unversioned layout, read when CURRENT is absent
 MAP_PATH   = "./data/skills_vectors/map.npy"
+LEXICON_PATH = "./data/skills_vectors/lexicon.json"
+RELOAD_CHECK_S = float(os.getenv("SKILL_INDEX_RELOAD_CHECK_S", "5"))
 
 _model = None
-_index = None
-_id_map = None
+_index_state = None  # (index, names, lexicon, version) — swapped as one object
+_last_reload_check = 0.0
+_lexicon = None
+_embed_cache = None
+
+# Process-lifetime counters for the exact/alias tier vs the embedding path
+STATS = {"fast_hits": 0, "vector_skills": 0, "vector_ms": 0.0}
 
 _mongo = MongoClient(os.getenv("MONGODB_URI"))
 skills_col = _mongo["kb"]["skills"]
@@ -23,50 +43,126 @@ skills_col = _mongo["kb"]["skills"]
 def _get_model():
     global _model
     if _model is None:
-        print("INFO: Loading SentenceTransformer...")
-        _model = SentenceTransformer("sentence-transformers/all-mpnet-base-v2")
+        log.info("Loading SentenceTransformer...")
+        _model = SentenceTransformer(MODEL_NAME)
     return _model
 
 
+def _load_state():
+    version = index_store.current_version(VECTORS_DIR)
+    if version is None:
+        index, names = index_store.load(INDEX_PATH, legacy_map_path=MAP_PATH)
+        return index, names, None, None
+    path = os.path.join(VECTORS_DIR, version)
+    index, names = index_store.load(os.path.join(path, "index.bin"))
+    return index, names, Lexicon.load(os.path.join(path, "lexicon.json")), version
+
+
+def _get_state():
+    """Current (index, names, lexicon, version); picks up a newly published build within RELOAD_CHECK_S."""
+    global _index_state, _last_reload_check
+    now = time.monotonic()
+    if _index_state is None:
+        _index_state, _last_reload_check = _load_state(), now
+    elif now - _last_reload_check >= RELOAD_CHECK_S:
+        _last_reload_check = now
+        if index_store.current_version(VECTORS_DIR) != _index_state[3]:
+            _index_state = _load_state()
+            log.info(f"Hot-swapped skill index to {_index_state[3]}")
+    return _index_state
+
+
 def _get_index():
-    global _index, _id_map
-    if _index is None:
-        _index = faiss.read_index(INDEX_PATH)
-        _id_map = np.load(MAP_PATH, allow_pickle=True)
-    return _index, _id_map
+    index, names, _, _ = _get_state()
+    return index, names
 
 
-def _embed(texts: list) -> np.ndarray:
-    model = _get_model()
-    vecs = []
-    for i in range(0, len(texts), 200):
-        vecs.extend(model.encode(texts[i:i + 200]))
-    return np.array(vecs, dtype="float32")
+def _get_lexicon() -> Lexicon:
+    global _lexicon
+    if index_store.current_version(VECTORS_DIR) is not None:
+        return _get_state()[2]
+    if _lexicon is None:
+        if os.path.exists(LEXICON_PATH):
+            _lexicon = Lexicon.load(LEXICON_PATH)
+        else:
+            _lexicon = Lexicon.from_docs(list(skills_col.find({}, {"name": 1, "aliases": 1})))
+    return _lexicon
+
 
+def fast_path_hit_rate() -> float:
+    total = STATS["fast_hits"] + STATS["vector_skills"]
+    return STATS["fast_hits"] / total if total else 0.0
 
-def _fuzzy_pick(neighbor_map: dict) -> list:
-    results = []
-    for original, neighbors in neighbor_map.items():
-        best, best_score = None, -1
-        for neighbor, _ in neighbors:
-            score = fuzz.ratio(original, neighbor)
-            if score > best_score:
-                best_score = score
-                best = neighbor
-        if best:
-            results.append(best)
-    return results
+
+def _get_embed_cache() -> EmbeddingCache:
+    global _embed_cache
+    if _embed_cache is None:
+        _embed_cache = EmbeddingCache(MODEL_NAME, EMBED_DIM)
+    return _embed_cache
+
+
+def _embed(texts: list) -> np.ndarray:
+    """Embeddings for texts; only strings missing from the cache reach the model."""
+    if not texts:
+        return np.zeros((0, EMBED_DIM), dtype="float32")
+    cache = _get_embed_cache()
+    vecs = cache.get_many(texts)
+    unseen = list(dict.fromkeys(t for t, v in zip(texts, vecs) if v is None))
+    if unseen:
+        model = _get_model()
+        encoded = []
+        for i in range(0, len(unseen), 200):
+            encoded.extend(model.encode(unseen[i:i + 200]))
+        encoded = np.array(encoded, dtype="float32")
+        cache.put_many(unseen, encoded)
+        fresh = dict(zip(unseen, encoded))
+        vecs = [fresh[t] if v is None else v for t, v in zip(texts, vecs)]
+    return np.array(vecs, dtype="float32")
 
 
 def _query_index(skills: list, k: int = 5) -> dict:
+    """FAISS neighbours re-ranked against lexical similarity; unconfident skills map to themselves."""
     index, id_map = _get_index()
     vecs = _embed(skills)
     faiss.normalize_L2(vecs)
     distances, indices = index.search(vecs, k)
-    return {
-        skill: [(str(id_map[idx]), float(distances[i][j])) for j, idx in enumerate(indices[i])]
-        for i, skill in enumerate(skills)
-    }
+    return rerank(skills, id_map, indices, distances)
+
+
+def normalize_map(skills: list) -> dict:
+    """
+    Canonical name per distinct input skill. Exact/alias hits skip the model entirely;
+    only the remainder is embedded and searched. Raises on model/index failure.
+    """
+    if not skills:
+        return {}
+    unique = list(dict.fromkeys(skills))
+    lexicon = _get_lexicon()
+    mapping, rest = {}, []
+    for skill in unique:
+        hit = lexicon.lookup(skill)
+        if hit:
+            mapping[skill] = hit
+        else:
+            rest.append(skill)
+
+    if rest:
+        start = time.perf_counter()
+        mapping.update(_query_index(rest))
+        STATS["vector_ms"] += (time.perf_counter() - start) * 1000
+        STATS["vector_skills"] += len(rest)
+    STATS["fast_hits"] += len(unique) - len(rest)
+
+    per_skill_ms = STATS["vector_ms"] / STATS["vector_skills"] if STATS["vector_skills"] else 0.0
+    log.info(
+        f"Normalized {len(unique)} skills: {len(unique) - len(rest)} fast-path, {len(rest)} vector "
+        f"(~{(len(unique) - len(rest)) * per_skill_ms:.0f}ms saved, lifetime hit rate {fast_path_hit_rate():.1%})"
+    )
+    return mapping
+
+
+def apply_map(skills: list, mapping: dict) -> list:
+    return [mapping[s] for s in dict.fromkeys(skills) if s in mapping]
 
 
 def normalize_skills(skills: list) -> list:
@@ -75,35 +171,190 @@ def normalize_skills(skills: list) -> list:
     if os.getenv("FAST_START") == "True":
         return skills  # skip normalization in dev, return raw
     try:
-        return _fuzzy_pick(_query_index(skills))
+        return apply_map(skills, normalize_map(skills))
     except Exception as e:
-        print(f"WARN: normalize_skills failed, returning raw: {e}")
+        log.warning(f"normalize_skills failed, returning raw: {e}")
         return skills
 
 
-# ── Run this to rebuild the FAISS index from the skill KB in MongoDB ──────────
+def warmup():
+    """Load the model, index and lexicon up front so the first real request doesn't pay for it."""
+    _get_model()
+    _get_index()
+    _get_lexicon()
+    _get_embed_cache()
 
-def rebuild_index():
-    os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
-    docs = list(skills_col.find({}))
 
-    def to_text(d):
-        aliases = ",".join(d.get("aliases", []))
-        related = ",".join(d.get("related_skills", []))
-        return f"name: {d.get('name','')} | aliases: {aliases} | related: {related} | category: {d.get('category','')}"
+# ── Index maintenance from the skill KB in MongoDB ───────────────────────────
+
+def _to_text(d: dict) -> str:
+    aliases = ",".join(d.get("aliases", []))
+    related = ",".join(d.get("related_skills", []))
+    return f"name: {d.get('name','')} | aliases: {aliases} | related: {related} | category: {d.get('category','')}"
 
-    texts = [to_text(d) for d in docs]
+
+def _doc_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _publish(index, names: list, manifest: dict, docs: list, meta: dict) -> str:
+    def write(path):
+        index_store.save(index, os.path.join(path, "index.bin"), names, meta)
+        with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        Lexicon.from_docs(docs).save(os.path.join(path, "lexicon.json"))
+    return index_store.publish(VECTORS_DIR, write)
+
+
+def rebuild_index():
+    """Full rebuild: re-embed (through the cache) and re-index every KB document."""
+    docs = list(skills_col.find({}))
+    texts = [_to_text(d) for d in docs]
     names = [d["name"] for d in docs]
+    ids = np.arange(len(docs), dtype="int64")
     vecs = _embed(texts)
 
     faiss.normalize_L2(vecs)
-    index = faiss.IndexFlatIP(EMBED_DIM)
-    index.add(vecs)
+    start = time.perf_counter()
+    index, params = index_store.build(vecs, ids)
+    build_s = time.perf_counter() - start
+    recall = index_store.recall_at_k(index, vecs, ids)
+
+    manifest = {str(d["_id"]): {"id": i, "hash": _doc_hash(t)} for i, (d, t) in enumerate(zip(docs, texts))}
+    version = _publish(index, names, manifest, docs, {**params, "dim": EMBED_DIM, "model": MODEL_NAME,
+                                                      "build_s": round(build_s, 2), "trained_size": len(docs), **recall})
+    cache = _get_embed_cache()
+    print(f"Rebuilt {params['type']} index {version}: {len(names)} skills in {build_s:.1f}s, {recall}, "
+          f"embedding cache hit rate {cache.hit_rate():.1%}")
+
+
+def update_index():
+    """
+    Incremental update: diff KB content hashes against the current manifest, embed only
+    added/changed documents, and remove/add their vectors by id. Falls back to a full
+    rebuild when there is no versioned build yet, when an HNSW index would need removals,
+    or when an IVF index has grown past twice the size its quantizer was trained on.
+    """
+    version = index_store.current_version(VECTORS_DIR)
+    if version is None:
+        print("No versioned index yet; running full rebuild.")
+        return rebuild_index()
+    path = os.path.join(VECTORS_DIR, version)
+    with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    meta = index_store.read_meta(os.path.join(path, "index.bin"))
+    index, table = index_store.load(os.path.join(path, "index.bin"), mmap=False)
+    names = [table[i] for i in range(len(table))]
+
+    docs = list(skills_col.find({}))
+    seen, changed, added = set(), [], []
+    for d in docs:
+        key, text = str(d["_id"]), _to_text(d)
+        seen.add(key)
+        entry = manifest.get(key)
+        if entry is None:
+            added.append((d, text))
+        elif entry["hash"] != _doc_hash(text):
+            changed.append((d, text))
+    removed = [k for k in manifest if k not in seen]
+
+    if not (added or changed or removed):
+        print(f"Index {version} is up to date ({len(docs)} skills).")
+        return
+    if (changed or removed) and not index_store.supports_remove(index):
+        print(f"{meta.get('type', 'index')} can't remove vectors; running full rebuild.")
+        return rebuild_index()
+    if meta.get("type", "").startswith("ivf") and index.ntotal + len(added) > 2 * meta.get("trained_size", index.ntotal):
+        print("IVF index has outgrown its trained quantizer; running full rebuild.")
+        return rebuild_index()
+
+    start = time.perf_counter()
+    stale = [manifest[k]["id"] for k in removed] + [manifest[str(d["_id"])]["id"] for d, _ in changed]
+    if stale:
+        index.remove_ids(np.array(stale, dtype="int64"))
+    for k in removed:
+        names[manifest.pop(k)["id"]] = ""
+
+    upserts = changed + added
+    ids = []
+    for d, text in upserts:
+        key = str(d["_id"])
+        if key in manifest:
+            i = manifest[key]["id"]
+            names[i] = d["name"]
+        else:
+            i = len(names)
+            names.append(d["name"])
+        manifest[key] = {"id": i, "hash": _doc_hash(text)}
+        ids.append(i)
+    if upserts:
+        vecs = _embed([t for _, t in upserts])
+        faiss.normalize_L2(vecs)
+        index.add_with_ids(vecs, np.array(ids, dtype="int64"))
+    update_s = time.perf_counter() - start
+
+    new_version = _publish(index, names, manifest, docs, {**meta, "update_s": round(update_s, 3),
+                                                          "updated_from": version})
+    print(f"Updated {version} -> {new_version}: +{len(added)} ~{len(changed)} -{len(removed)} in {update_s:.2f}s")
+
+
+def _compare_update_vs_rebuild():
+    """
+    Time a one-document update against a full rebuild, both with a cold embedding cache.
+    Everything is built under a scratch VECTORS_DIR: the comparison edits an index in
+    place, which must never touch a published version live workers have memory-mapped.
+    """
+    import shutil
+    import tempfile
+    global _embed_cache, VECTORS_DIR
+
+    live_dir, VECTORS_DIR = VECTORS_DIR, tempfile.mkdtemp(prefix="skills_vectors_compare_")
+    try:
+        _compare_in_scratch()
+    finally:
+        shutil.rmtree(VECTORS_DIR, ignore_errors=True)
+        VECTORS_DIR = live_dir
+
+
+def _compare_in_scratch():
+    import tempfile
+    global _embed_cache
+
+    _embed_cache = EmbeddingCache(MODEL_NAME, EMBED_DIM, tempfile.mkdtemp())
+    start = time.perf_counter()
+    rebuild_index()
+    full_s = time.perf_counter() - start
+
+    # Forget one document in the manifest so update_index treats it as newly added
+    path = os.path.join(VECTORS_DIR, index_store.current_version(VECTORS_DIR))
+    with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    key = next(iter(manifest))
+    index = faiss.read_index(os.path.join(path, "index.bin"))
+    if not index_store.supports_remove(index):
+        print(f"Full rebuild {full_s:.2f}s; one-document timing needs a removable index (not hnsw).")
+        return
+    index.remove_ids(np.array([manifest.pop(key)["id"]], dtype="int64"))
+    faiss.write_index(index, os.path.join(path, "index.bin"))
+    with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
 
-    faiss.write_index(index, INDEX_PATH)
-    np.save(MAP_PATH, np.array(names))
-    print(f"Rebuilt index: {len(names)} skills")
+    _embed_cache = EmbeddingCache(MODEL_NAME, EMBED_DIM, tempfile.mkdtemp())
+    start = time.perf_counter()
+    update_index()
+    one_s = time.perf_counter() - start
+    print(f"Full rebuild {full_s:.2f}s vs one-document update {one_s:.2f}s ({full_s / one_s:.0f}x)")
 
 
 if __name__ == "__main__":
-    rebuild_index()
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Maintain the FAISS skill index from the skill KB.")
+    parser.add_argument("--full", action="store_true", help="Re-index every document instead of diffing.")
+    parser.add_argument("--compare", action="store_true", help="Time a one-document update against a full rebuild.")
+    args = parser.parse_args()
+    if args.compare:
+        _compare_update_vs_rebuild()
+    elif args.full:
+        rebuild_index()
+    else:
+        update_index()
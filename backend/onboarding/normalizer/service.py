@@ -0,0 +1,246 @@
+"""
+Embedding sidecar for skill normalization.
+
+One process owns the SentenceTransformer model and FAISS index and serves every
+uvicorn worker over a Unix socket, so the ~400 MB model is loaded once, up front,
+and never inside an event loop. Concurrent requests arriving within a short window
+are folded into a single batched encode.
+
+Protocol: one JSON object per line. {"skills": [...]} -> {"skills": [...]};
+{"op": "map", "skills": [...]} -> {"mapping": {raw: canonical}}; {"op": "ping"} -> {"ok": true, "ready": bool}.
+The socket is bound before the model loads; requests that arrive meanwhile wait for it.
+Clients use the sidecar only when EMBED_SOCKET is set (the Dockerfile sets it and keeps
+the sidecar restarted); otherwise, and whenever it is unreachable, they normalize
+in-process, counted in horizon_embed_fallback_total.
+
+    EMBED_SOCKET=/tmp/horizon-embed.sock python -m onboarding.normalizer.service
+"""
+import os
+import json
+import asyncio
+import logging
+
+import metrics
+from .normalizer import normalize_map, apply_map, normalize_skills, warmup
+
+log = logging.getLogger("embed")
+
+EMBED_SOCKET = os.getenv("EMBED_SOCKET", "")  # unset: no sidecar, normalize in-process
+BATCH_WINDOW = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5")) / 1000
+MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "512"))
+CLIENT_TIMEOUT = float(os.getenv("EMBED_CLIENT_TIMEOUT", "30"))
+# A map request/reply for a backfill chunk is far past asyncio's 64 KiB line default
+STREAM_LIMIT = int(os.getenv("EMBED_STREAM_LIMIT", str(64 * 1024 * 1024)))
+PRELOAD_WAIT = float(os.getenv("EMBED_PRELOAD_WAIT", "30"))  # how long API workers wait for the sidecar's socket
+
+
+# ── Server ────────────────────────────────────────────────────────────────────
+
+class _Batcher:
+    """Collects concurrent requests for BATCH_WINDOW and normalizes their union in one call."""
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    async def submit(self, skills: list) -> list:
+        return apply_map(skills, await self.submit_map(skills))
+
+    async def submit_map(self, skills: list) -> dict:
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((skills, fut))
+        return await fut
+
+    async def run(self, ready: asyncio.Event):
+        loop = asyncio.get_running_loop()
+        await ready.wait()  # requests queue up while the model loads
+        while True:
+            items = [await self._queue.get()]
+            deadline = loop.time() + BATCH_WINDOW
+            while sum(len(s) for s, _ in items) < MAX_BATCH:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            unique = list(dict.fromkeys(s for skills, _ in items for s in skills))
+            try:
+                mapping = await asyncio.to_thread(normalize_map, unique)
+            except Exception as e:
+                log.warning(f"Batch normalization failed, returning raw: {e}")
+                mapping = {s: s for s in unique}
+            log.info(f"Normalized batch: {len(items)} requests, {len(unique)} unique skills")
+            for skills, fut in items:
+                if not fut.done():
+                    fut.set_result({s: mapping[s] for s in skills if s in mapping})
+
+
+async def serve(path: str = EMBED_SOCKET):
+    if os.path.exists(path):
+        if await ping(path):
+            log.warning(f"Embedding service already running at {path}")
+            return
+        os.unlink(path)
+
+    batcher = _Batcher()
+    ready = asyncio.Event()
+    batch_task = asyncio.create_task(batcher.run(ready))
+
+    async def warm():
+        log.info("Preloading embedding model and skill index...")
+        try:
+            await asyncio.to_thread(warmup)
+            log.info("Embedding model ready")
+        except Exception as e:
+            log.warning(f"Warmup failed, loading lazily on first batch: {e}")
+        finally:
+            ready.set()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while line := await reader.readline():
+                req = json.loads(line)
+                if req.get("op") == "ping":
+                    resp = {"ok": True, "ready": ready.is_set()}
+                elif req.get("op") == "map":
+                    resp = {"mapping": await batcher.submit_map(req.get("skills") or [])}
+                else:
+                    resp = {"skills": await batcher.submit(req.get("skills") or [])}
+                writer.write(json.dumps(resp).encode() + b"\n")
+                await writer.drain()
+        except Exception as e:
+            log.warning(f"Embedding client error: {e}")
+        finally:
+            writer.close()
+
+    # Bind before warming so API workers find the socket and never load a second model copy
+    server = await asyncio.start_unix_server(handle, path=path, limit=STREAM_LIMIT)
+    os.chmod(path, 0o660)
+    log.info(f"Embedding service listening on {path}")
+    warm_task = asyncio.create_task(warm())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        warm_task.cancel()
+        batch_task.cancel()
+
+
+# ── Client ────────────────────────────────────────────────────────────────────
+
+async def _call(payload: dict, path: str = EMBED_SOCKET) -> dict:
+    reader, writer = await asyncio.open_unix_connection(path, limit=STREAM_LIMIT)
+    try:
+        writer.write(json.dumps(payload).encode() + b"\n")
+        await writer.drain()
+        return json.loads(await asyncio.wait_for(reader.readline(), CLIENT_TIMEOUT))
+    finally:
+        writer.close()
+
+
+async def ping(path: str = EMBED_SOCKET) -> bool:
+    try:
+        return (await asyncio.wait_for(_call({"op": "ping"}, path), 2)).get("ok", False)
+    except Exception:
+        return False
+
+
+_sidecar_down = False
+
+
+def _fallback(reason: str, e: Exception = None):
+    """Count a call that bypassed the sidecar; warn once per outage rather than on every call."""
+    global _sidecar_down
+    metrics.EMBED_FALLBACKS.labels(reason).inc()
+    if reason != "unconfigured" and not _sidecar_down:
+        _sidecar_down = True
+        log.warning(f"Embedding service at {EMBED_SOCKET} failed ({reason}: {e}); normalizing in-process until it returns")
+
+
+def _reached():
+    global _sidecar_down
+    if _sidecar_down:
+        _sidecar_down = False
+        log.info(f"Embedding service at {EMBED_SOCKET} reachable again")
+
+
+async def normalize_skills_async(skills: list) -> list:
+    """
+    Normalize through the sidecar. Falls back to in-process normalization in a
+    worker thread (never on the event loop) when the sidecar isn't configured or reachable.
+    """
+    if not skills:
+        return []
+    if os.getenv("FAST_START") == "True":
+        return skills
+    if not EMBED_SOCKET:
+        _fallback("unconfigured")
+        return await asyncio.to_thread(normalize_skills, skills)
+    try:
+        resp = await _call({"skills": skills})
+        _reached()
+        return resp["skills"]
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        _fallback("unreachable", e)
+    except Exception as e:
+        # The sidecar exists (e.g. still warming); a second model copy here is worse than raw skills
+        _fallback("error", e)
+        return skills
+    return await asyncio.to_thread(normalize_skills, skills)
+
+
+async def normalize_map_async(skills: list) -> dict:
+    """Raw -> canonical for each distinct skill, for batch jobs that rewrite stored data."""
+    if not skills:
+        return {}
+    if os.getenv("FAST_START") == "True":
+        return {s: s for s in skills}
+    if not EMBED_SOCKET:
+        _fallback("unconfigured")
+        return await asyncio.to_thread(normalize_map, skills)
+    try:
+        resp = await _call({"op": "map", "skills": skills})
+        _reached()
+        return resp["mapping"]
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        _fallback("unreachable", e)
+    except Exception as e:
+        _fallback("error", e)
+        return {s: s for s in skills}
+    return await asyncio.to_thread(normalize_map, skills)
+
+
+async def preload():
+    """
+    Startup hook. With EMBED_SOCKET set, wait up to PRELOAD_WAIT for the sidecar (started
+    alongside us, it may still be importing); warm the in-process model only if it never
+    shows up, or right away when no sidecar is configured.
+    """
+    if os.getenv("FAST_START") == "True":
+        return
+    if not EMBED_SOCKET:
+        log.info("EMBED_SOCKET not set; warming in-process normalizer.")
+        await asyncio.to_thread(warmup)
+        return
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + PRELOAD_WAIT
+    while True:
+        if await ping():
+            log.info(f"Embedding service reachable at {EMBED_SOCKET}")
+            return
+        if loop.time() >= deadline:
+            break
+        await asyncio.sleep(0.5)
+    log.warning(f"Embedding service not reachable at {EMBED_SOCKET} after {PRELOAD_WAIT:.0f}s; warming in-process fallback.")
+    await asyncio.to_thread(warmup)
+
+
+if __name__ == "__main__":
+    import sys
+    import logsetup
+    logsetup.setup()
+    if not EMBED_SOCKET:
+        sys.exit("Set EMBED_SOCKET to the socket path the API workers will use.")
+    asyncio.run(serve())
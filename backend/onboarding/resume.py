@@ -1,7 +1,11 @@
-import pdfplumber
+import re
+import json
+import asyncio
+import hashlib
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from openai import AsyncOpenAI
 from onboarding.models import Profile
+from onboarding.extract import extract_text, ExtractionError
 import os
 from dotenv import load_dotenv
 
@@ -12,6 +16,9 @@ client = AsyncOpenAI(base_url="https://openrouter.ai/api/v1", api_key=os.getenv(
 
 MODEL = os.getenv("MODEL_RESUME_PARSER", os.getenv("OPENROUTER_MODEL", "google/gemini-2.5-flash-lite"))
 MAX_UPLOAD_BYTES = 5 * 1024 * 1024  # 5 MB
+RESUME_TTL = int(os.getenv("CACHE_TTL_RESUME", str(30 * 86400)))  # Default: 30 days
+# Changes whenever the Profile schema does, so stale parses are never served after a model change
+SCHEMA_VERSION = hashlib.sha256(json.dumps(Profile.model_json_schema(), sort_keys=True).encode()).hexdigest()[:12]
 
 
 async def _validate_upload(file: UploadFile) -> bytes:
@@ -24,18 +31,41 @@ async def _validate_upload(file: UploadFile) -> bytes:
     return content
 
 
+def _resume_cache_key(kind: str, digest: str) -> str:
+    return f"horizon:resume:{kind}:{MODEL}:{SCHEMA_VERSION}:{digest}"
+
+
+def _text_digest(text: str) -> str:
+    # Re-exports of the same resume differ in bytes but rarely in words
+    return hashlib.sha256(re.sub(r"\s+", " ", text).strip().lower().encode("utf-8")).hexdigest()
+
+
 @resume_router.post("/parse_resume")
 async def parse_resume(file: UploadFile = File(...)):
     try:
         content = await _validate_upload(file)
-        import io
-        text = ""
-        with pdfplumber.open(io.BytesIO(content)) as pdf:
-            for page in pdf.pages:
-                extracted = page.extract_text()
-                if extracted:
-                    text += extracted + "\n"
-        
+
+        import ops
+        from main import get_redis
+        rc = get_redis()
+        pdf_key = _resume_cache_key("pdf", hashlib.sha256(content).hexdigest())
+        if rc and (cached := await rc.get(pdf_key)):
+            ops.count_stat("resume", "pdf_hit")
+            return json.loads(cached)
+
+        try:
+            text, complete = await extract_text(content)
+        except (ExtractionError, asyncio.TimeoutError) as e:
+            raise HTTPException(422, detail=f"Could not read PDF: {e or 'timed out'}")
+        if not text.strip():
+            raise HTTPException(422, detail="No text found in PDF.")
+
+        text_key = _resume_cache_key("text", _text_digest(text))
+        if rc and complete and (cached := await rc.get(text_key)):
+            await rc.setex(pdf_key, RESUME_TTL, cached)
+            ops.count_stat("resume", "text_hit")
+            return json.loads(cached)
+
         response = await client.beta.chat.completions.parse(
             model=MODEL,
             messages=[
@@ -44,11 +74,19 @@ async def parse_resume(file: UploadFile = File(...)):
             ],
             response_format=Profile
         )
-        
-        import ops
+
         ops.log_llm_cost("parse_resume", MODEL, response)
-        
-        return response.choices[0].message.parsed.model_dump()
+
+        parsed = response.choices[0].message.parsed.model_dump()
+        if rc and not complete:
+            # A deadline-truncated parse must not be pinned to this PDF for RESUME_TTL
+            ops.count_stat("resume", "partial")
+        elif rc:
+            payload = json.dumps(parsed)
+            await rc.setex(pdf_key, RESUME_TTL, payload)
+            await rc.setex(text_key, RESUME_TTL, payload)
+            ops.count_stat("resume", "miss")
+        return parsed
     except HTTPException:
         raise
     except Exception as e:
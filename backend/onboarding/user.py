@@ -1,27 +1,148 @@
+"""
+Async user repository over `users_db.profiles` (Motor, shared client from ops).
+
+Each caller asks for a named view, so only the fields it needs cross the wire, and
+id-keyed reads are served from a short-TTL in-process cache. Every write made through
+this module drops the user's entries here and, over cache.py's invalidation channel,
+in every other worker.
+"""
 import os
+import copy
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
 
-from pymongo import MongoClient
-from dotenv import load_dotenv
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
 
+import ops
+import cache
 from .models import User
-from .normalizer.normalizer import normalize_skills
+from .normalizer.service import normalize_skills_async
+
+log = logging.getLogger("users")
+
+collection = ops.users_col
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_MAX = int(os.getenv("USER_CACHE_MAX", "10000"))
+
+# Per-endpoint projections. "me" is the whole document minus secrets.
+VIEWS: Dict[str, Dict[str, int]] = {
+    "me":       {"_id": 0, "password": 0},
+    "discover": {"_id": 0, "id": 1, "email": 1, "profile": 1, "resume": 1},
+    "tree":     {"_id": 0, "id": 1, "profile": 1, "resume": 1, "personality": 1},
+    "login":    {"_id": 0, "id": 1, "email": 1, "password": 1},
+}
+
+# Process-lifetime counters for cache effectiveness
+STATS = {"cache_hits": 0, "mongo_reads": 0, "mongo_writes": 0}
+
+_cache: "OrderedDict[tuple, tuple]" = OrderedDict()  # (user_id, view) -> (expires_at, doc)
+_redis = None  # carries invalidations to other workers; set by setup()
+
+
+class UserExists(Exception):
+    pass
+
+
+def setup(redis_client):
+    """Run on startup with the shared Redis client, before any write goes through this module."""
+    global _redis
+    _redis = redis_client
+
+
+async def ensure_indexes():
+    """Unique lookups on id and email; idempotent, run at startup."""
+    await collection.create_index("id", unique=True)
+    await collection.create_index("email", unique=True)
+
+
+def invalidate(user_id: str):
+    for view in VIEWS:
+        _cache.pop((user_id, view), None)
+
 
-load_dotenv()
+def _evict(key):
+    if key is None:
+        _cache.clear()
+    else:
+        invalidate(key.rsplit(":", 1)[-1])
 
-collection = MongoClient(os.getenv("MONGODB_URI"))["users_db"]["profiles"]
 
+cache.on_invalidate("user", _evict)
 
-def insert_user_to_db(user: User):
+
+async def _invalidate_everywhere(user_id: str):
+    invalidate(user_id)
+    await cache.publish_invalidation(_redis, f"horizon:user:{user_id}")
+
+
+async def get_user(user_id: str, view: str = "me") -> Optional[Dict[str, Any]]:
+    key = (user_id, view)
+    hit = _cache.get(key)
+    if hit and hit[0] > time.monotonic():
+        _cache.move_to_end(key)
+        STATS["cache_hits"] += 1
+        return copy.deepcopy(hit[1])
+
+    STATS["mongo_reads"] += 1
+    doc = await collection.find_one({"id": user_id}, VIEWS[view])
+    if doc is not None:
+        _cache[key] = (time.monotonic() + USER_CACHE_TTL, doc)
+        _cache.move_to_end(key)
+        if len(_cache) > USER_CACHE_MAX:
+            _cache.popitem(last=False)
+        doc = copy.deepcopy(doc)
+    return doc
+
+
+async def get_login(email: str) -> Optional[Dict[str, Any]]:
+    """Credentials are never cached."""
+    STATS["mongo_reads"] += 1
+    return await collection.find_one({"email": email}, VIEWS["login"])
+
+
+async def email_exists(email: str) -> bool:
+    STATS["mongo_reads"] += 1
+    return await collection.find_one({"email": email}, {"_id": 1}) is not None
+
+
+async def insert_user_to_db(user: User) -> str:
     skills = user.profile.skills or []
     if skills:
-        user.profile.skills = normalize_skills(skills)
-    result = collection.insert_one(user.model_dump())
+        user.profile.skills = await normalize_skills_async(skills)
+    STATS["mongo_writes"] += 1
+    try:
+        result = await collection.insert_one(user.model_dump())
+    except DuplicateKeyError as e:
+        raise UserExists(user.email) from e
     return str(result.inserted_id)
 
 
-def get_user_by_email(email: str):
-    try:
-        return collection.find_one({"email": email})
-    except Exception as e:
-        print(f"ERROR: get_user_by_email: {e}")
-        raise
\ No newline at end of file
+async def update_fields(user_id: str, fields: Dict[str, Any]) -> bool:
+    """$set fields on one user; False if no such user."""
+    STATS["mongo_writes"] += 1
+    res = await collection.update_one({"id": user_id}, {"$set": fields})
+    await _invalidate_everywhere(user_id)
+    return res.matched_count > 0
+
+
+async def bulk_update(updates: Dict[str, Dict[str, Any]]) -> int:
+    """$set fields on many users ({user_id: fields}) in one unordered bulk_write; returns the number modified."""
+    if not updates:
+        return 0
+    STATS["mongo_writes"] += 1
+    res = await collection.bulk_write([UpdateOne({"id": uid}, {"$set": f}) for uid, f in updates.items()], ordered=False)
+    for uid in updates:
+        invalidate(uid)
+    await cache.publish_invalidation(_redis, *[f"horizon:user:{uid}" for uid in updates])
+    return res.modified_count
+
+
+async def delete_user(user_id: str) -> bool:
+    STATS["mongo_writes"] += 1
+    res = await collection.delete_one({"id": user_id})
+    await _invalidate_everywhere(user_id)
+    return res.deleted_count > 0
@@ -1,15 +1,26 @@
 import os
+import time
+import asyncio
 import datetime
 import jwt
+import bcrypt
+import logging
 import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 import httpx
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
 
+import cache
+import tracing
+
 load_dotenv()
 
+log = logging.getLogger("ops")
+
 MONGO_URI = os.getenv("MONGODB_URI")
 JWT_SECRET = os.getenv("JWT_SECRET")
 JWT_ALGO = "HS256"
@@ -19,7 +30,27 @@ users_col = _mongo["users_db"]["profiles"]
 
 current_request_cost = contextvars.ContextVar("current_request_cost", default=None)
 
+# bcrypt releases the GIL, so a small dedicated pool keeps ~100-300ms hashes off the loop.
+# Beyond BCRYPT_MAX_PENDING queued hashes we shed load instead of stalling every request.
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "2"))
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", "32"))
+TOKEN_CACHE_MAX = int(os.getenv("TOKEN_CACHE_MAX", "10000"))
+
+_bcrypt_pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_bcrypt_pending = 0
+_token_cache: "OrderedDict[str, tuple]" = OrderedDict()  # token -> (sub, exp)
+
 _PRICING: dict = {}
+_PRICING_BY_NAME: dict = {}  # "gpt-4o-mini" -> rates, for ids logged without the provider prefix
+_RESOLVED: dict = {}         # memoized model -> rates (or None), cleared whenever pricing reloads
+
+COST_BUCKET_SECONDS = int(os.getenv("COST_BUCKET_SECONDS", "3600"))
+COST_RETENTION_DAYS = int(os.getenv("COST_RETENTION_DAYS", "30"))
+# (bucket, op, model) -> [calls, tokens_in, tokens_out, inr], drained to Redis by flush_cost_ledger
+_LEDGER: dict = {}
+# (family, field) -> increment not yet in `horizon:stats:{family}`; drained alongside the ledger
+_STATS_PENDING: dict = {}
+STATS_LOCAL: dict = {}  # family -> {field: count} for this process, for ratio logs
 
 
 async def issue_token(user_id: str) -> dict:
@@ -33,11 +64,94 @@ async def issue_token(user_id: str) -> dict:
 
 
 async def verify_token(token: str) -> Optional[str]:
+    """Decoded claims are cached until the token's own exp, so repeat calls skip the HMAC check."""
+    hit = _token_cache.get(token)
+    if hit:
+        if hit[1] > time.time():
+            _token_cache.move_to_end(token)
+            return hit[0]
+        _token_cache.pop(token, None)
+        return None
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
-        return payload.get("sub")
     except (jwt.ExpiredSignatureError, jwt.InvalidTokenError):
         return None
+    sub = payload.get("sub")
+    if sub and payload.get("exp"):
+        _token_cache[token] = (sub, payload["exp"])
+        if len(_token_cache) > TOKEN_CACHE_MAX:
+            _token_cache.popitem(last=False)
+    return sub
+
+
+class Overloaded(Exception):
+    """Too many password hashes queued; callers should answer 503."""
+
+
+async def _run_bcrypt(fn, *args):
+    global _bcrypt_pending
+    if _bcrypt_pending >= BCRYPT_MAX_PENDING:
+        raise Overloaded()
+    _bcrypt_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_bcrypt_pool, fn, *args)
+    finally:
+        _bcrypt_pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return (await _run_bcrypt(bcrypt.hashpw, password.encode(), bcrypt.gensalt())).decode()
+
+
+async def check_password(password: str, hashed: str) -> bool:
+    return await _run_bcrypt(bcrypt.checkpw, password.encode(), hashed.encode())
+
+
+def count_stat(family: str, field: str, amount: int = 1) -> dict:
+    """
+    Bump a counter for `horizon:stats:{family}` in-process (flushed with the cost ledger,
+    no Redis round trip on the request path) and return this process's totals for the family.
+    """
+    _STATS_PENDING[(family, field)] = _STATS_PENDING.get((family, field), 0) + amount
+    totals = STATS_LOCAL.setdefault(family, {})
+    totals[field] = totals.get(field, 0) + amount
+    return totals
+
+
+async def drain_stats(redis_client):
+    if not _STATS_PENDING or not redis_client:
+        return
+    rows = list(_STATS_PENDING.items())
+    _STATS_PENDING.clear()
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for (family, field), amount in rows:
+            pipe.hincrby(f"horizon:stats:{family}", field, amount)
+        await pipe.execute()
+    except Exception as e:
+        log.warning(f"[stats] flush failed, {len(rows)} counters kept for retry: {e}")
+        for key, amount in rows:
+            _STATS_PENDING[key] = _STATS_PENDING.get(key, 0) + amount
+
+
+async def watch_loop_lag(interval: float = 0.05, report_every: float = 60.0):
+    """
+    Event-loop blocking probe: sleeps `interval` and attributes any overshoot to code
+    that held the loop. Logs the blocked time and worst stall once per `report_every`.
+    Enabled with LOOP_LAG_MONITOR=True; used to compare before/after offloading work.
+    """
+    blocked, worst, window_start = 0.0, 0.0, time.perf_counter()
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = time.perf_counter() - start - interval
+        if lag > 0.001:
+            blocked += lag
+            worst = max(worst, lag)
+        if time.perf_counter() - window_start >= report_every:
+            log.info(f"[loop] blocked {blocked * 1000:.0f}ms over {report_every:.0f}s, worst stall {worst * 1000:.0f}ms",
+                     extra={"blocked_ms": round(blocked * 1000), "worst_stall_ms": round(worst * 1000)})
+            blocked, worst, window_start = 0.0, 0.0, time.perf_counter()
 
 
 async def get_latest_pricing(redis_client=None):
@@ -47,13 +161,13 @@ async def get_latest_pricing(redis_client=None):
 
     if redis_client:
         try:
-            cached = await redis_client.get(key)
+            cached = await cache.get(redis_client, key)
             if cached:
                 raw_dict = json.loads(cached)
-                _PRICING.update({k: tuple(v) for k, v in raw_dict.items()})
+                _set_pricing({k: tuple(v) for k, v in raw_dict.items()})
                 return
         except Exception as e:
-            print(f"[cost] redis cache read failed: {e}")
+            log.warning(f"[cost] redis cache read failed: {e}")
 
     try:
         async with httpx.AsyncClient(timeout=15.0) as client:
@@ -68,30 +182,122 @@ async def get_latest_pricing(redis_client=None):
                 completion_price = float(pricing.get("completion", 0)) * 1_000_000
                 new_pricing[m_id] = (prompt_price, completion_price)
 
-            _PRICING.update(new_pricing)
+            _set_pricing(new_pricing)
 
             # Store in Redis (24-hour TTL)
             pricing_ttl = int(os.getenv("CACHE_TTL_PRICING", "86400"))  # Default: 24 hours
             if redis_client:
-                await redis_client.setex(key, pricing_ttl, json.dumps({k: list(v) for k, v in new_pricing.items()}))
+                await cache.set(redis_client, key, json.dumps({k: list(v) for k, v in new_pricing.items()}), pricing_ttl)
+    except Exception as e:
+        log.warning(f"[cost] live pricing fetch failed: {e}")
+
+
+def _set_pricing(pricing: dict):
+    _PRICING.update(pricing)
+    _PRICING_BY_NAME.clear()
+    for model_id, rates in _PRICING.items():
+        _PRICING_BY_NAME.setdefault(model_id.split("/", 1)[-1], rates)
+    _RESOLVED.clear()
+
+
+def _resolve_rates(model: str):
+    """Exact id, then each provider-stripped suffix of it, against full ids and bare names."""
+    if model in _RESOLVED:
+        return _RESOLVED[model]
+    rates = None
+    parts = model.split("/")
+    for i in range(len(parts)):
+        candidate = "/".join(parts[i:])
+        rates = _PRICING.get(candidate) or _PRICING_BY_NAME.get(candidate)
+        if rates:
+            break
+    _RESOLVED[model] = rates
+    return rates
+
+
+def _record_cost(op: str, model: str, tokens_in: int, tokens_out: int, cost: float):
+    bucket = int(time.time()) // COST_BUCKET_SECONDS * COST_BUCKET_SECONDS
+    row = _LEDGER.setdefault((bucket, op, model), [0, 0, 0, 0.0])
+    row[0] += 1
+    row[1] += tokens_in
+    row[2] += tokens_out
+    row[3] += cost
+
+
+async def flush_cost_ledger(redis_client, interval: float = 10.0):
+    """
+    Background task: roll the in-process ledger into `horizon:costs:{bucket}` hashes
+    (fields `{op}|{model}|{calls,in,out,inr}`) so every worker adds to the same series.
+    Pending count_stat increments are flushed on the same tick.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        await drain_cost_ledger(redis_client)
+        await drain_stats(redis_client)
+
+
+async def drain_cost_ledger(redis_client):
+    if not _LEDGER or not redis_client:
+        return
+    rows = list(_LEDGER.items())
+    _LEDGER.clear()
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for (bucket, op, model), (calls, tokens_in, tokens_out, cost) in rows:
+            key = f"horizon:costs:{bucket}"
+            pipe.hincrby(key, f"{op}|{model}|calls", calls)
+            pipe.hincrby(key, f"{op}|{model}|in", tokens_in)
+            pipe.hincrby(key, f"{op}|{model}|out", tokens_out)
+            pipe.hincrbyfloat(key, f"{op}|{model}|inr", cost)
+            pipe.expire(key, COST_RETENTION_DAYS * 86400)
+        await pipe.execute()
     except Exception as e:
-        print(f"[cost] live pricing fetch failed: {e}")
+        log.warning(f"[cost] ledger flush failed, {len(rows)} rows kept for retry: {e}")
+        for key, row in rows:
+            acc = _LEDGER.setdefault(key, [0, 0, 0, 0.0])
+            for i, v in enumerate(row):
+                acc[i] += v
+
+
+async def cost_series(redis_client, hours: int = 24, op: Optional[str] = None) -> dict:
+    """Per-bucket and total cost/tokens grouped by operation and model, newest bucket last."""
+    now = int(time.time()) // COST_BUCKET_SECONDS * COST_BUCKET_SECONDS
+    buckets = list(range(now - (hours * 3600 // COST_BUCKET_SECONDS) * COST_BUCKET_SECONDS, now + 1, COST_BUCKET_SECONDS))
+    pipe = redis_client.pipeline(transaction=False)
+    for b in buckets:
+        pipe.hgetall(f"horizon:costs:{b}")
+    raw = await pipe.execute()
+
+    series, totals = [], {}
+    for bucket, fields in zip(buckets, raw):
+        rows: dict = {}
+        for field, value in fields.items():
+            row_op, model, metric = field.rsplit("|", 2)
+            if op and row_op != op:
+                continue
+            v = float(value)
+            rows.setdefault(row_op, {}).setdefault(model, {})[metric] = v
+            totals.setdefault(row_op, {}).setdefault(model, {})
+            totals[row_op][model][metric] = totals[row_op][model].get(metric, 0.0) + v
+        if rows:
+            series.append({"bucket": bucket, "ops": rows})
+    return {"bucket_seconds": COST_BUCKET_SECONDS, "series": series, "totals": totals}
 
 
 def log_llm_cost(op: str, model: str, response):
     try:
         u = getattr(response, "usage", None)
         if not u:
-            print(f"[cost] {op} | {model} | in=0 out=0 | INR 0.0000")
+            log.info(f"[cost] {op} | {model} | in=0 out=0 | INR 0.0000", extra={"op": op, "model": model, "cost_inr": 0.0})
             return 0
 
-        rates = _PRICING.get(model)
-        if rates is None:
-            # Check without provider prefix or exact match
-            rates = next((v for k, v in _PRICING.items() if k.endswith(model) or model.endswith(k)), None)
-
+        rates = _resolve_rates(model)
+        tracing.annotate(**{"llm.op": op, "llm.model": model,
+                            "llm.tokens_in": u.prompt_tokens, "llm.tokens_out": u.completion_tokens})
         if rates is None:
-            print(f"[cost] {op} | {model} (unindexed model) | in={u.prompt_tokens} out={u.completion_tokens} | INR 0.0000")
+            _record_cost(op, model, u.prompt_tokens, u.completion_tokens, 0.0)
+            log.warning(f"[cost] {op} | {model} (unindexed model) | in={u.prompt_tokens} out={u.completion_tokens} | INR 0.0000",
+                        extra={"op": op, "model": model, "tokens_in": u.prompt_tokens, "tokens_out": u.completion_tokens, "cost_inr": 0.0})
             return 0
 
         in_rate, out_rate = rates
@@ -101,10 +307,13 @@ def log_llm_cost(op: str, model: str, response):
         ctx_list = current_request_cost.get()
         if ctx_list is not None:
             ctx_list[0] += cost
+        _record_cost(op, model, u.prompt_tokens, u.completion_tokens, cost)
+        tracing.annotate(**{"llm.cost_inr": round(cost, 6)})
             
-        print(f"[cost] {op} | {model} | in={u.prompt_tokens} out={u.completion_tokens} | INR {cost:.4f}")
+        log.info(f"[cost] {op} | {model} | in={u.prompt_tokens} out={u.completion_tokens} | INR {cost:.4f}",
+                 extra={"op": op, "model": model, "tokens_in": u.prompt_tokens, "tokens_out": u.completion_tokens, "cost_inr": round(cost, 6)})
         
         return cost
     except Exception as e:
-        print(f"[cost] log failed: {e}")
+        log.warning(f"[cost] log failed: {e}")
         return 0
\ No newline at end of file
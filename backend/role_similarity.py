@@ -0,0 +1,114 @@
+"""
+role_similarity.py — Batch job: precompute role–role similarity from REQUIRES vectors.
+
+Each role is a sparse skill vector (REQUIRES weights, IDF-scaled so ubiquitous skills
+like "python" don't make everything look alike). Nearest neighbours above a floor
+are stored as SIMILAR_TO edges, which tree._get_archetypes uses to top up short
+graph matches instead of falling back to the LLM.
+
+    python role_similarity.py
+    python role_similarity.py --metric jaccard --k 10 --min-score 0.25
+"""
+import argparse
+import asyncio
+import math
+import os
+import time
+from typing import Dict, List, Tuple
+
+import redis.asyncio as aioredis
+from dotenv import load_dotenv
+
+import neo_graph as graph
+
+load_dotenv()
+
+
+def _idf_weight(vectors: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    df: Dict[str, int] = {}
+    for skills in vectors.values():
+        for skill in skills:
+            df[skill] = df.get(skill, 0) + 1
+    n = len(vectors)
+    return {
+        role: {skill: w * math.log(1 + n / df[skill]) for skill, w in skills.items()}
+        for role, skills in vectors.items()
+    }
+
+
+def nearest_neighbors(
+    vectors: Dict[str, Dict[str, float]], metric: str, k: int, min_score: float,
+) -> Dict[str, List[Tuple[str, float]]]:
+    """
+    Sparse all-pairs similarity via an inverted skill index, so only roles sharing at
+    least one skill are ever compared. Returns role -> top-k [(role, score)].
+    """
+    if metric == "cosine":
+        vectors = _idf_weight(vectors)
+    norms = {
+        role: (math.sqrt(sum(w * w for w in skills.values())) if metric == "cosine" else len(skills))
+        for role, skills in vectors.items()
+    }
+
+    postings: Dict[str, List[Tuple[str, float]]] = {}
+    for role, skills in vectors.items():
+        for skill, w in skills.items():
+            postings.setdefault(skill, []).append((role, w))
+
+    neighbors: Dict[str, List[Tuple[str, float]]] = {}
+    for role, skills in vectors.items():
+        acc: Dict[str, float] = {}
+        for skill, w in skills.items():
+            for other, ow in postings[skill]:
+                if other != role:
+                    acc[other] = acc.get(other, 0.0) + (w * ow if metric == "cosine" else 1.0)
+
+        scored = []
+        for other, dot in acc.items():
+            if metric == "cosine":
+                score = dot / (norms[role] * norms[other]) if norms[role] and norms[other] else 0.0
+            else:
+                score = dot / (norms[role] + norms[other] - dot)
+            if score >= min_score:
+                scored.append((other, round(score, 4)))
+        scored.sort(key=lambda x: (-x[1], x[0]))
+        if scored:
+            neighbors[role] = scored[:k]
+    return neighbors
+
+
+async def main(args):
+    rc = aioredis.from_url(os.getenv("REDIS_URL"), decode_responses=True) if os.getenv("REDIS_URL") else None
+    await graph.setup(rc)
+
+    start = time.perf_counter()
+    vectors = await graph.role_skill_vectors()
+    neighbors = nearest_neighbors(vectors, args.metric, args.k, args.min_score)
+    elapsed = time.perf_counter() - start
+    edges = sum(len(v) for v in neighbors.values())
+    print(f"{len(vectors)} roles -> {len(neighbors)} with neighbours, {edges} SIMILAR_TO edges ({args.metric}, {elapsed:.2f}s)")
+
+    for role in list(neighbors)[:args.sample]:
+        print(f"  {role!r}: {neighbors[role][:3]}")
+
+    if not args.dry_run:
+        await graph.store_similar_roles(neighbors)
+        print("Similarity index stored.")
+
+    if rc:
+        counts = await rc.hgetall("horizon:stats:archetypes")
+        total = sum(int(v) for v in counts.values())
+        if total:
+            print(f"Archetype sources so far: {counts} — LLM fallback rate {int(counts.get('llm_fallback', 0)) / total:.1%}")
+        await rc.aclose()
+    await graph.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute SIMILAR_TO neighbour lists between roles.")
+    parser.add_argument("--metric", choices=("cosine", "jaccard"), default="cosine")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--min-score", type=float, default=0.2)
+    parser.add_argument("--sample", type=int, default=5, help="Roles to print as a spot check.")
+    parser.add_argument("--dry-run", action="store_true")
+    asyncio.run(main(parser.parse_args()))
@@ -9,6 +9,8 @@ import hashlib
 from typing import List, Dict, Any
 from openai import AsyncOpenAI
 
+import metrics
+
 log = logging.getLogger(__name__)
 
 MODEL = os.getenv("MODEL_SCORING", os.getenv("OPENROUTER_MODEL", "google/gemini-2.5-flash-lite"))
@@ -49,13 +51,14 @@ async def compute_coverage_score(
 
     missing = jd_skills.copy()  # Fallback to 0% coverage if LLM fails
     try:
-        resp = await _client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.0
-        )
-        import ops
-        ops.log_llm_cost("score_coverage", MODEL, resp)
+        with metrics.stage("coverage_scoring"), metrics.outbound("openrouter"):
+            resp = await _client.chat.completions.create(
+                model=MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.0
+            )
+            import ops
+            ops.log_llm_cost("score_coverage", MODEL, resp)
         if resp and getattr(resp, "choices", None) and len(resp.choices) > 0 and resp.choices[0].message.content:
             content = resp.choices[0].message.content.strip()
             if "```" in content:
@@ -74,7 +77,8 @@ async def compute_coverage_score(
     matched_count = len(jd_skills) - len(missing)
     pct = (matched_count / len(jd_skills)) * 100.0 if jd_skills else 0.0
 
-    print(f"\n[SCORING DEBUG] User Base: {user_skills}\n[SCORING DEBUG] JD Base: {jd_skills}\n[SCORING DEBUG] Missing Evaluated: {missing}\n")
+    log.debug(f"Coverage {pct:.0f}%: {len(missing)} of {len(jd_skills)} JD skills missing",
+              extra={"user_skills": user_skills, "jd_skills": jd_skills, "missing": missing})
 
     return {
         "coverage_pct": pct,
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+import neo_graph as graph
+from local_graph import LocalBackend
+
+
+@pytest.fixture
+def local_graph(tmp_path, monkeypatch):
+    monkeypatch.setattr(graph, "_backend", LocalBackend(str(tmp_path / "graph.db")))
+    monkeypatch.setattr(graph, "_redis", None)
+    yield graph
+    asyncio.run(graph.close())
+
+
+def test_case_only_merge_keeps_skill_reachable(local_graph):
+    async def run():
+        await graph.evolve("Backend Engineer", ["python"])
+        before = await graph.find_trajectories(["Python"])
+        await graph.merge_many("Skill", {"Python": ["python"]})
+        after = await graph.find_trajectories(["Python"])
+        return before, after, [n["name"] for n in await graph.node_weights("Skill")]
+
+    before, after, names = asyncio.run(run())
+    assert [r["role"] for r in before] == ["backend engineer"]
+    assert after == before
+    assert names == ["python"]
+
+
+def test_backfill_graph_groups_by_lowercased_canonical(local_graph, tmp_path, monkeypatch):
+    pytest.importorskip("sentence_transformers")
+    import backfill_skills
+
+    async def fake_map(names):
+        return {"python": "Python", "reactjs": "React"}
+
+    merged = []
+
+    async def capture(label, groups):
+        merged.append((label, groups))
+
+    monkeypatch.setattr(backfill_skills, "CHECKPOINT_PATH", str(tmp_path / "cp.json"))
+    monkeypatch.setattr(backfill_skills, "normalize_map_async", fake_map)
+    monkeypatch.setattr(graph, "merge_many", capture)
+
+    async def run():
+        await graph.evolve("Frontend Engineer", ["python", "reactjs"])
+        await backfill_skills.backfill_graph(backfill_skills._load_checkpoint(True), 100, False)
+
+    asyncio.run(run())
+    assert merged == [("Skill", {"react": ["reactjs"]})]
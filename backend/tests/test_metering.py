@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+import metering
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # fakeredis runs EVAL through Lua
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_reservations_never_exceed_the_balance():
+    async def go():
+        rc = fakeredis.FakeAsyncRedis(decode_responses=True)
+        results = await asyncio.gather(*[metering.reserve(rc, "s1", 3.0) for _ in range(50)])
+        return results, float(await rc.get(metering.key("s1")))
+
+    results, final = run(go())
+    admitted = [r for r in results if r[0]]
+    assert sum(r[2] for r in admitted) == pytest.approx(metering.METERING_START_BALANCE)
+    assert final == pytest.approx(0.0)
+    assert len(admitted) == -(-metering.METERING_START_BALANCE // 3.0)  # the last one reserves the remainder
+
+
+def test_positive_balance_below_estimate_is_admitted():
+    async def go():
+        rc = fakeredis.FakeAsyncRedis(decode_responses=True)
+        await rc.set(metering.key("s2"), 2.0)
+        admitted, balance, reserved = await metering.reserve(rc, "s2", metering.estimate("/career/tree"))
+        # a cached tree read costs nothing: the whole reservation is refunded
+        refunded = await metering.settle(rc, "s2", reserved, 0.0, balance)
+        return admitted, balance, reserved, refunded
+
+    admitted, balance, reserved, refunded = run(go())
+    assert admitted and reserved == pytest.approx(2.0) and balance == pytest.approx(0.0)
+    assert refunded == pytest.approx(2.0)
+
+
+def test_empty_balance_is_rejected():
+    async def go():
+        rc = fakeredis.FakeAsyncRedis(decode_responses=True)
+        await rc.set(metering.key("s3"), 0)
+        return await metering.reserve(rc, "s3", 0.0)
+
+    assert run(go()) == (False, 0.0, 0.0)
+
+
+def test_settle_charges_overrun():
+    async def go():
+        rc = fakeredis.FakeAsyncRedis(decode_responses=True)
+        admitted, balance, reserved = await metering.reserve(rc, "s4", 1.0)
+        return balance, await metering.settle(rc, "s4", reserved, 4.0, balance)
+
+    balance, settled = run(go())
+    assert settled == pytest.approx(balance - 3.0)
@@ -0,0 +1,198 @@
+"""
+tracing.py — OpenTelemetry spans for the tree and discover pipelines.
+
+Every `metrics.stage()` and `metrics.outbound()` block is also a span, and each request
+gets a root span from the HTTP middleware, so one /career/tree call shows up as a single
+trace of its graph queries, Tavily searches and LLM calls. Span context lives in
+contextvars, which asyncio.gather, create_task and to_thread all copy, so concurrent
+children attach to the span that spawned them without any plumbing.
+
+TRACING_EXPORTER picks where finished spans go:
+    none     tracing API stays a no-op (default)
+    file     OTLP/JSON lines appended to TRACING_FILE, for offline use
+    otlp     OTLP over HTTP to OTEL_EXPORTER_OTLP_ENDPOINT
+    console  pretty-printed to stdout
+Other exporters can be added with register_exporter().
+
+    python tracing.py ./data/traces.jsonl --top 5     # critical path of the slowest traces
+"""
+import os
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind
+
+log = logging.getLogger("tracing")
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACING_FILE = os.getenv("TRACING_FILE", "./data/traces.jsonl")
+TRACING_SAMPLE_RATIO = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "horizon-backend")
+
+_tracer = trace.get_tracer("horizon")
+_provider = None
+
+
+# ── Exporters ────────────────────────────────────────────────────────────────
+
+class OTLPFileExporter:
+    """Appends each export batch as one OTLP/JSON line (the collector's otlpjsonfile format)."""
+
+    def __init__(self, path: str = TRACING_FILE):
+        from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+        from google.protobuf.json_format import MessageToJson
+        self._encode = lambda spans: MessageToJson(encode_spans(spans), indent=None)
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def export(self, spans):
+        from opentelemetry.sdk.trace.export import SpanExportResult
+        try:
+            line = self._encode(spans)
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            return SpanExportResult.SUCCESS
+        except Exception as e:
+            log.warning(f"Trace export to {self.path} failed: {e}")
+            return SpanExportResult.FAILURE
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+def _otlp_http():
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    return OTLPSpanExporter()
+
+
+def _console():
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+    return ConsoleSpanExporter()
+
+
+EXPORTERS: Dict[str, Callable] = {
+    "file": OTLPFileExporter,
+    "otlp": _otlp_http,
+    "console": _console,
+}
+
+
+def register_exporter(name: str, factory: Callable):
+    EXPORTERS[name] = factory
+
+
+def setup(exporter: Optional[str] = None):
+    """Install the SDK provider once per process; a no-op when the exporter is 'none'."""
+    global _provider
+    exporter = (exporter or TRACING_EXPORTER).lower()
+    if _provider is not None or exporter == "none":
+        return
+    if exporter not in EXPORTERS:
+        log.warning(f"Unknown TRACING_EXPORTER '{exporter}'; tracing disabled")
+        return
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(TRACING_SAMPLE_RATIO)),
+    )
+    # Export happens on the processor's own thread, never on the event loop
+    _provider.add_span_processor(BatchSpanProcessor(EXPORTERS[exporter]()))
+    trace.set_tracer_provider(_provider)
+    log.info(f"Tracing enabled: exporter={exporter}, sample ratio={TRACING_SAMPLE_RATIO}")
+
+
+def shutdown():
+    global _provider
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = None
+
+
+# ── Span helpers ─────────────────────────────────────────────────────────────
+
+def _clean(attrs: dict) -> dict:
+    return {k: v for k, v in attrs.items() if v is not None}
+
+
+@contextmanager
+def span(name: str, kind: SpanKind = SpanKind.INTERNAL, **attrs):
+    """Child of the current span; exceptions are recorded on it and re-raised."""
+    with _tracer.start_as_current_span(name, kind=kind, attributes=_clean(attrs)) as s:
+        yield s
+
+
+def annotate(**attrs):
+    """Set attributes on whichever span is current (no-op outside a sampled trace)."""
+    current = trace.get_current_span()
+    if current.is_recording():
+        current.set_attributes(_clean(attrs))
+
+
+# ── Critical path report ─────────────────────────────────────────────────────
+
+def _load_spans(path: str) -> list:
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            for rs in json.loads(line).get("resourceSpans", []):
+                for ss in rs.get("scopeSpans", []):
+                    spans.extend(ss.get("spans", []))
+    return spans
+
+
+def critical_path(spans: list) -> list:
+    """Root-to-leaf chain that follows, at each level, the child that finished last."""
+    children: Dict[str, list] = {}
+    for s in spans:
+        children.setdefault(s.get("parentSpanId", ""), []).append(s)
+    roots = children.get("", [])
+    if not roots:
+        return []
+    path = [max(roots, key=lambda s: int(s["endTimeUnixNano"]))]
+    while children.get(path[-1]["spanId"]):
+        path.append(max(children[path[-1]["spanId"]], key=lambda s: int(s["endTimeUnixNano"])))
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show the critical path of the slowest traces in an OTLP/JSON file.")
+    parser.add_argument("path", nargs="?", default=TRACING_FILE)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    by_trace: Dict[str, list] = {}
+    for s in _load_spans(args.path):
+        by_trace.setdefault(s["traceId"], []).append(s)
+
+    def duration(s) -> float:
+        return (int(s["endTimeUnixNano"]) - int(s["startTimeUnixNano"])) / 1e6
+
+    def total(trace_spans) -> float:
+        return max(int(s["endTimeUnixNano"]) for s in trace_spans) - min(int(s["startTimeUnixNano"]) for s in trace_spans)
+
+    slowest = sorted(by_trace.values(), key=total, reverse=True)[:args.top]
+    for trace_spans in slowest:
+        path = critical_path(trace_spans)
+        if not path:
+            continue
+        t0 = int(path[0]["startTimeUnixNano"])
+        print(f"{path[0]['name']}  {duration(path[0]):.0f}ms  ({len(trace_spans)} spans)")
+        for depth, s in enumerate(path[1:], 1):
+            offset = (int(s["startTimeUnixNano"]) - t0) / 1e6
+            print(f"{'  ' * depth}{s['name']:<28} +{offset:7.0f}ms  {duration(s):7.0f}ms")
+        print()
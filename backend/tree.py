@@ -1,6 +1,7 @@
 import os
 import ast
 import json
+import hashlib
 import logging
 import asyncio
 import datetime
@@ -12,7 +13,10 @@ from pydantic import BaseModel, Field
 from tavily import TavilyClient
 
 import neo_graph as graph
+import cache
+import metrics
 import ops
+import tracing
 
 load_dotenv()
 log = logging.getLogger("tree")
@@ -22,6 +26,7 @@ _tavily = TavilyClient(api_key=os.getenv("TAVILY_API_KEY", "").split(",")[0])
 MODEL_TREE_ARCHETYPES = os.getenv("MODEL_TREE_ARCHETYPES", os.getenv("OPENROUTER_MODEL", "google/gemini-2.5-flash-lite"))
 MODEL_TREE_SYNTHESIZER = os.getenv("MODEL_TREE_SYNTHESIZER", os.getenv("OPENROUTER_MODEL", "google/gemini-2.5-flash"))
 CACHE_TTL = int(os.getenv("CACHE_TTL_TREE", str(7 * 86400)))  # Default: 7 days
+TRAJ_TTL = int(os.getenv("CACHE_TTL_TRAJ", str(86400)))          # Default: 1 day; graph writes invalidate sooner
 
 BIO_DOMAINS = [
     "reddit.com", "news.ycombinator.com", "teamblind.com", "indiehackers.com",
@@ -71,7 +76,71 @@ class CareerTree(BaseModel):
 
 # Pipeline
 
-async def _get_archetypes(skills: List[str], personality: str = "") -> Tuple[List[str], List[List[str]]]:
+def _traj_cache_key(version: int, skills: List[str], limit: int) -> str:
+    fingerprint = hashlib.sha256(json.dumps(sorted({s.lower() for s in skills})).encode("utf-8")).hexdigest()[:32]
+    return f"horizon:traj:v{version}:{limit}:{fingerprint}"
+
+
+async def _graph_trajectories(skills: List[str], limit: int) -> List[Dict[str, Any]]:
+    """
+    Direct skill-overlap matches, topped up from the precomputed SIMILAR_TO index
+    (role_similarity.py) when there are fewer than `limit`. Topped-up records carry `via`.
+    """
+    records = await graph.find_trajectories(skills, limit=limit)
+    if not records or len(records) >= limit:
+        return records
+
+    seeds = {r["role"]: r for r in records}
+    for sim in await graph.similar_roles(list(seeds), limit=limit - len(records)):
+        seed = seeds[sim["via"]]
+        trajectory = await graph.walk(sim["role"])
+        records.append({
+            "role": sim["role"],
+            "score": seed["score"] * sim["score"],
+            "matched": seed["matched"],
+            "trajectory": trajectory,
+            "terminal": trajectory[-1],
+            "via": sim["via"],
+        })
+    return records
+
+
+async def _cached_trajectories(rc, skills: List[str], limit: int) -> List[Dict[str, Any]]:
+    """
+    find_trajectories behind a Redis cache keyed by skill-set fingerprint and graph version.
+    Any graph write bumps the version, so stale entries are simply never read again.
+    """
+    if not rc:
+        with metrics.stage("graph_lookup"), metrics.outbound("graph"):
+            records = await _graph_trajectories(skills, limit)
+            tracing.annotate(results=len(records))
+            return records
+
+    key = _traj_cache_key(await graph.version(), skills, limit)
+    try:
+        cached = await cache.get(rc, key)
+    except Exception as e:
+        log.warning(f"Trajectory cache read failed: {e}")
+        cached = None
+
+    counts = ops.count_stat("traj", "hit" if cached else "miss")
+    total = counts.get("hit", 0) + counts.get("miss", 0)
+    if total:
+        log.info(f"Trajectory cache {'hit' if cached else 'miss'} (hit ratio {counts.get('hit', 0) / total:.1%} over {total} in this worker)")
+    if cached:
+        return json.loads(cached)
+
+    with metrics.stage("graph_lookup"), metrics.outbound("graph"):
+        records = await _graph_trajectories(skills, limit)
+        tracing.annotate(results=len(records))
+    try:
+        await cache.set(rc, key, json.dumps(records), TRAJ_TTL)
+    except Exception as e:
+        log.warning(f"Trajectory cache write failed: {e}")
+    return records
+
+
+async def _get_archetypes(skills: List[str], personality: str = "", rc=None) -> Tuple[List[str], List[List[str]]]:
     """
     Graph-first archetype discovery with trajectory traversal.
     Returns (tavily_queries, known_trajectories).
@@ -79,7 +148,11 @@ async def _get_archetypes(skills: List[str], personality: str = "") -> Tuple[Lis
     Falls back to LLM if graph has insufficient data.
     """
     try:
-        records = await graph.find_trajectories(skills, limit=5)
+        records = await _cached_trajectories(rc, skills, limit=5)
+        source = "llm_fallback" if len(records) < 5 else "graph_topped_up" if any("via" in r for r in records) else "graph_direct"
+        counts = ops.count_stat("archetypes", source)
+        if counts:
+            log.info(f"Archetype LLM fallback rate: {counts.get('llm_fallback', 0) / sum(counts.values()):.1%} over {sum(counts.values())} in this worker")
         if len(records) < 5:
             log.warning("Graph returned <5 trajectory matches — falling back to LLM.")
             return await _archetypes_from_llm(skills, personality), []
@@ -110,30 +183,31 @@ Rules:
 Return ONLY a JSON array of 3 Tavily search queries targeting real career stories and biographies. Do NOT return JSON objects. Example format:
 ["Staff Engineer at fintech career path reddit", "ML infrastructure founder journey indiehackers", "Engineering Manager FAANG teamblind"]"""
 
-    resp = await _client.chat.completions.create(
-        model=MODEL_TREE_ARCHETYPES,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.4,
-        response_format={
-            "type": "json_schema",
-            "json_schema": {
-                "name": "ArchetypeQueries",
-                "strict": True,
-                "schema": {
-                    "type": "object",
-                    "properties": {
-                        "queries": {
-                            "type": "array",
-                            "items": {"type": "string"}
-                        }
-                    },
-                    "required": ["queries"],
-                    "additionalProperties": False
+    with metrics.stage("archetypes_llm"), metrics.outbound("openrouter"):
+        resp = await _client.chat.completions.create(
+            model=MODEL_TREE_ARCHETYPES,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.4,
+            response_format={
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "ArchetypeQueries",
+                    "strict": True,
+                    "schema": {
+                        "type": "object",
+                        "properties": {
+                            "queries": {
+                                "type": "array",
+                                "items": {"type": "string"}
+                            }
+                        },
+                        "required": ["queries"],
+                        "additionalProperties": False
+                    }
                 }
             }
-        }
-    )
-    ops.log_llm_cost("tree_archetypes", MODEL_TREE_ARCHETYPES, resp)
+        )
+        ops.log_llm_cost("tree_archetypes", MODEL_TREE_ARCHETYPES, resp)
     text = resp.choices[0].message.content.strip()
     try:
         data = json.loads(text)
@@ -152,13 +226,15 @@ async def _fetch_evidence(queries: List[str]) -> Tuple[str, Dict[str, str]]:
             return []
         try:
             client = TavilyClient(api_key=TAVILY_KEYS[attempt])
-            res = await asyncio.to_thread(
-                client.search,
-                query=q,
-                search_depth="advanced",
-                include_domains=BIO_DOMAINS,
-                max_results=14,
-            )
+            with metrics.stage("tavily_search", query=q), metrics.outbound("tavily", **{"tavily.key_index": attempt}):
+                res = await asyncio.to_thread(
+                    client.search,
+                    query=q,
+                    search_depth="advanced",
+                    include_domains=BIO_DOMAINS,
+                    max_results=14,
+                )
+                tracing.annotate(results=len(res.get("results", [])))
             return res.get("results", [])
         except Exception as e:
             log.warning(f"Tavily error for '{q}' with key index {attempt}: {e}")
@@ -234,20 +310,21 @@ Rules for observed_paths:
 
 Return valid JSON matching the CareerTree schema exactly."""
 
-    resp = await _client.chat.completions.create(
-        model=MODEL_TREE_SYNTHESIZER,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.1,
-        response_format={
-            "type": "json_schema",
-            "json_schema": {
-                "name": "CareerTree",
-                "strict": True,
-                "schema": CareerTree.model_json_schema()
-            }
-        },
-    )
-    ops.log_llm_cost("tree_synthesizer", MODEL_TREE_SYNTHESIZER, resp)
+    with metrics.stage("tree_synthesis"), metrics.outbound("openrouter"):
+        resp = await _client.chat.completions.create(
+            model=MODEL_TREE_SYNTHESIZER,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.1,
+            response_format={
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "CareerTree",
+                    "strict": True,
+                    "schema": CareerTree.model_json_schema()
+                }
+            },
+        )
+        ops.log_llm_cost("tree_synthesizer", MODEL_TREE_SYNTHESIZER, resp)
     log.info("Synthesis done.")
     try:
         return json.loads(resp.choices[0].message.content)
@@ -313,10 +390,10 @@ async def generate_tree(user_id: str, user_doc: Dict[str, Any], redis_client, fo
     cache_key = f"horizon:tree:v8:{user_id}"
 
     if redis_client and not force_refresh:
-        cached = await redis_client.get(cache_key)
+        cached = await cache.get_obj(redis_client, cache_key)
         if cached:
             log.info("Returning cached tree.")
-            return json.loads(cached)
+            return cached
 
     p = user_doc.get("profile", {})
     parsed = user_doc.get("resume", {}).get("parsed_data", {})
@@ -332,11 +409,12 @@ async def generate_tree(user_id: str, user_doc: Dict[str, Any], redis_client, fo
         f"Projects: {project_titles}"
     )
 
-    queries, known_trajectories = await _get_archetypes(skills, personality)
+    queries, known_trajectories = await _get_archetypes(skills, personality, redis_client)
     evidence, url_map = await _fetch_evidence(queries)
     tree = await _synthesize(user_id, profile, evidence, known_trajectories, personality)
 
-    resolved = _resolve_citations(tree, url_map)
+    with metrics.stage("citation_resolution"):
+        resolved = _resolve_citations(tree, url_map)
     log.info(f"Citations resolved: {resolved}")
 
     # Feed extracted paths back into the graph — learning loop
@@ -355,7 +433,7 @@ async def generate_tree(user_id: str, user_doc: Dict[str, Any], redis_client, fo
     }
 
     if redis_client:
-        await redis_client.setex(cache_key, CACHE_TTL, json.dumps(tree))
+        await cache.set_obj(redis_client, cache_key, tree, CACHE_TTL, user_id=user_id)
         log.info("Tree cached.")
 
     return tree
\ No newline at end of file